@@ -0,0 +1,488 @@
+"""Benchmarks for Flask-LogConfig's hot paths.
+
+Run all benchmarks with::
+
+    python -m benchmarks.run
+
+or only those whose name contains any of the given strings with::
+
+    python -m benchmarks.run after_request drain
+
+Each benchmark reports latency percentiles per record (or per request) in
+microseconds and, when ``tracemalloc`` is available, the number of bytes
+allocated per record at peak.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import flask
+import logconfig
+
+from flask_logconfig import (
+    BatchQueueListener,
+    BufferedFileHandler,
+    FlaskQueueHandler,
+    LogConfig,
+    RecordCodec,
+    RequestIdFilter,
+    RoutingQueueListener,
+)
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+try:
+    clock_ns = time.perf_counter_ns
+except AttributeError:  # pragma: no cover
+    def clock_ns():
+        return int(time.time() * 1e9)
+
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register decorated function as benchmark `name`. The function is
+    called with the number of iterations to run and must return a
+    :class:`Result`.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+class Result(object):
+    """Timings of a benchmark.
+
+    Args:
+        name (str): Benchmark name.
+        timings (list): Nanoseconds per record of each sample.
+        allocated (float, optional): Bytes allocated per record at peak.
+    """
+    def __init__(self, name, timings, allocated=None):
+        self.name = name
+        self.timings = sorted(timings)
+        self.allocated = allocated
+
+    def percentile(self, percent):
+        """Return `percent` percentile of timings in nanoseconds."""
+        index = int(round(percent / 100.0 * (len(self.timings) - 1)))
+        return self.timings[index]
+
+    @property
+    def mean(self):
+        """Return mean timing in nanoseconds."""
+        return sum(self.timings) / float(len(self.timings))
+
+    def as_row(self):
+        """Return tuple of report columns."""
+        allocated = ('-' if self.allocated is None
+                     else '{0:.0f}'.format(self.allocated))
+
+        return (self.name,
+                '{0:.2f}'.format(self.percentile(50) / 1e3),
+                '{0:.2f}'.format(self.percentile(90) / 1e3),
+                '{0:.2f}'.format(self.percentile(99) / 1e3),
+                '{0:.2f}'.format(self.mean / 1e3),
+                '{0:.0f}'.format(1e9 / self.mean if self.mean else 0),
+                allocated)
+
+
+HEADER = ('benchmark', 'p50 us', 'p90 us', 'p99 us', 'mean us', 'per sec',
+          'alloc B')
+
+
+def time_calls(func, iterations):
+    """Return list of nanoseconds each of `iterations` calls of `func`
+    took.
+    """
+    timings = []
+
+    for _ in range(iterations):
+        start = clock_ns()
+        func()
+        timings.append(clock_ns() - start)
+
+    return timings
+
+
+def allocated_per_call(func, iterations):
+    """Return mean number of bytes allocated at peak by a call of `func` or
+    ``None`` if that can't be measured.
+    """
+    if tracemalloc is None or not hasattr(tracemalloc, 'reset_peak'):
+        return None
+
+    total = 0
+    tracemalloc.start()
+
+    try:
+        for _ in range(iterations):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    return total / float(iterations)
+
+
+def measure(name, func, iterations):
+    """Return :class:`Result` of calling `func` `iterations` times."""
+    func()
+    gc.collect()
+    timings = time_calls(func, iterations)
+    allocated = allocated_per_call(func, max(iterations // 10, 1))
+
+    return Result(name, timings, allocated)
+
+
+class NullQueue(object):
+    """Queue that discards everything put on it."""
+    def put_nowait(self, item):
+        pass
+
+    put = put_nowait
+
+
+def make_app(**config):
+    """Return tuple of ``(app, logcfg)`` configured from `config`."""
+    app = flask.Flask('benchmarks')
+    app.config.update(config)
+    logcfg = LogConfig()
+    logcfg.init_app(app, start_listeners=False)
+
+    return app, logcfg
+
+
+def make_record(name='benchmarks', msg='%s %s', args=('GET', '/')):
+    """Return log record like those created by a logger call."""
+    return logging.getLogger(name).makeRecord(name,
+                                              logging.INFO,
+                                              __file__,
+                                              1,
+                                              msg,
+                                              args,
+                                              None,
+                                              func='view')
+
+
+def null_logger(name, level=logging.DEBUG):
+    """Return logger `name` that discards its records."""
+    logger = logging.getLogger(name)
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+    logger.setLevel(level)
+
+    return logger
+
+
+REQUEST_FORMATS = [
+    ('default', {}),
+    ('execution_time', {
+        'LOGCONFIG_REQUESTS_MSG_FORMAT':
+            '{method} {path} - {status_code} - {execution_time:.2f}ms'}),
+    ('environ', {
+        'LOGCONFIG_REQUESTS_MSG_FORMAT':
+            '{REMOTE_ADDR} {method} {url} {HTTP_USER_AGENT} {status}'}),
+    ('session', {
+        'LOGCONFIG_REQUESTS_MSG_FORMAT': '{method} {path} {session[user]}'}),
+    ('literal', {'LOGCONFIG_REQUESTS_MSG_FORMAT': 'request'}),
+    ('json', {
+        'LOGCONFIG_REQUESTS_JSON': True,
+        'LOGCONFIG_REQUESTS_JSON_HEADERS': ['User-Agent']}),
+    ('sampled_out', {'LOGCONFIG_REQUESTS_SAMPLE_RATE': 0}),
+    ('level_disabled', {}),
+]
+
+
+@benchmark('after_request')
+def bench_after_request(iterations):
+    results = []
+
+    for label, config in REQUEST_FORMATS:
+        logger = null_logger('benchmarks.requests', logging.DEBUG)
+
+        if label == 'level_disabled':
+            logger.setLevel(logging.INFO)
+
+        config = dict(config,
+                      LOGCONFIG_REQUESTS_ENABLED=True,
+                      LOGCONFIG_REQUESTS_LOGGER='benchmarks.requests')
+        app, logcfg = make_app(**config)
+        response = app.response_class('')
+        # Run the request hooks the extension registered like Flask does.
+        before_funcs = app.before_request_funcs[None]
+        after_funcs = app.after_request_funcs[None]
+
+        def request_cycle():
+            for func in before_funcs:
+                func()
+
+            for func in after_funcs:
+                func(response)
+
+        with app.test_request_context(
+                '/bench?page=1',
+                headers={'User-Agent': 'bench'},
+                environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+            results.append(measure('after_request[{0}]'.format(label),
+                                   request_cycle,
+                                   iterations))
+
+    return results
+
+
+@benchmark('prepare')
+def bench_prepare(iterations):
+    app = flask.Flask('benchmarks')
+    enriched = FlaskQueueHandler(NullQueue(), copy_context=False)
+    enriched.enrichers = [RequestIdFilter()]
+    handlers = [
+        ('request_context', FlaskQueueHandler(NullQueue()), True),
+        ('snapshot', FlaskQueueHandler(NullQueue(), snapshot={}), True),
+        ('snapshot_no_request',
+         FlaskQueueHandler(NullQueue(), snapshot={}),
+         False),
+        ('packed',
+         FlaskQueueHandler(NullQueue(), codec=RecordCodec()),
+         True),
+        ('no_copy', FlaskQueueHandler(NullQueue(), copy_context=False), True),
+        ('enriched', enriched, True),
+    ]
+    results = []
+
+    for label, handler, in_request in handlers:
+        handler.route = 'benchmarks'
+
+        def prepare():
+            handler.prepare(make_record())
+
+        if in_request:
+            with app.test_request_context('/bench'):
+                result = measure('prepare[{0}]'.format(label),
+                                 prepare,
+                                 iterations)
+        else:
+            result = measure('prepare[{0}]'.format(label),
+                             prepare,
+                             iterations)
+
+        results.append(result)
+
+    return results
+
+
+def drain(listener, records, rounds):
+    """Return list of nanoseconds per record it took `listener` to drain
+    `records` from its queue in each of `rounds`.
+    """
+    timings = []
+
+    for _ in range(rounds):
+        for record in records:
+            listener.queue.put_nowait(record)
+
+        start = clock_ns()
+        listener.start()
+        listener.stop()
+        timings.append((clock_ns() - start) / float(len(records)))
+
+    return timings
+
+
+def retained_per_record(make_item, count):
+    """Return bytes retained per item of `count` items held in a list or
+    ``None`` if that can't be measured.
+    """
+    if tracemalloc is None:
+        return None
+
+    tracemalloc.start()
+
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        items = [make_item() for _ in range(count)]
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+
+    del items
+
+    return retained / float(count)
+
+
+@benchmark('drain')
+def bench_drain(iterations):
+    app = flask.Flask('benchmarks')
+    codec = RecordCodec()
+    listeners = [
+        ('routing', RoutingQueueListener, {}),
+        ('batch', BatchQueueListener, {'batch_size': 100}),
+    ]
+    results = []
+
+    with app.test_request_context('/bench'):
+        plain_handler = FlaskQueueHandler(NullQueue())
+        packed_handler = FlaskQueueHandler(NullQueue(), codec=codec)
+
+        for handler in (plain_handler, packed_handler):
+            handler.route = 'benchmarks'
+
+        def plain():
+            return plain_handler.prepare(make_record())
+
+        def packed():
+            return packed_handler.prepare(make_record())
+
+        items = [('', plain), ('packed', packed)]
+
+        for label, cls, kargs in listeners:
+            for item_label, make_item in items:
+                listener = cls(logconfig.Queue(), **kargs)
+                listener.route('benchmarks').handlers = [
+                    logging.NullHandler()]
+                records = [make_item() for _ in range(iterations)]
+                name = 'drain[{0}]'.format(
+                    ','.join(filter(None, [label, item_label])))
+
+                results.append(Result(
+                    name,
+                    drain(listener, records, 10),
+                    retained_per_record(make_item, min(iterations, 1000))))
+
+    return results
+
+
+@benchmark('queue_loggers')
+def bench_queue_loggers(iterations):
+    results = []
+
+    for count in (1, 4, 16):
+        names = ['benchmarks.queued{0}'.format(index)
+                 for index in range(count)]
+
+        for name in names:
+            null_logger(name)
+
+        app, logcfg = make_app(LOGCONFIG_QUEUE=names)
+        loggers = [logging.getLogger(name) for name in names]
+        listener = logcfg.get_listeners(app)[names[0]].listener
+        timings = []
+
+        with app.test_request_context('/bench'):
+            for _ in range(10):
+                listener.start()
+                start = clock_ns()
+
+                for index in range(iterations):
+                    loggers[index % count].info('%s %s', 'GET', '/')
+
+                listener.stop()
+                timings.append((clock_ns() - start) / float(iterations))
+
+        results.append(Result('queue_loggers[{0}]'.format(count), timings))
+
+    return results
+
+
+@benchmark('file_handler')
+def bench_file_handler(iterations):
+    directory = tempfile.mkdtemp()
+    batch_size = 100
+    results = []
+
+    def make_handlers():
+        return [
+            ('FileHandler',
+             logging.FileHandler(os.path.join(directory, 'file.log'))),
+            ('buffered',
+             BufferedFileHandler(os.path.join(directory, 'buffered.log'),
+                                 flush_interval=None)),
+        ]
+
+    try:
+        for label, handler in make_handlers():
+            record = make_record()
+            results.append(measure('file_handler[{0}]'.format(label),
+                                   lambda: handler.handle(record),
+                                   iterations))
+            handler.close()
+
+        for label, handler in make_handlers():
+            records = [make_record() for _ in range(batch_size)]
+            emit_batch = getattr(handler, 'emit_batch', None)
+
+            if emit_batch is None:
+                def emit_batch(records):
+                    for record in records:
+                        handler.emit(record)
+
+            timings = [timing / float(batch_size) for timing in time_calls(
+                lambda: emit_batch(records),
+                max(iterations // batch_size, 1))]
+            results.append(Result('file_handler[{0},batch]'.format(label),
+                                  timings))
+            handler.close()
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+
+def run(patterns=(), iterations=10000, out=sys.stdout):
+    """Run benchmarks whose name contains any of `patterns` (or all if
+    empty) and print a report to `out`. Return list of results.
+    """
+    results = []
+
+    for name, func in BENCHMARKS:
+        if patterns and not any(pattern in name for pattern in patterns):
+            continue
+
+        results.extend(func(iterations))
+
+    rows = [HEADER] + [result.as_row() for result in results]
+    widths = [max(len(row[index]) for row in rows)
+              for index in range(len(HEADER))]
+
+    for row in rows:
+        print('  '.join(value.ljust(width) if index == 0 else
+                        value.rjust(width)
+                        for index, (value, width)
+                        in enumerate(zip(row, widths))),
+              file=out)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('patterns',
+                        nargs='*',
+                        help='Only run benchmarks whose name contains any '
+                             'of these strings.')
+    parser.add_argument('-n', '--iterations',
+                        type=int,
+                        default=10000,
+                        help='Number of iterations per benchmark.')
+    args = parser.parse_args(argv)
+
+    run(args.patterns, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
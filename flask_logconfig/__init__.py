@@ -1,22 +1,66 @@
 """Flask-LogConfig module.
 """
 
+import atexit
 import logging
 from collections import defaultdict
 import contextlib
-import datetime
+import copy
+from importlib import import_module
+import json
+import os
+import re
+import string
+import sys
+import threading
+import time
+import weakref
 
-import logconfig
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+
+try:
+    string_types = (basestring,)  # pragma: no cover
+except NameError:
+    string_types = (str,)
+
+try:
+    import queue as _queue
+except ImportError:  # pragma: no cover
+    import Queue as _queue
+
+try:
+    from logging.handlers import QueueHandler
+except ImportError:  # pragma: no cover
+    from logutils.queue import QueueHandler
+
+try:
+    from time import perf_counter_ns as clock_ns
+except ImportError:  # pragma: no cover
+    _clock = getattr(time, 'perf_counter', time.time)
+
+    def clock_ns():
+        """Return monotonic clock value in nanoseconds."""
+        return int(_clock() * 1e9)
 
 import flask
 from flask import (
     current_app,
     request,
     session,
-    _request_ctx_stack,
     has_request_context
 )
 
+try:
+    # Flask >= 2.2 keeps the request context in a context variable.
+    from flask.globals import request_ctx as _request_ctx
+    _request_ctx_stack = None
+except ImportError:  # pragma: no cover
+    from flask import _request_ctx_stack
+    _request_ctx = None
+
 from .__meta__ import (
     __title__,
     __summary__,
@@ -26,41 +70,478 @@ from .__meta__ import (
     __email__,
     __license__,
 )
+from .buffers import (
+    RequestBuffer,
+    RequestBufferHandler,
+    bufferify_logger,
+    get_request_buffer,
+)
+from .listeners import (
+    BatchQueueListener,
+    QueueRoute,
+    RoutingQueueListener,
+    queuify_logger,
+)
+from .loaders import (
+    apply_config_dict,
+    clear_config_cache,
+    configure_logging,
+    get_file_signature,
+    is_config_file,
+    load_config_file,
+)
+from .queues import QueueOverflow
+from .records import PackedRecord, RecordCodec
+from .registry import SharedLoggingRegistry, make_fingerprint
+from .sampling import RequestSampler
+from .stats import Histogram, QueueStats, format_prometheus
 
 
 __all__ = (
     'LogConfig',
+    'BatchQueueListener',
     'FlaskQueueHandler',
     'FlaskLogConfigException',
+    'Histogram',
+    'PackedRecord',
+    'QueueOverflow',
+    'QueueRoute',
+    'QueueStats',
+    'RecordCodec',
+    'RequestBuffer',
+    'RequestBufferHandler',
+    'RequestJsonFormat',
+    'RequestMessageData',
+    'RequestMessageFormat',
+    'RequestSampler',
+    'RequestSnapshot',
+    'RoutingQueueListener',
+    'clear_config_cache',
+    'format_prometheus',
+    'get_json_dumps',
+    'get_request_buffer',
+    'handle_queued_records',
+    'load_config_dict',
+    'load_config_file',
     'request_context_from_record',
 )
 
 
+# Exports of modules that are only needed by optional features mapped to the
+# module defining them. They're imported when first accessed so that
+# importing flask_logconfig doesn't import e.g. multiprocessing or mmap.
+_lazy_exports = {
+    'AggregatorHandler': 'aggregation',
+    'AggregatorServer': 'aggregation',
+    'run_aggregator': 'aggregation',
+    'RequestIdFilter': 'enrichers',
+    'BufferedFileHandler': 'files',
+    'RateLimitFilter': 'ratelimit',
+    'ConfigWatcher': 'reload',
+    'RingBufferHandler': 'ringbuffer',
+    'read_ring_buffer': 'ringbuffer',
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_exports:
+        raise AttributeError('module {0!r} has no attribute {1!r}'
+                             .format(__name__, name))
+
+    module = import_module('.' + _lazy_exports[name], __name__)
+    value = globals()[name] = getattr(module, name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()).union(_lazy_exports))
+
+
+# Lazy exports are added separately since static analysis (e.g. pylint's
+# undefined-all-variable check) can't see names defined by __getattr__. A star
+# import still imports their modules.
+__all__ += tuple(sorted(_lazy_exports))
+
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # Module level __getattr__ is only supported by Python 3.7+.
+    for _name in _lazy_exports:
+        __getattr__(_name)
+
+
 class FlaskLogConfigException(Exception):
     """Base exception class for Flask-LogConfig."""
     pass
 
 
-class FlaskQueueHandler(logconfig.QueueHandler):
+class RequestSnapshot(object):
+    """Compact, read-only capture of selected Flask request data.
+
+    Unlike a copied request context, a snapshot holds no reference to the
+    WSGI environ, session, or URL adapter so it's cheap to create and doesn't
+    keep request objects alive while a record waits in a queue.
+    """
+    __slots__ = ('method', 'path', 'remote_addr', 'endpoint', 'headers', 'g')
+
+    def __init__(self,
+                 method=None,
+                 path=None,
+                 remote_addr=None,
+                 endpoint=None,
+                 headers=None,
+                 g=None):
+        self.method = method
+        self.path = path
+        self.remote_addr = remote_addr
+        self.endpoint = endpoint
+        self.headers = headers or {}
+        self.g = g or {}
+
+    @classmethod
+    def capture(cls, headers=(), g=()):
+        """Return snapshot of the current request capturing the named
+        `headers` and `g` attributes in addition to the default fields.
+        """
+        request_headers = request.headers
+        return cls(method=request.method,
+                   path=request.path,
+                   remote_addr=request.remote_addr,
+                   endpoint=request.endpoint,
+                   headers=dict((name, request_headers.get(name))
+                                for name in headers),
+                   g=dict((name, getattr(flask.g, name, None))
+                          for name in g))
+
+    def as_dict(self):
+        """Return snapshot as a ``dict``."""
+        return dict((key, getattr(self, key)) for key in self.__slots__)
+
+    def __repr__(self):  # pragma: no cover
+        return '<{0} {1} {2}>'.format(self.__class__.__name__,
+                                      self.method,
+                                      self.path)
+
+
+class RequestMessageData(Mapping):
+    """Mapping of request message data whose values are computed from the
+    current request and `response` only when first accessed.
+
+    Keys not provided by :attr:`getters` are looked up in the WSGI environ.
+    """
+    getters = {
+        'method': lambda data: request.method,
+        'path': lambda data: request.path,
+        'base_url': lambda data: request.base_url,
+        'url': lambda data: request.url,
+        'remote_addr': lambda data: request.remote_addr,
+        'user_agent': lambda data: request.user_agent,
+        'status_code': lambda data: data.response.status_code,
+        'status': lambda data: data.response.status,
+        'execution_time': lambda data: data.get_execution_time(),
+        'session': lambda data: get_session_data(),
+    }
+
+    def __init__(self, response, get_execution_time):
+        self.response = response
+        self.get_execution_time = get_execution_time
+        self._cache = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        if key in self.getters:
+            value = self.getters[key](self)
+        else:
+            value = request.environ[key]
+
+        self._cache[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self.getters or key in request.environ
+
+    def __iter__(self):
+        for key in self.getters:
+            yield key
+
+        for key in request.environ:
+            if key not in self.getters:
+                yield key
+
+    def __len__(self):
+        return len(set(self.getters).union(request.environ))
+
+
+class RequestMessageFormat(object):
+    """Request log message format that is parsed once so that rendering a
+    message only touches the fields the format string references.
+
+    Attributes:
+        format_string (str): Original format string.
+        fields (tuple): Top-level field names referenced by the format string.
+            For example, ``'{session[user]} {path}'`` references
+            ``('session', 'path')``.
+
+    Raises:
+        FlaskLogConfigException: If `format_string` can't be parsed or uses
+            positional fields.
+    """
+    def __init__(self, format_string):
+        self.format_string = format_string
+
+        try:
+            self.fields = tuple(parse_format_fields(format_string))
+        except ValueError as exc:
+            raise FlaskLogConfigException(
+                'Invalid request message format {0!r}: {1}'
+                .format(format_string, exc))
+
+        if not self.fields:
+            # Nothing to substitute so render the literal text as is. Escaped
+            # braces still need to be unescaped though.
+            self.literal = format_string.format()
+        else:
+            self.literal = None
+
+    def render(self, data):
+        """Return message rendered from `data` mapping. Only the keys of
+        :attr:`fields` are looked up in `data`.
+        """
+        if self.literal is not None:
+            return self.literal
+        return self.format_string.format(
+            **dict((name, data[name]) for name in self.fields))
+
+    def __repr__(self):  # pragma: no cover
+        return '<{0} {1!r}>'.format(self.__class__.__name__,
+                                    self.format_string)
+
+
+class RequestJsonFormat(object):
+    """Request log message format that renders a JSON object per request.
+
+    The listed `fields` are looked up in a :class:`RequestMessageData` so
+    only those fields are computed. Field, header, and session values that
+    aren't JSON types (e.g. ``user_agent`` or a ``datetime`` stored in the
+    session) are converted to strings.
+
+    Args:
+        fields (list): Request message data keys to include.
+        headers (list, optional): Request header names to include under a
+            ``headers`` key.
+        session (list, optional): Session keys to include under a
+            ``session`` key.
+        dumps (callable, optional): Function that serializes a ``dict`` to a
+            JSON string. Defaults to the fastest available backend (see
+            :func:`get_json_dumps`).
+        constants (dict, optional): Values to include in every object.
+    """
+    json_types = (str, int, float, bool, type(None))
+
+    #: Types that are serialized as JSON arrays and objects. Values nested in
+    #: them that aren't JSON types are converted by the ``dumps`` function.
+    json_containers = (list, tuple, dict)
+
+    def __init__(self,
+                 fields,
+                 headers=(),
+                 session=(),
+                 dumps=None,
+                 constants=None):
+        self.fields = tuple(fields)
+        self.headers = tuple(headers)
+        self.session = tuple(session)
+        self.dumps = dumps or get_json_dumps()
+        self.constants = dict(constants or {})
+
+    def render(self, data):
+        """Return JSON message rendered from `data` mapping."""
+        obj = {}
+
+        for field in self.fields:
+            value = data.get(field)
+
+            if not isinstance(value, self.json_types):
+                value = str(value)
+
+            obj[field] = value
+
+        if self.headers:
+            obj['headers'] = dict(
+                (name, self.to_json(request.headers.get(name)))
+                for name in self.headers)
+
+        if self.session:
+            obj['session'] = dict((key, self.to_json(session.get(key)))
+                                  for key in self.session)
+
+        if self.constants:
+            obj.update(self.constants)
+
+        return self.dumps(obj)
+
+    def to_json(self, value):
+        """Return `value` as is if it's a JSON type or container or else
+        converted to a string.
+        """
+        if isinstance(value, self.json_types + self.json_containers):
+            return value
+        return str(value)
+
+    def __repr__(self):  # pragma: no cover
+        return '<{0} {1!r}>'.format(self.__class__.__name__, self.fields)
+
+
+class FlaskQueueHandler(QueueHandler):
     """Extend QueueHandler to attach Flask request context to record since
     request context won't be available inside listener thread.
+
+    When `snapshot` is given, a :class:`RequestSnapshot` is attached as
+    ``record.request_snapshot`` instead of a full copy of the request context.
+    It should be a ``dict`` with optional ``headers`` and ``g`` keys listing
+    the request headers and ``flask.g`` attributes to capture.
+
+    When `overflow` is given, records are put on the queue using that
+    :class:`QueueOverflow` policy instead of failing when a bounded queue is
+    full.
+
+    When `codec` is given, records are queued as :class:`PackedRecord`
+    instances encoded by that :class:`RecordCodec`.
+
+    When `stats` is given, queued records are counted by that
+    :class:`QueueStats`.
+
+    When `copy_context` is ``False`` and no `snapshot` is given, nothing
+    from the request is attached to records other than what enrichers add.
     """
-    def prepare(self, record):
+    #: Name of the queued logger this handler was attached to. When set, it's
+    #: stored as ``record.queue_route`` so that a :class:`RoutingQueueListener`
+    #: can dispatch the record to that logger's handlers.
+    route = None
+
+    #: Callables that are passed each prepared record while the request that
+    #: logged it is still active so they can set attributes on it.
+    enrichers = ()
+
+    #: :class:`RateLimitFilter` that records are passed through before
+    #: they're prepared. Suppressed records never reach the queue.
+    ratelimit = None
+
+    #: Scope of this handler's :attr:`ratelimit` buckets. It's set to the name
+    #: of the queued logger so that a record propagating through several
+    #: queued loggers is rate limited separately for each of them.
+    ratelimit_scope = None
+
+    def __init__(self,
+                 queue,
+                 snapshot=None,
+                 overflow=None,
+                 codec=None,
+                 stats=None,
+                 copy_context=True):
+        QueueHandler.__init__(self, queue)
+        self.snapshot = snapshot
+        self.overflow = overflow
+        self.codec = codec
+        self.stats = stats
+        self.copy_context = copy_context
+
+    def enqueue(self, record):
+        """Put record on the queue respecting the overflow policy."""
+        if self.overflow is None:
+            self.queue.put_nowait(record)
+        elif not self.overflow.put(self.queue, record):
+            return
+
+        if self.stats is not None:
+            self.stats.enqueued()
+
+    def emit(self, record):
+        """Queue a prepared copy of the record unless it's suppressed by the
+        rate limit.
+        """
+        suppressed = None
+
+        if self.ratelimit is not None:
+            key = self.ratelimit.get_key(record, scope=self.ratelimit_scope)
+            suppressed = self.ratelimit.acquire_token(key)
+
+            if suppressed is None:
+                return
+
+        try:
+            self.enqueue(self.prepare(record, suppressed=suppressed))
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record, suppressed=None):
         """Return a prepared log record. Attach a copy of the current Flask
-        request context for use inside threaded handlers.
+        request context (or a snapshot of it) for use inside threaded
+        handlers and run the enrichers. When `suppressed` is given, the
+        prepared record is annotated with that count of records suppressed
+        by the rate limit.
         """
-        record = logconfig.QueueHandler.prepare(self, record)
-        record.request_context = copy_current_request_context()
+        prepared = QueueHandler.prepare(self, record)
+
+        # Before Python 3.8, QueueHandler.prepare() modifies the record in
+        # place and returns it. Copy it so that a record propagating through
+        # several queued loggers isn't routed to the last one only.
+        if prepared is record:
+            prepared = copy.copy(record)
+
+        record = prepared
+
+        if self.route is not None:
+            record.queue_route = self.route
+
+        if has_request_context():
+            if self.snapshot is not None:
+                record.request_snapshot = RequestSnapshot.capture(
+                    headers=self.snapshot.get('headers', ()),
+                    g=self.snapshot.get('g', ()))
+            elif self.copy_context:
+                record.request_context = copy_current_request_context()
+
+        for enricher in self.enrichers:
+            enricher(record)
+
+        if suppressed is not None:
+            self.ratelimit.annotate(record, suppressed)
+
+        if self.codec is not None:
+            return self.codec.pack(record)
+
         return record
 
 
+#: Request logging options that can't be overridden by a policy of
+#: ``LOGCONFIG_REQUESTS_POLICIES``.
+REQUESTS_POLICY_EXCLUDED = frozenset(['LOGCONFIG_REQUESTS_POLICIES'])
+
+#: Application state items shared by applications using ``LOGCONFIG_SHARED``.
+SHARED_STATE_KEYS = ('listeners',
+                     'queue_handlers',
+                     'queue_setup',
+                     'buffer',
+                     'queue',
+                     'overflow',
+                     'codec',
+                     'stats',
+                     'ratelimit',
+                     'aggregator_handler')
+
+
 class LogConfig(object):
     """Flask extension for configuring Python's logging module from
     application's config object.
     """
-    default_queue_class = logconfig.Queue
+    default_queue_class = _queue.Queue
     default_handler_class = FlaskQueueHandler
-    default_listener_class = logconfig.QueueListener
+    default_listener_class = RoutingQueueListener
+    default_batch_listener_class = BatchQueueListener
 
     def __init__(self,
                  app=None,
@@ -72,6 +553,8 @@ class LogConfig(object):
         self.queue_class = queue_class
         self.handler_class = handler_class
         self.listener_class = listener_class
+        self.enrichers = []
+        self._reload_lock = threading.RLock()
 
         if app is not None:  # pragma: no cover
             self.init_app(app, start_listeners=start_listeners)
@@ -84,23 +567,92 @@ class LogConfig(object):
                  listener_class=None):
         """Initialize extension on Flask application."""
         app.config.setdefault('LOGCONFIG', None)
+        app.config.setdefault('LOGCONFIG_CACHE_DIR', None)
+        app.config.setdefault('LOGCONFIG_SHARED', False)
         app.config.setdefault('LOGCONFIG_QUEUE', [])
+        app.config.setdefault('LOGCONFIG_AGGREGATOR', None)
+        app.config.setdefault('LOGCONFIG_RELOAD_SIGNAL', None)
+        app.config.setdefault('LOGCONFIG_RELOAD_INTERVAL', None)
+        app.config.setdefault('LOGCONFIG_QUEUE_SNAPSHOT', None)
+        app.config.setdefault('LOGCONFIG_QUEUE_COPY_CONTEXT', True)
+        app.config.setdefault('LOGCONFIG_QUEUE_PACKED', False)
+        app.config.setdefault('LOGCONFIG_QUEUE_STATS', False)
+        app.config.setdefault('LOGCONFIG_QUEUE_FLUSH_AT_EXIT', True)
+        app.config.setdefault('LOGCONFIG_QUEUE_FLUSH_TIMEOUT', 5000)
+        app.config.setdefault('LOGCONFIG_QUEUE_MAXSIZE', None)
+        app.config.setdefault('LOGCONFIG_QUEUE_OVERFLOW', 'block')
+        app.config.setdefault('LOGCONFIG_QUEUE_OVERFLOW_LEVEL',
+                              logging.WARNING)
+        app.config.setdefault('LOGCONFIG_QUEUE_LISTENER_THREADS', 1)
+        app.config.setdefault('LOGCONFIG_QUEUE_ASYNCIO', False)
+        app.config.setdefault('LOGCONFIG_QUEUE_BATCH_SIZE', None)
+        app.config.setdefault('LOGCONFIG_QUEUE_BATCH_TIMEOUT', 0)
+        app.config.setdefault('LOGCONFIG_RATELIMIT', None)
+        app.config.setdefault('LOGCONFIG_BUFFER', [])
+        app.config.setdefault('LOGCONFIG_BUFFER_CAPACITY', 1000)
+        app.config.setdefault('LOGCONFIG_BUFFER_FLUSH_LEVEL', logging.ERROR)
+        app.config.setdefault('LOGCONFIG_BUFFER_FLUSH_STATUS', 500)
+        app.config.setdefault('LOGCONFIG_BUFFER_PASS_LEVEL', logging.WARNING)
         app.config.setdefault('LOGCONFIG_REQUESTS_ENABLED', False)
         app.config.setdefault('LOGCONFIG_REQUESTS_LOGGER', None)
         app.config.setdefault('LOGCONFIG_REQUESTS_LEVEL', logging.DEBUG)
         app.config.setdefault('LOGCONFIG_REQUESTS_MSG_FORMAT',
                               '{method} {path} - {status_code}')
+        app.config.setdefault('LOGCONFIG_REQUESTS_JSON', False)
+        app.config.setdefault('LOGCONFIG_REQUESTS_JSON_FIELDS',
+                              ['method', 'path', 'status_code',
+                               'execution_time'])
+        app.config.setdefault('LOGCONFIG_REQUESTS_JSON_HEADERS', [])
+        app.config.setdefault('LOGCONFIG_REQUESTS_JSON_SESSION', [])
+        app.config.setdefault('LOGCONFIG_REQUESTS_JSON_BACKEND', None)
+        app.config.setdefault('LOGCONFIG_REQUESTS_SLOW_THRESHOLD', None)
+        app.config.setdefault('LOGCONFIG_REQUESTS_SLOW_LEVEL', logging.WARNING)
+        app.config.setdefault(
+            'LOGCONFIG_REQUESTS_SLOW_MSG_FORMAT',
+            '{method} {path} - {status_code} - {execution_time:.2f}ms (slow)')
+        app.config.setdefault('LOGCONFIG_REQUESTS_SAMPLE_RATE', 1.0)
+        app.config.setdefault('LOGCONFIG_REQUESTS_SAMPLE_RATES', {})
+        app.config.setdefault('LOGCONFIG_REQUESTS_SAMPLE_KEEP_STATUS', 500)
+        app.config.setdefault('LOGCONFIG_REQUESTS_SAMPLE_KEEP_SLOWER_THAN',
+                              None)
+        app.config.setdefault('LOGCONFIG_REQUESTS_POLICIES', {})
 
         if not hasattr(app, 'extensions'):  # pragma: no cover
             app.extensions = {}
 
         app.extensions['logconfig'] = {
-            'listeners': {}
+            'listeners': {},
+            'queue_handlers': {},
+            'queue_setup': None,
+            'buffer': None,
+            'queue': None,
+            'overflow': None,
+            'codec': None,
+            'stats': None,
+            'ratelimit': None,
+            'aggregator': None,
+            'aggregator_handler': None,
+            'watcher': None,
+            'reload_signal': None,
+            'retired_queue_handlers': weakref.WeakSet(),
+            'shared': None
         }
 
         handler_class = handler_class or self.handler_class
         listener_class = listener_class or self.listener_class
 
+        if app.config['LOGCONFIG_QUEUE_ASYNCIO']:
+            if app.config['LOGCONFIG_QUEUE_BATCH_SIZE']:
+                raise FlaskLogConfigException(
+                    'LOGCONFIG_QUEUE_ASYNCIO can\'t be combined with '
+                    'LOGCONFIG_QUEUE_BATCH_SIZE')
+
+            # Imported here since the module requires Python 3.7+.
+            from .aio import AsyncQueue, AsyncioQueueListener
+
+            queue_class = queue_class or AsyncQueue
+            listener_class = listener_class or AsyncioQueueListener
+
         if not queue_class:
             queue_class = self.default_queue_class
 
@@ -108,21 +660,167 @@ class LogConfig(object):
             handler_class = self.default_handler_class
 
         if not listener_class:
-            listener_class = self.default_listener_class
+            if app.config['LOGCONFIG_QUEUE_BATCH_SIZE']:
+                listener_class = self.default_batch_listener_class
+            else:
+                listener_class = self.default_listener_class
+
+        # Kept so that a reload can rebuild the queue the same way.
+        app.extensions['logconfig']['queue_setup'] = {
+            'start_listeners': start_listeners,
+            'queue_class': queue_class,
+            'listener_class': listener_class,
+            'handler_class': handler_class
+        }
+
+        if app.config['LOGCONFIG_SHARED']:
+            self.setup_shared(app)
+        else:
+            self.setup_handlers(app)
+
+        if self.get_queue_names(app):
+            # Listeners need to be restarted in forked child processes (e.g.
+            # pre-fork server workers) since threads don't survive a fork and
+            # flushed when the process exits.
+            _queued_apps[app] = weakref.ref(self)
+
+        if app.config['LOGCONFIG_BUFFER']:
+            # NOTE: After request functions run in reverse order of
+            # registration so registering this first ensures that records
+            # logged by other after request functions (e.g. request logging)
+            # can still be flushed.
+            app.after_request(self.after_request_buffer)
+            app.teardown_request(self.teardown_request_buffer)
+
+        self.setup_requests(app)
+
+        if (app.config['LOGCONFIG_RELOAD_SIGNAL'] or
+                app.config['LOGCONFIG_RELOAD_INTERVAL']):
+            self.setup_reload(app)
+
+        if self.has_requests_policies_enabled(app):
+            self.setup_requests_hooks(app)
+
+    def setup_handlers(self, app):
+        """Apply ``LOGCONFIG`` and setup aggregation, queueing, and
+        buffering of log records for application.
+        """
+        create_app_logger(app)
 
         if app.config['LOGCONFIG']:
             self.setup_logging(app)
 
-        if app.config['LOGCONFIG_QUEUE']:
-            self.setup_queue(app,
-                             start_listeners,
-                             queue_class,
-                             listener_class,
-                             handler_class)
+        if app.config['LOGCONFIG_AGGREGATOR']:
+            self.setup_aggregator(app)
+
+        if self.get_queue_names(app):
+            self.setup_queue(app, **self.get_state(app)['queue_setup'])
+
+        if app.config['LOGCONFIG_BUFFER']:
+            self.setup_buffer(app)
 
-        if app.config['LOGCONFIG_REQUESTS_ENABLED']:
-            app.before_request(self.before_request)
-            app.after_request(self.after_request)
+    def setup_shared(self, app):
+        """Share handlers, queue, and listeners with other applications of
+        the process whose logging configuration has the same fingerprint.
+        They're only set up for the first of them and torn down when the
+        last of them is released or garbage collected.
+
+        Raises:
+            FlaskLogConfigException: If ``LOGCONFIG_RELOAD_SIGNAL`` or
+                ``LOGCONFIG_RELOAD_INTERVAL`` is set too.
+        """
+        if (app.config['LOGCONFIG_RELOAD_SIGNAL'] or
+                app.config['LOGCONFIG_RELOAD_INTERVAL']):
+            raise FlaskLogConfigException(
+                'LOGCONFIG_SHARED can\'t be combined with '
+                'LOGCONFIG_RELOAD_SIGNAL or LOGCONFIG_RELOAD_INTERVAL')
+
+        state = self.get_state(app)
+        fingerprint = self.get_config_fingerprint(app)
+
+        with _shared_logging.lock:
+            shared = _shared_logging.get(fingerprint)
+
+            if shared is None:
+                self.setup_handlers(app)
+                shared = _shared_logging.add(
+                    fingerprint,
+                    dict((key, state[key]) for key in SHARED_STATE_KEYS))
+            else:
+                # The shared handlers may be attached to the logger named
+                # after the application already.
+                create_app_logger(app, keep_handlers=True)
+                state.update(shared.state)
+
+            _shared_logging.acquire(shared, app)
+
+        state['shared'] = shared
+
+    def get_config_fingerprint(self, app):
+        """Return fingerprint of application's logging configuration. It
+        covers all ``LOGCONFIG*`` config items apart from the per
+        application request logging ones, the modification time and size of
+        a ``LOGCONFIG`` file, and the queue classes.
+        """
+        config = app.config['LOGCONFIG']
+        items = sorted((key, value) for key, value in app.config.items()
+                       if key.startswith('LOGCONFIG') and
+                       not key.startswith('LOGCONFIG_REQUESTS_'))
+        signature = (get_file_signature(config)
+                     if isinstance(config, string_types) else None)
+
+        return make_fingerprint(items,
+                                signature,
+                                self.get_state(app)['queue_setup'])
+
+    def release(self, app=None):
+        """Stop application's queue listeners and restore the handlers of
+        its queued and buffered loggers. When the application shares them
+        with other applications through ``LOGCONFIG_SHARED``, it's only
+        detached from them unless it's the last one.
+
+        Shared logging is also torn down once all of its applications are
+        garbage collected, but other references (e.g. Flask < 1.0 keeps the
+        application that first accessed its logger alive) may delay that
+        indefinitely, so release applications that are done with instead.
+
+        Returns whether the handlers, queue, and listeners were torn down.
+        """
+        app = self.get_app(app)
+        state = self.get_state(app)
+        shared = state['shared']
+        _queued_apps.pop(app, None)
+
+        if shared is not None:
+            state['shared'] = None
+
+            if not _shared_logging.release(shared, app):
+                state.update(listeners={},
+                             queue_handlers={},
+                             queue=None,
+                             overflow=None,
+                             codec=None,
+                             stats=None,
+                             ratelimit=None,
+                             aggregator_handler=None)
+
+                if state['buffer'] is not None:
+                    state['buffer'] = dict(state['buffer'], handlers={})
+
+                return False
+
+        self.teardown(app)
+
+        return True
+
+    def teardown(self, app=None):
+        """Stop application's queue listeners and remove its queue,
+        buffer, and aggregator handlers restoring its loggers' handlers.
+        """
+        self.flush(app)
+        self.remove_buffer(app)
+        self.remove_queue(app)
+        self.remove_aggregator(app)
 
     def setup_logging(self, app):
         """Setup logging configuration for application."""
@@ -131,31 +829,693 @@ class LogConfig(object):
         # we access it here so that whatever logging configuration is being
         # loaded won't be lost.
         app.logger
-        logconfig.from_autodetect(app.config['LOGCONFIG'])
+
+        cache_dir = app.config['LOGCONFIG_CACHE_DIR']
+
+        if app.config['LOGCONFIG_AGGREGATOR']:
+            from .aggregation import strip_handlers
+
+            # Handlers are owned by the aggregator process so only loggers,
+            # levels, and filters are configured here.
+            apply_config_dict(strip_handlers(
+                load_config_dict(app.config['LOGCONFIG'], cache_dir)))
+        else:
+            configure_logging(app.config['LOGCONFIG'], cache_dir)
+
+        # Logger levels may have changed so the requests logger needs to be
+        # checked again.
+        self.reset_requests_enabled(app)
 
     def setup_queue(self,
                     app,
                     start_listeners,
                     queue_class,
                     listener_class,
-                    handler_class):
-        """Setup unified logging queue for application."""
+                    handler_class,
+                    queue=None):
+        """Setup unified logging queue for application. A new queue is
+        created unless `queue` is given.
+        """
         # Create one queue for all queued loggers.
-        queue = queue_class(-1)
+        if queue is None:
+            queue = queue_class(app.config['LOGCONFIG_QUEUE_MAXSIZE'] or -1)
+
+        shared_listener = None
+        state = self.get_state(app)
+        state['queue'] = queue
 
-        for name in app.config['LOGCONFIG_QUEUE']:
-            # Use a separate listener for each logger. This will result in
-            # a separate thread for each logger but it avoids issues where
-            # a listener emits the same record to a handler multiple times.
-            listener = listener_class(queue)
-            handler = handler_class(queue)
-            logconfig.queuify_logger(name, handler, listener)
+        if not app.config['LOGCONFIG_QUEUE_STATS']:
+            state['stats'] = None
+        elif state['stats'] is None:
+            state['stats'] = QueueStats()
+
+        state['ratelimit'] = self.make_rate_limit_filter(app)
+
+        for name in self.get_queue_names(app):
+            handler = self.make_queue_handler(app, handler_class, queue)
+
+            if shared_listener is None:
+                listener = self.make_queue_listener(app,
+                                                    listener_class,
+                                                    queue)
+
+                if hasattr(listener, 'route'):
+                    shared_listener = listener
+
+            # Enrichers added after this still apply since the list is shared.
+            handler.enrichers = self.enrichers
+
+            if state['ratelimit'] is not None:
+                # Rate limiting in the queue handler keeps suppressed records
+                # off the queue.
+                handler.ratelimit = state['ratelimit']
+                handler.ratelimit_scope = name
+
+            if shared_listener is not None:
+                # Serve all loggers from a single listener which dispatches
+                # each record only to the handlers of the logger that queued
+                # it. This keeps the thread count independent of the number
+                # of queued loggers.
+                handler.route = name
+                listener = shared_listener.route(name)
+
+            # Listeners without routing support get a separate listener for
+            # each logger. This results in a separate thread for each logger
+            # but it avoids issues where a listener emits the same record to
+            # a handler multiple times.
+            queuify_logger(name, handler, listener)
 
             self.add_listener(app, name, listener)
+            state['queue_handlers'][name] = handler
 
         if start_listeners:
             self.start_listeners(app)
 
+    def get_queue_names(self, app):
+        """Return names of loggers to queue for application. When shipping
+        records to an aggregator, only the root logger is queued.
+        """
+        if app.config['LOGCONFIG_AGGREGATOR']:
+            return ['']
+        return app.config['LOGCONFIG_QUEUE']
+
+    def setup_aggregator(self, app):
+        """Setup shipping of all log records to the aggregator process. The
+        records are shipped from the queue listener thread.
+        """
+        from .aggregation import AggregatorHandler
+
+        handler = AggregatorHandler(app.config['LOGCONFIG_AGGREGATOR'])
+        logging.getLogger().addHandler(handler)
+        self.get_state(app)['aggregator_handler'] = handler
+
+    def start_aggregator(self, app=None, timeout=10):
+        """Start aggregator process that owns the handlers configured by
+        ``LOGCONFIG`` and handles records shipped to
+        ``LOGCONFIG_AGGREGATOR``. Call this from the parent process before
+        workers are forked. Returns the started process.
+        """
+        from . import aggregation
+
+        app = self.get_app(app)
+        process = aggregation.start_aggregator(
+            app.config['LOGCONFIG_AGGREGATOR'],
+            app.config['LOGCONFIG'],
+            timeout=timeout,
+            cache_dir=app.config['LOGCONFIG_CACHE_DIR'])
+        self.get_state(app)['aggregator'] = process
+        return process
+
+    def reset_after_fork(self, app=None):
+        """Reset application's queues and listeners in a forked child process
+        and restart the listeners that were running in the parent.
+        """
+        state = self.get_state(app)
+        queues = []
+
+        for listener in self.get_queue_listeners(app):
+            if hasattr(listener, 'reset_after_fork'):
+                running = listener.reset_after_fork()
+            else:  # pragma: no cover
+                running = getattr(listener, '_thread', None) is not None
+                listener._thread = None
+
+            # Locks of the inherited queue may have been held by a thread of
+            # the parent process and its records are handled by the parent.
+            if listener.queue not in queues:
+                queues.append(listener.queue)
+                listener.queue.__init__(listener.queue.maxsize)
+
+            if running:
+                listener.start()
+
+        if state['aggregator_handler'] is not None:
+            state['aggregator_handler'].reset_after_fork()
+
+        if state['watcher'] is not None:
+            state['watcher'].reset_after_fork()
+
+        # The lock may have been held by a thread of the parent process.
+        self._reload_lock = threading.RLock()
+
+    def setup_buffer(self, app):
+        """Setup per-request buffering of log records for application."""
+        flush_level = get_level(app.config['LOGCONFIG_BUFFER_FLUSH_LEVEL'])
+        pass_level = get_level(app.config['LOGCONFIG_BUFFER_PASS_LEVEL'])
+        buffer = self.get_state(app)['buffer'] = {
+            'handlers': {},
+            'flush_status': app.config['LOGCONFIG_BUFFER_FLUSH_STATUS']
+        }
+
+        for name in app.config['LOGCONFIG_BUFFER']:
+            handler = RequestBufferHandler(
+                flush_level=flush_level,
+                capacity=app.config['LOGCONFIG_BUFFER_CAPACITY'],
+                pass_level=pass_level)
+            bufferify_logger(name, handler)
+            buffer['handlers'][name] = handler
+
+    def setup_requests(self, app):
+        """Resolve request logging configuration for application once so that
+        it doesn't need to be looked up on every request. Each of
+        ``LOGCONFIG_REQUESTS_POLICIES`` is resolved into a policy of its own.
+
+        Raises:
+            FlaskLogConfigException: If a policy overrides an unknown option.
+        """
+        state = self.get_state(app)
+        policies = {}
+
+        for key, overrides in (
+                app.config['LOGCONFIG_REQUESTS_POLICIES'].items()):
+            config = dict((name, value) for name, value in app.config.items()
+                          if name.startswith('LOGCONFIG_REQUESTS_'))
+
+            for name, value in overrides.items():
+                option = 'LOGCONFIG_REQUESTS_' + name.upper()
+
+                if option not in config or option in REQUESTS_POLICY_EXCLUDED:
+                    raise FlaskLogConfigException(
+                        'Unknown request logging policy option {0!r} for '
+                        '{1!r}'.format(name, key))
+
+                config[option] = value
+
+            policies[key] = self.make_requests_policy(
+                app,
+                config,
+                disabled=not config['LOGCONFIG_REQUESTS_ENABLED'])
+
+        state['requests'] = self.make_requests_policy(
+            app,
+            app.config,
+            disabled=not app.config['LOGCONFIG_REQUESTS_ENABLED'])
+        state['requests_policies'] = policies
+        state['requests_endpoints'] = {}
+        state['requests_active'] = None
+
+    def setup_requests_hooks(self, app):
+        """Register request logging hooks on application. They check the
+        cached result of :meth:`is_any_requests_enabled` in the application's
+        state before anything else so that requests cost a single lookup
+        while no request would be logged.
+        """
+        state = self.get_state(app)
+
+        def before_request():
+            if state['requests_active'] is not False:
+                return self.before_request()
+
+        def after_request(response):
+            if state['requests_active'] is False:
+                return response
+            return self.after_request(response)
+
+        app.before_request(before_request)
+        app.after_request(after_request)
+
+    def has_requests_policies_enabled(self, app=None):
+        """Return whether any request logging policy of the application isn't
+        disabled. Either ``LOGCONFIG_REQUESTS_ENABLED`` or a policy of
+        ``LOGCONFIG_REQUESTS_POLICIES`` that enables request logging makes
+        requests get logged.
+        """
+        state = self.get_state(app)
+        policies = [state['requests']] + list(
+            state['requests_policies'].values())
+
+        return any(not policy['disabled'] for policy in policies)
+
+    def make_requests_policy(self, app, config, disabled=False):
+        """Return ``dict`` of request logging settings resolved from the
+        ``LOGCONFIG_REQUESTS_*`` options of `config`. Requests handled by a
+        `disabled` policy aren't logged.
+        """
+        if config['LOGCONFIG_REQUESTS_LOGGER']:
+            logger = logging.getLogger(config['LOGCONFIG_REQUESTS_LOGGER'])
+        else:
+            logger = app.logger
+
+        if (config['LOGCONFIG_REQUESTS_SAMPLE_RATE'] < 1 or
+                config['LOGCONFIG_REQUESTS_SAMPLE_RATES']):
+            sampler = RequestSampler(
+                rate=config['LOGCONFIG_REQUESTS_SAMPLE_RATE'],
+                rates=config['LOGCONFIG_REQUESTS_SAMPLE_RATES'],
+                keep_status=config['LOGCONFIG_REQUESTS_SAMPLE_KEEP_STATUS'],
+                keep_slower_than=config[
+                    'LOGCONFIG_REQUESTS_SAMPLE_KEEP_SLOWER_THAN'])
+        else:
+            sampler = None
+
+        if config['LOGCONFIG_REQUESTS_JSON']:
+            dumps = get_json_dumps(config['LOGCONFIG_REQUESTS_JSON_BACKEND'])
+            json_kargs = {
+                'fields': config['LOGCONFIG_REQUESTS_JSON_FIELDS'],
+                'headers': config['LOGCONFIG_REQUESTS_JSON_HEADERS'],
+                'session': config['LOGCONFIG_REQUESTS_JSON_SESSION'],
+                'dumps': dumps
+            }
+            message_format = RequestJsonFormat(**json_kargs)
+            slow_message_format = RequestJsonFormat(constants={'slow': True},
+                                                    **json_kargs)
+        else:
+            message_format = RequestMessageFormat(
+                config['LOGCONFIG_REQUESTS_MSG_FORMAT'])
+            slow_message_format = RequestMessageFormat(
+                config['LOGCONFIG_REQUESTS_SLOW_MSG_FORMAT'])
+
+        return {
+            'logger': logger,
+            'level': get_level(config['LOGCONFIG_REQUESTS_LEVEL']),
+            'disabled': disabled,
+            'enabled': None,
+            'message_format': message_format,
+            'sampler': sampler,
+            'slow_threshold': config['LOGCONFIG_REQUESTS_SLOW_THRESHOLD'],
+            'slow_level': get_level(config['LOGCONFIG_REQUESTS_SLOW_LEVEL']),
+            'slow_enabled': None,
+            'slow_message_format': slow_message_format
+        }
+
+    def setup_reload(self, app):
+        """Setup reloading of application's logging configuration when the
+        process receives ``LOGCONFIG_RELOAD_SIGNAL`` or, every
+        ``LOGCONFIG_RELOAD_INTERVAL`` milliseconds, when the file
+        ``LOGCONFIG`` points to has changed.
+
+        Raises:
+            FlaskLogConfigException: If the signal is unknown or can't be
+                handled, e.g. since this isn't called from the main thread.
+        """
+        from .reload import ConfigWatcher, get_signal, install_reload_signal
+
+        state = self.get_state(app)
+
+        def callback():
+            self.reload_or_log(app)
+
+        if app.config['LOGCONFIG_RELOAD_SIGNAL']:
+            try:
+                signum = get_signal(app.config['LOGCONFIG_RELOAD_SIGNAL'])
+                previous = install_reload_signal(signum, callback)
+            except ValueError as exc:
+                raise FlaskLogConfigException(str(exc))
+
+            state['reload_signal'] = (signum, previous)
+
+        interval = app.config['LOGCONFIG_RELOAD_INTERVAL']
+
+        if interval and isinstance(app.config['LOGCONFIG'], string_types):
+            state['watcher'] = ConfigWatcher(app.config['LOGCONFIG'],
+                                             callback,
+                                             interval / 1000.0)
+            state['watcher'].start()
+
+            # The watcher thread needs to be restarted in forked child
+            # processes too.
+            _queued_apps[app] = weakref.ref(self)
+
+    def reload(self, app=None, config=None):
+        """Re-apply application's logging configuration without restarting
+        the process. When `config` is given, it replaces ``LOGCONFIG``
+        first. Buffered, queued, and request logging are set up again from
+        the application's current config.
+
+        Queue handlers, including those replaced by earlier reloads, are
+        pointed at a new queue before the old listeners are stopped so
+        records logged during the swap wait for the new listeners. Records
+        already on the old queue are handled by the old listeners first so
+        none are lost.
+
+        Raises:
+            FlaskLogConfigException: If ``LOGCONFIG_BUFFER`` is set but wasn't
+                at :meth:`init_app`, if a JSON or YAML ``LOGCONFIG`` file
+                can't be loaded, or if the application uses
+                ``LOGCONFIG_SHARED``. Nothing is changed in those cases.
+        """
+        app = self.get_app(app)
+
+        with self._reload_lock:
+            state = self.get_state(app)
+
+            if state['shared'] is not None:
+                raise FlaskLogConfigException(
+                    'Applications using LOGCONFIG_SHARED can\'t be reloaded')
+
+            if config is not None:
+                app.config['LOGCONFIG'] = config
+
+            config = app.config['LOGCONFIG']
+
+            if app.config['LOGCONFIG_BUFFER'] and state['buffer'] is None:
+                raise FlaskLogConfigException(
+                    'LOGCONFIG_BUFFER can only be enabled by a reload if it '
+                    'was set before init_app')
+
+            if is_config_file(config):
+                # Fail before anything is torn down if the file is invalid.
+                # The parsed file is cached so it isn't parsed again.
+                try:
+                    load_config_dict(config, app.config['LOGCONFIG_CACHE_DIR'])
+                except Exception as exc:
+                    raise FlaskLogConfigException(
+                        'Unable to load LOGCONFIG {0!r}: {1}'
+                        .format(config, exc))
+
+            old_queue = state['queue']
+            old_listeners = dict(state['listeners'])
+            queue_setup = dict(state['queue_setup'])
+            queue = None
+
+            if old_listeners:
+                queue_setup['start_listeners'] = any(
+                    is_listener_running(listener)
+                    for listener in self.get_queue_listeners(app))
+
+            if self.get_queue_names(app):
+                queue = queue_setup['queue_class'](
+                    app.config['LOGCONFIG_QUEUE_MAXSIZE'] or -1)
+
+                # Threads that looked up a logger's handlers before they were
+                # replaced by this or an earlier reload may still queue
+                # records with them.
+                retired = state['retired_queue_handlers']
+                retired.update(state['queue_handlers'].values())
+
+                for handler in retired:
+                    # Records are queued while holding the handler's lock so
+                    # none are put on the old queue once it's replaced.
+                    handler.acquire()
+                    try:
+                        handler.queue = queue
+                    finally:
+                        handler.release()
+
+            self.flush(app)
+            self.remove_buffer(app)
+            self.remove_queue(app)
+            self.remove_aggregator(app)
+
+            if old_queue is not None:
+                # Records put on the old queue after its listeners stopped
+                # are handled here since the loggers' handlers are restored.
+                handle_queued_records(old_queue, old_listeners)
+
+            try:
+                if config:
+                    self.setup_logging(app)
+            finally:
+                # Even if the new configuration fails to apply, records need
+                # to be queued and buffered again.
+                if app.config['LOGCONFIG_AGGREGATOR']:
+                    self.setup_aggregator(app)
+
+                if queue is not None:
+                    self.setup_queue(app, queue=queue, **queue_setup)
+                    _queued_apps[app] = weakref.ref(self)
+
+                if app.config['LOGCONFIG_BUFFER']:
+                    self.setup_buffer(app)
+
+                self.setup_requests(app)
+
+                watcher = state['watcher']
+
+                if watcher is not None and isinstance(config, string_types):
+                    watcher.path = config
+
+    def reload_or_log(self, app=None):
+        """Reload application's logging configuration logging any error
+        instead of raising it. Used by reload triggers.
+        """
+        try:
+            self.reload(app)
+        except Exception:
+            logging.getLogger(__name__).exception(
+                'Failed to reload logging configuration')
+
+    def remove_queue(self, app):
+        """Remove queue handlers of application from their loggers and
+        restore the loggers' handlers. Listeners should be stopped first.
+        """
+        state = self.get_state(app)
+
+        for name, handler in state['queue_handlers'].items():
+            logger = logging.getLogger(name)
+            logger.removeHandler(handler)
+
+            for hdlr in state['listeners'][name].handlers:
+                logger.addHandler(hdlr)
+
+        state['queue_handlers'] = {}
+        state['listeners'] = {}
+        state['queue'] = None
+
+    def remove_buffer(self, app):
+        """Remove request buffer handlers of application from their loggers
+        and restore the loggers' handlers.
+        """
+        buffer = self.get_state(app)['buffer']
+
+        if buffer is None:
+            return
+
+        for name, handler in buffer['handlers'].items():
+            logger = logging.getLogger(name)
+            logger.removeHandler(handler)
+
+            for hdlr in handler.handlers:
+                logger.addHandler(hdlr)
+
+        buffer['handlers'] = {}
+
+    def remove_aggregator(self, app):
+        """Remove and close the handler that ships records to the
+        aggregator process.
+        """
+        state = self.get_state(app)
+        handler = state['aggregator_handler']
+
+        if handler is not None:
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+            state['aggregator_handler'] = None
+
+    def reset_requests_enabled(self, app=None):
+        """Clear cached result of whether the requests logger is enabled for
+        the requests log level. Call this after changing logger levels outside
+        of :meth:`setup_logging`.
+        """
+        state = self.get_state(app)
+        requests = state.get('requests')
+
+        if requests is None:
+            return
+
+        state['requests_active'] = None
+
+        for policy in [requests] + list(state['requests_policies'].values()):
+            policy['enabled'] = None
+            policy['slow_enabled'] = None
+
+    def is_requests_enabled(self, app=None, policy=None):
+        """Return whether the requests logger will handle records at the
+        requests log level or, when ``LOGCONFIG_REQUESTS_SLOW_THRESHOLD`` is
+        set, at the slow requests log level. The result is cached until
+        :meth:`reset_requests_enabled` is called. When `policy` isn't given,
+        the application's default policy is checked.
+        """
+        requests = policy or self.get_state(app)['requests']
+
+        if requests['enabled'] is None:
+            logger = requests['logger']
+            requests['slow_enabled'] = (
+                not requests['disabled'] and
+                requests['slow_threshold'] is not None and
+                logger.isEnabledFor(requests['slow_level']))
+            requests['enabled'] = (not requests['disabled'] and
+                                   logger.isEnabledFor(requests['level']))
+
+        return requests['enabled'] or requests['slow_enabled']
+
+    def is_any_requests_enabled(self, app=None):
+        """Return whether :meth:`is_requests_enabled` is true for any request
+        logging policy of the application. The result is cached until
+        :meth:`reset_requests_enabled` is called so that request hooks can
+        return right away when no request would be logged.
+        """
+        state = self.get_state(app)
+
+        if state['requests_active'] is None:
+            policies = [state['requests']] + list(
+                state['requests_policies'].values())
+            state['requests_active'] = any(
+                [self.is_requests_enabled(policy=policy)
+                 for policy in policies])
+
+        return state['requests_active']
+
+    def get_requests_policy(self, endpoint, app=None):
+        """Return request logging policy that applies to `endpoint`. It's the
+        policy of ``LOGCONFIG_REQUESTS_POLICIES`` keyed by the endpoint name
+        or else by the longest matching endpoint prefix (keys ending with
+        ``.*``, e.g. ``'api.*'`` for a blueprint) or else the default policy.
+        The result is cached per endpoint.
+        """
+        state = self.get_state(app)
+        endpoints = state['requests_endpoints']
+
+        try:
+            return endpoints[endpoint]
+        except KeyError:
+            pass
+
+        policies = state['requests_policies']
+        policy = policies.get(endpoint)
+
+        if policy is None and endpoint:
+            prefixes = [key for key in policies
+                        if key.endswith('.*') and
+                        endpoint.startswith(key[:-1])]
+
+            if prefixes:
+                policy = policies[max(prefixes, key=len)]
+
+        if policy is None:
+            policy = state['requests']
+
+        endpoints[endpoint] = policy
+
+        return policy
+
+    def make_queue_handler(self, app, handler_class, queue):
+        """Return queue handler instance configured from application."""
+        kargs = {}
+        snapshot = app.config['LOGCONFIG_QUEUE_SNAPSHOT']
+
+        if snapshot:
+            kargs['snapshot'] = snapshot if isinstance(snapshot, dict) else {}
+
+        if app.config['LOGCONFIG_QUEUE_MAXSIZE']:
+            kargs['overflow'] = self.get_queue_overflow(app)
+
+        if not app.config['LOGCONFIG_QUEUE_COPY_CONTEXT']:
+            kargs['copy_context'] = False
+
+        if app.config['LOGCONFIG_QUEUE_PACKED']:
+            kargs['codec'] = self.get_record_codec(app)
+
+        if self.get_state(app)['stats'] is not None:
+            kargs['stats'] = self.get_state(app)['stats']
+
+        return handler_class(queue, **kargs)
+
+    def make_rate_limit_filter(self, app):
+        """Return rate limit filter shared by all of the application's queue
+        handlers or ``None`` if ``LOGCONFIG_RATELIMIT`` isn't set.
+
+        Raises:
+            FlaskLogConfigException: If ``LOGCONFIG_RATELIMIT`` has unknown
+                or invalid options.
+        """
+        options = app.config['LOGCONFIG_RATELIMIT']
+
+        if not options:
+            return None
+
+        if not isinstance(options, Mapping):
+            options = {}
+
+        from .ratelimit import RateLimitFilter
+
+        try:
+            return RateLimitFilter(**options)
+        except (TypeError, ValueError) as exc:
+            raise FlaskLogConfigException(
+                'Invalid LOGCONFIG_RATELIMIT: {0}'.format(exc))
+
+    def get_record_codec(self, app):
+        """Return record codec shared by all of the application's queue
+        handlers.
+        """
+        state = self.get_state(app)
+
+        if state['codec'] is None:
+            state['codec'] = RecordCodec()
+
+        return state['codec']
+
+    def get_queue_overflow(self, app):
+        """Return queue overflow policy shared by all of the application's
+        queue handlers. Its drop counters are available from the application
+        state as ``get_state(app)['overflow']``.
+
+        Raises:
+            FlaskLogConfigException: If the configured overflow policy or
+                level is unknown.
+        """
+        state = self.get_state(app)
+
+        if state['overflow'] is None:
+            try:
+                state['overflow'] = QueueOverflow(
+                    app.config['LOGCONFIG_QUEUE_OVERFLOW'],
+                    get_level(app.config['LOGCONFIG_QUEUE_OVERFLOW_LEVEL']))
+            except ValueError as exc:
+                raise FlaskLogConfigException(str(exc))
+
+        return state['overflow']
+
+    def make_queue_listener(self, app, listener_class, queue):
+        """Return queue listener instance configured from application."""
+        kargs = {}
+        batch_size = app.config['LOGCONFIG_QUEUE_BATCH_SIZE']
+
+        if batch_size:
+            kargs['batch_size'] = batch_size
+            kargs['batch_timeout'] = (
+                app.config['LOGCONFIG_QUEUE_BATCH_TIMEOUT'] / 1000.0)
+
+        threads = app.config['LOGCONFIG_QUEUE_LISTENER_THREADS']
+
+        if threads != 1:
+            kargs['threads'] = threads
+
+        if self.get_state(app)['stats'] is not None:
+            kargs['stats'] = self.get_state(app)['stats']
+
+        return listener_class(queue, **kargs)
+
+    def add_enricher(self, enricher):
+        """Register `enricher`, a callable that receives each record logged
+        to a queued logger while the request that logged it is still active
+        and may set attributes on it. Records logged outside of a request
+        are enriched too. Returns `enricher` so this can be used as a
+        decorator.
+        """
+        self.enrichers.append(enricher)
+        return enricher
+
     def get_app(self, app=None):
         """Look up and return application."""
         if app is not None:
@@ -183,93 +1543,301 @@ class LogConfig(object):
         """Add `listener` indexed by `name` to application."""
         self.get_listeners(app)[name] = listener
 
+    def get_stats(self, app=None):
+        """Return ``dict`` of logging queue and request logging metrics for
+        application. Keys are only present for the features that are in use:
+
+        - ``queue`` and ``listeners``: Queue size and listener state.
+        - ``enqueued``, ``dequeued``, ``lag``, and ``emit``: Counters and
+          histograms kept when ``LOGCONFIG_QUEUE_STATS`` is enabled (see
+          :meth:`QueueStats.as_dict`).
+        - ``overflow``: Records dropped by the queue overflow policy.
+        - ``sampled_out``: Requests dropped by request log sampling.
+        - ``ratelimit``: Records suppressed by ``LOGCONFIG_RATELIMIT``.
+        """
+        state = self.get_state(app)
+        stats = {}
+
+        if state['queue'] is not None:
+            queue = state['queue']
+            listeners = self.get_queue_listeners(app)
+            stats['queue'] = {
+                'size': queue.qsize(),
+                'maxsize': max(getattr(queue, 'maxsize', 0), 0)
+            }
+            stats['listeners'] = {
+                'count': len(listeners),
+                'running': any(is_listener_running(listener)
+                               for listener in listeners),
+                'threads': sum(getattr(listener, 'threads', 1)
+                               for listener in listeners)
+            }
+
+        if state['stats'] is not None:
+            stats.update(state['stats'].as_dict())
+
+        if state['overflow'] is not None:
+            stats['overflow'] = {
+                'dropped': state['overflow'].dropped,
+                'by_level': dict(state['overflow'].dropped_by_level)
+            }
+
+        if state.get('ratelimit') is not None:
+            stats['ratelimit'] = {
+                'suppressed': state['ratelimit'].suppressed,
+                'keys': len(state['ratelimit'].buckets)
+            }
+
+        samplers = [policy['sampler'] for policy in
+                    [state.get('requests') or {}] +
+                    list(state.get('requests_policies', {}).values())
+                    if policy.get('sampler') is not None]
+
+        if samplers:
+            stats['sampled_out'] = {}
+
+            for sampler in samplers:
+                for key, count in list(sampler.sampled_out.items()):
+                    stats['sampled_out'][key] = (
+                        stats['sampled_out'].get(key, 0) + count)
+
+        return stats
+
+    def make_stats_blueprint(self, name='logconfig', url='/logconfig/stats'):
+        """Return blueprint that serves :meth:`get_stats` as JSON at `url`
+        or in the Prometheus text format when requested with
+        ``?format=prometheus``. The blueprint isn't registered on any
+        application.
+        """
+        blueprint = flask.Blueprint(name, __name__)
+
+        @blueprint.route(url)
+        def stats():
+            data = self.get_stats()
+
+            if request.args.get('format') == 'prometheus':
+                return current_app.response_class(
+                    format_prometheus(data),
+                    mimetype='text/plain; version=0.0.4')
+
+            return current_app.response_class(
+                json.dumps(data, default=str, sort_keys=True),
+                mimetype='application/json')
+
+        return blueprint
+
+    def get_queue_listeners(self, app=None):
+        """Return list of distinct queue listeners of application. Unlike
+        :meth:`get_listeners`, loggers served by a shared listener don't
+        result in duplicates.
+        """
+        listeners = []
+
+        for listener in self.get_listeners(app).values():
+            listener = getattr(listener, 'listener', listener)
+            if listener not in listeners:
+                listeners.append(listener)
+
+        return listeners
+
     def start_listeners(self, app=None):
         """Start all queue listeners for application."""
         for listener in self.get_listeners(app).values():
             listener.start()
 
     def stop_listeners(self, app=None):
-        """Stop all queue listeners for application."""
-        for listener in self.get_listeners(app).values():
-            listener.stop()
+        """Stop all queue listeners for application after they've handled
+        the records queued before this call.
+        """
+        self.flush(app)
+
+    def flush(self, app=None, timeout=None):
+        """Stop all running queue listeners for application in parallel and
+        wait at most `timeout` seconds in total for them to handle the
+        records queued before this call. When the deadline passes, records
+        still on the queue are discarded so that the listeners stop
+        promptly.
+
+        Returns a ``dict`` with the number of queued records that were
+        ``flushed`` or ``dropped`` and whether the deadline ``timed_out``.
+        """
+        state = self.get_state(app)
+        queue = state['queue']
+        listeners = [listener for listener in self.get_queue_listeners(app)
+                     if is_listener_running(listener)]
+        sentinels = set(id(getattr(listener, '_sentinel', None))
+                        for listener in listeners)
+        pending = queue.qsize() if queue is not None else 0
+        deadline = None if timeout is None else time.time() + timeout
+        stoppers = []
+
+        for listener in listeners:
+            thread = threading.Thread(target=listener.stop)
+            thread.daemon = True
+            thread.start()
+            stoppers.append(thread)
+
+        for thread in stoppers:
+            if deadline is None:
+                thread.join()
+            else:
+                thread.join(max(deadline - time.time(), 0))
+
+        timed_out = any(thread.is_alive() for thread in stoppers)
+        dropped = 0
+
+        if timed_out and queue is not None:
+            dropped = discard_queued_records(queue, sentinels)
+
+            for thread in stoppers:
+                # Handlers may still be emitting records taken off the queue
+                # before they were discarded so give them a moment.
+                thread.join(0.1)
+
+        return {
+            'flushed': max(pending - dropped, 0),
+            'dropped': dropped,
+            'timed_out': timed_out
+        }
 
     def before_request(self):
         """Store information related to start of request."""
-        flask.g.logconfig = {
-            'start': datetime.datetime.now()
-        }
+        active = self.get_state()['requests_active']
+
+        if active is None:
+            active = self.is_any_requests_enabled()
+
+        if not active:
+            return
+
+        policy = self.get_requests_policy(request.endpoint)
+
+        if not (policy['enabled'] or self.is_requests_enabled(policy=policy)):
+            return
+
+        flask.g.logconfig_start = clock_ns()
+        flask.g.logconfig_execution_time = None
 
     def after_request(self, response):
         """Log request."""
-        logger = self.get_requests_logger()
+        active = self.get_state()['requests_active']
+
+        if active is None:
+            active = self.is_any_requests_enabled()
+
+        if not active:
+            return response
+
+        requests = self.get_requests_policy(request.endpoint)
+
+        if not (requests['enabled'] or
+                self.is_requests_enabled(policy=requests)):
+            return response
+
+        slow = self.is_slow_request(requests['slow_threshold'])
+
+        if slow:
+            if not requests['slow_enabled']:
+                return response
+
+            level = requests['slow_level']
+            message_format = requests['slow_message_format']
+        else:
+            if not requests['enabled']:
+                return response
+
+            sampler = requests['sampler']
+
+            if sampler is not None and not sampler.sample(
+                    request.endpoint,
+                    request.path,
+                    response.status_code,
+                    self.get_execution_time):
+                return response
+
+            level = requests['level']
+            message_format = requests['message_format']
+
         data = self.get_request_message_data(response)
-        logger.log(self.config['LOGCONFIG_REQUESTS_LEVEL'],
-                   self.make_request_message(data),
-                   extra={'request': request,
-                          'response': response,
-                          'execution_time': data.get('execution_time')})
+        requests['logger'].log(level,
+                               message_format.render(data),
+                               extra={'request': request,
+                                      'response': response,
+                                      'execution_time': data.get(
+                                          'execution_time'),
+                                      'slow': slow})
 
         return response
 
-    def get_requests_logger(self):
-        """Get designated logger for requests."""
-        if self.config['LOGCONFIG_REQUESTS_LOGGER']:
-            logger = logging.getLogger(
-                self.config['LOGCONFIG_REQUESTS_LOGGER'])
+    def is_slow_request(self, threshold):
+        """Return whether the current request's execution time is at or above
+        `threshold` milliseconds. Always ``False`` when `threshold` is
+        ``None``.
+        """
+        if threshold is None:
+            return False
+
+        execution_time = self.get_execution_time()
+
+        return execution_time is not None and execution_time >= threshold
+
+    def after_request_buffer(self, response):
+        """Flush request's log buffer if response status code is at or above
+        ``LOGCONFIG_BUFFER_FLUSH_STATUS``.
+        """
+        flush_status = self.get_state()['buffer']['flush_status']
+
+        if response.status_code >= flush_status:
+            buffer = get_request_buffer(create=False)
+
+            if buffer is not None:
+                buffer.flush()
+
+        return response
+
+    def teardown_request_buffer(self, exc):
+        """Flush request's log buffer if request ended with an unhandled
+        exception or discard it otherwise.
+        """
+        buffer = get_request_buffer(create=False)
+
+        if buffer is None:
+            return
+
+        if exc is not None:
+            buffer.flush()
         else:
-            logger = self.get_app().logger
+            buffer.clear()
+
+        flask.g.logconfig_buffer = None
 
-        return logger
+    def get_requests_logger(self):
+        """Get designated logger for requests."""
+        return self.get_state()['requests']['logger']
 
     def get_request_message_data(self, response):
-        """Return data for use in request message format string."""
-        data = {}
-
-        # Update with WSGI environ data.
-        data.update(request.environ.copy())
-
-        # Update with request data.
-        data.update({
-            'method': request.method,
-            'path': request.path,
-            'base_url': request.base_url,
-            'url': request.url,
-            'remote_addr': request.remote_addr,
-            'user_agent': request.user_agent
-        })
-
-        # Update with response data.
-        data.update({
-            'status_code': response.status_code,
-            'status': response.status,
-            'execution_time': self.get_execution_time()
-        })
-
-        session_data = defaultdict(lambda: None)
-        session_data.update(dict(session))
-
-        # Update with session data.
-        data.update({
-            'session': session_data
-        })
-
-        return data
+        """Return data for use in request message format string. Values are
+        only computed when the message format accesses them.
+        """
+        return RequestMessageData(response, self.get_execution_time)
 
     def make_request_message(self, data):
         """Return string formatted message for request log message."""
-        return self.config['LOGCONFIG_REQUESTS_MSG_FORMAT'].format(**data)
+        return self.get_state()['requests']['message_format'].render(data)
 
     def get_execution_time(self):
         """Get response time for request in milliseconds."""
-        start = flask.g.get('logconfig', {}).get('start')
-        execution_time = None
+        start = getattr(flask.g, 'logconfig_start', None)
+
+        if start is None:
+            return None
 
-        if start is not None:
-            # Only compute execution time once.
-            if 'execution_time' not in flask.g.logconfig:
-                flask.g.logconfig['execution_time'] = (
-                    milliseconds_between(start, datetime.datetime.now()))
-            execution_time = flask.g.logconfig['execution_time']
+        # Only compute execution time once.
+        execution_time = flask.g.logconfig_execution_time
+
+        if execution_time is None:
+            execution_time = (clock_ns() - start) / 1e6
+            flask.g.logconfig_execution_time = execution_time
 
         return execution_time
 
@@ -278,7 +1846,7 @@ def copy_current_request_context():
     """Return a copy of the current request context which can then be used
     in queued handler processing.
     """
-    top = _request_ctx_stack.top
+    top = get_current_request_context()
     if top is None:  # pragma: no cover
         raise RuntimeError(
             'This function can only be used at local scopes '
@@ -287,11 +1855,200 @@ def copy_current_request_context():
     return top.copy()
 
 
+def discard_queued_records(queue, sentinels=()):
+    """Remove all records from `queue` and return how many were removed.
+    Listener sentinels, identified by their ``id`` in `sentinels`, are put
+    back on the queue.
+    """
+    has_task_done = hasattr(queue, 'task_done')
+    discarded = 0
+    requeue = []
+
+    while True:
+        try:
+            item = queue.get_nowait()
+        except _queue.Empty:
+            break
+
+        if has_task_done:
+            queue.task_done()
+
+        if id(item) in sentinels:
+            requeue.append(item)
+        else:
+            discarded += 1
+
+    for item in requeue:
+        queue.put(item)
+
+    return discarded
+
+
+def handle_queued_records(queue, listeners):
+    """Remove all records from `queue` and handle them synchronously with the
+    listeners that served it and return how many were handled. `listeners`
+    is a ``dict`` of listeners (or routes) keyed by queued logger name.
+    Records are handled by the listener of the nearest queued logger.
+    """
+    has_task_done = hasattr(queue, 'task_done')
+    distinct = []
+    handled = 0
+
+    for listener in listeners.values():
+        listener = getattr(listener, 'listener', listener)
+        if listener not in distinct:
+            distinct.append(listener)
+
+    sentinels = set(id(getattr(listener, '_sentinel', None))
+                    for listener in distinct)
+
+    while distinct:
+        try:
+            item = queue.get_nowait()
+        except _queue.Empty:
+            break
+
+        if has_task_done:
+            queue.task_done()
+
+        if id(item) in sentinels:
+            continue
+
+        if len(distinct) == 1:
+            listener = distinct[0]
+        else:
+            name = getattr(item, 'queue_route', None) or item.name or ''
+
+            while name not in listeners and name:
+                name = name.rpartition('.')[0]
+
+            listener = listeners.get(name)
+
+            if listener is None:  # pragma: no cover
+                continue
+
+            listener = getattr(listener, 'listener', listener)
+
+        listener.handle(item)
+        handled += 1
+
+    return handled
+
+
+class _SharedStateLogConfig(LogConfig):
+    """Extension bound to the state of shared logging whose applications
+    are gone so that it can be torn down.
+    """
+    def __init__(self, state):
+        LogConfig.__init__(self)
+        self.state = state
+
+    def get_state(self, app=None):
+        return self.state
+
+
+def _teardown_shared(shared):
+    # Called when the garbage collector frees the last application which may
+    # happen in a listener thread so the listeners are stopped in another.
+    thread = threading.Thread(
+        target=_SharedStateLogConfig(dict(shared.state)).teardown)
+    thread.daemon = True
+    thread.start()
+
+
+# Maps applications to weak references of their extension so that neither
+# is kept alive by it (e.g. an extension created with ``LogConfig(app)``
+# references its application).
+_queued_apps = weakref.WeakKeyDictionary()
+_shared_logging = SharedLoggingRegistry(on_unused=_teardown_shared)
+
+
+def _iter_queued_apps():
+    # Applications sharing listeners through LOGCONFIG_SHARED are only
+    # yielded once.
+    seen = set()
+
+    for app, ref in list(_queued_apps.items()):
+        # The application state is all that's needed if the extension is
+        # gone already.
+        logcfg = ref() or LogConfig()
+        key = id(logcfg.get_state(app)['listeners'])
+
+        if key not in seen:
+            seen.add(key)
+            yield app, logcfg
+
+
+def _reset_after_fork():
+    for app, logcfg in _iter_queued_apps():
+        logcfg.reset_after_fork(app)
+
+
+def _flush_at_exit():
+    for app, logcfg in _iter_queued_apps():
+        if app.config['LOGCONFIG_QUEUE_FLUSH_AT_EXIT']:
+            timeout = app.config['LOGCONFIG_QUEUE_FLUSH_TIMEOUT']
+            logcfg.flush(app,
+                         None if timeout is None else timeout / 1000.0)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Registered on import so that it runs before logging.shutdown() closes the
+# handlers of the listeners.
+atexit.register(_flush_at_exit)
+
+
+def load_config_dict(config, cache_dir=None):
+    """Return ``dictConfig`` style ``dict`` from `config` which may be a
+    ``dict`` or a path to a JSON or YAML file. Files are loaded with
+    :func:`load_config_file` using `cache_dir`.
+
+    Raises:
+        FlaskLogConfigException: If `config` can't be loaded as a ``dict``.
+    """
+    if isinstance(config, dict):
+        return config
+
+    if is_config_file(config):
+        return load_config_file(config, cache_dir)
+
+    raise FlaskLogConfigException(
+        'LOGCONFIG must be a dict or a JSON or YAML file path when '
+        'LOGCONFIG_AGGREGATOR is used: {0!r}'.format(config))
+
+
+def is_listener_running(listener):
+    """Return whether queue `listener` has been started."""
+    if hasattr(listener, 'is_running'):
+        return bool(listener.is_running)
+    return getattr(listener, '_thread', None) is not None
+
+
+def get_current_request_context():
+    """Return the active request context or ``None``. Works with both the
+    request context stack of older Flask versions and the context variable
+    based request context of newer ones.
+    """
+    if _request_ctx is None:  # pragma: no cover
+        return _request_ctx_stack.top
+
+    if not has_request_context():
+        return None
+
+    return _request_ctx._get_current_object()
+
+
 @contextlib.contextmanager
 def request_context_from_record(record=None):
     """Context manager for Flask request context attached to log record or if
     one doesn't exist, then from top of request context stack.
 
+    If the record was prepared with a :class:`RequestSnapshot` instead of a
+    request context, then the snapshot is yielded and no request context is
+    pushed.
+
     Raises:
         FlaskLogConfigException: If no request context exists on `record` or
             stack.
@@ -299,14 +2056,128 @@ def request_context_from_record(record=None):
     if hasattr(record, 'request_context'):
         with record.request_context as ctx:
             yield ctx
+    elif hasattr(record, 'request_snapshot'):
+        yield record.request_snapshot
     elif has_request_context():
-        yield _request_ctx_stack.top
+        yield get_current_request_context()
     else:
         raise FlaskLogConfigException('No request context found on log record')
 
 
-def milliseconds_between(start, stop):
-    """Return milliseconds between `start` and `stop` datetime objects."""
-    diff = stop - start
-    return ((diff.days * 24 * 60 * 60 + diff.seconds) * 1000 +
-            diff.microseconds / 1000.0)
+def create_app_logger(app, keep_handlers=False):
+    """Create Flask's application logger before logging is set up for it.
+    Flask < 1.0 replaces the handlers of the logger named after the
+    application and turns off its propagation when ``app.logger`` is first
+    accessed which would drop handlers set up for it earlier. With
+    `keep_handlers`, the logger's current class, handlers, and propagation
+    are kept. Since Flask's logger class and handlers reference the
+    application, this also doesn't keep the application alive.
+    """
+    name = getattr(app, 'logger_name', None)
+
+    if name is None:
+        # Flask 1.0+ keeps the handlers of an existing logger.
+        return
+
+    logger = logging.getLogger(name)
+    logger_class = logger.__class__
+    handlers = logger.handlers[:]
+    propagate = logger.propagate
+
+    app.logger
+
+    if keep_handlers:
+        logger.__class__ = logger_class
+        logger.handlers[:] = handlers
+        logger.propagate = propagate
+
+
+def get_session_data():
+    """Return copy of session data that returns ``None`` for missing keys."""
+    session_data = defaultdict(lambda: None)
+    session_data.update(dict(session))
+    return session_data
+
+
+def parse_format_fields(format_string):
+    """Yield unique top-level field names referenced by `format_string`,
+    including those nested inside format specs.
+
+    Raises:
+        ValueError: If `format_string` is malformed or uses positional fields.
+    """
+    seen = set()
+
+    for _, field_name, format_spec, _ in string.Formatter().parse(
+            format_string):
+        if field_name is None:
+            continue
+
+        name = re.split(r'[.\[]', field_name, 1)[0]
+
+        if not name or name.isdigit():
+            raise ValueError('positional fields are not supported')
+
+        if name not in seen:
+            seen.add(name)
+            yield name
+
+        for name in parse_format_fields(format_spec or ''):
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+
+def get_level(level):
+    """Return numeric log level from `level` which may be an ``int`` or a
+    level name like ``'INFO'``.
+
+    Raises:
+        FlaskLogConfigException: If `level` is an unknown level name.
+    """
+    if isinstance(level, int):
+        return level
+
+    value = logging.getLevelName(str(level).upper())
+
+    if not isinstance(value, int):
+        raise FlaskLogConfigException('Unknown log level: {0!r}'
+                                      .format(level))
+
+    return value
+
+
+def get_json_dumps(backend=None):
+    """Return function that serializes an object to a compact JSON string
+    using `backend` which is one of ``'orjson'``, ``'ujson'``, or
+    ``'json'``. When `backend` is ``None``, the first of those that can be
+    imported is used. Forward slashes aren't escaped and, with ``'orjson'``
+    and ``'json'``, values that aren't JSON types are converted to strings.
+
+    Raises:
+        FlaskLogConfigException: If `backend` is unknown or can't be
+            imported.
+    """
+    backends = ('orjson', 'ujson', 'json')
+
+    if backend is not None and backend not in backends:
+        raise FlaskLogConfigException('Unknown JSON backend: {0!r}'
+                                      .format(backend))
+
+    for name in ([backend] if backend else backends):
+        try:
+            module = __import__(name)
+        except ImportError:
+            if backend:
+                raise FlaskLogConfigException(
+                    'JSON backend {0!r} is not installed'.format(backend))
+            continue
+
+        if name == 'orjson':
+            return lambda obj: module.dumps(obj, default=str).decode('utf-8')
+        elif name == 'ujson':
+            return lambda obj: module.dumps(obj, escape_forward_slashes=False)
+        else:
+            return lambda obj: module.dumps(obj,
+                                            separators=(',', ':'),
+                                            default=str)
@@ -0,0 +1,333 @@
+"""Multiprocess log aggregation used by Flask-LogConfig.
+
+Worker processes ship their log records over a socket to a single aggregator
+process which owns the real log handlers.
+"""
+
+import copy
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import struct
+
+try:
+    import socketserver
+except ImportError:  # pragma: no cover
+    import SocketServer as socketserver
+
+from .loaders import configure_logging
+from .records import STANDARD_RECORD_ATTRS, RecordCodec
+
+
+__all__ = (
+    'AggregatorHandler',
+    'AggregatorServer',
+    'run_aggregator',
+    'start_aggregator',
+    'strip_handlers',
+)
+
+
+#: Frame header of length and type of the frame's payload.
+FRAME = struct.Struct('>LB')
+
+#: Frame type of strings interned by the worker's codec. The payload starts
+#: with the string table index of the first string.
+STRINGS_FRAME = 0
+
+#: Index of the first string inside a strings frame.
+STRINGS_START = struct.Struct('>L')
+
+#: Frame type of a record.
+RECORD_FRAME = 1
+
+#: Length prefix of an encoded record inside a record frame.
+RECORD_LENGTH = struct.Struct('>L')
+
+#: Record attributes that are never shipped to the aggregator since they
+#: reference objects or queue routes that only make sense inside the worker
+#: process.
+OMITTED_RECORD_ATTRS = frozenset([
+    'queue_route',
+    'request_context',
+    'request',
+    'response',
+])
+
+
+def split_address(address):
+    """Return ``(host, port)`` for a TCP `address` tuple or
+    ``(path, None)`` for a Unix socket path.
+    """
+    if isinstance(address, (tuple, list)):
+        return address[0], address[1]
+    return address, None
+
+
+class AggregatorHandler(logging.handlers.SocketHandler):
+    """Handler that ships records to an aggregator process.
+
+    Records are encoded with a :class:`.RecordCodec` so that logger names,
+    source locations, and the like are only sent once per connection. Extra
+    record attributes are sent as JSON (values that can't be serialized are
+    sent as their ``repr``) except for the Flask request context, request,
+    and response objects. Neither are queue routes of the worker's queued
+    loggers. Nothing sent by a worker is unpickled by the aggregator. The
+    connection is (re)established lazily so the handler is safe to use after
+    a fork.
+
+    Args:
+        address (mixed): Unix socket path or ``(host, port)`` tuple of the
+            aggregator.
+    """
+    def __init__(self, address):
+        host, port = split_address(address)
+        logging.handlers.SocketHandler.__init__(self, host, port)
+        self.closeOnError = True
+        self.codec = RecordCodec(routes=False)
+        self.sent_strings = 1
+
+    def makePickle(self, record):
+        """Return frames that ship `record` and any strings interned since
+        the last shipped record.
+        """
+        self.check_connection()
+        return self.make_frames(record)
+
+    def check_connection(self):
+        """Make the next frames resend all strings if there's no open
+        connection since ``send()`` will open a new one.
+        """
+        if self.sock is None:
+            self.sent_strings = 1
+
+    def make_frames(self, record):
+        """Return frames that ship `record` and any strings interned since
+        the last call.
+        """
+        data = self.codec.encode(record)
+        extra = dict((key, value) for key, value in record.__dict__.items()
+                     if key not in STANDARD_RECORD_ATTRS and
+                     key not in OMITTED_RECORD_ATTRS)
+        frames = []
+
+        if len(self.codec.strings) > self.sent_strings:
+            frames.append(make_frame(
+                STRINGS_FRAME,
+                STRINGS_START.pack(self.sent_strings) +
+                self.codec.dump_strings(self.sent_strings)))
+            self.sent_strings = len(self.codec.strings)
+
+        payload = RECORD_LENGTH.pack(len(data)) + data
+
+        if extra:
+            payload += dump_extra(extra)
+
+        frames.append(make_frame(RECORD_FRAME, payload))
+
+        return b''.join(frames)
+
+    def emit_batch(self, records):
+        """Ship `records` with a single send."""
+        # The connection is only checked once since it isn't opened until
+        # the whole batch is sent.
+        self.check_connection()
+        self.send(b''.join(self.make_frames(record) for record in records))
+
+    def reset_after_fork(self):
+        """Drop connection inherited from the parent process so that the
+        child opens its own.
+        """
+        self.sock = None
+        self.retryTime = None
+
+
+class AggregatorRequestHandler(socketserver.StreamRequestHandler):
+    """Read frames from a worker connection and handle the records they
+    contain using the aggregator process' loggers.
+    """
+    def handle(self):
+        codec = RecordCodec()
+
+        while True:
+            header = self.rfile.read(FRAME.size)
+
+            if len(header) < FRAME.size:
+                break
+
+            size, frame_type = FRAME.unpack(header)
+            payload = self.rfile.read(size)
+
+            if len(payload) < size:  # pragma: no cover
+                break
+
+            if frame_type == STRINGS_FRAME:
+                codec.load_strings(payload[STRINGS_START.size:],
+                                   STRINGS_START.unpack_from(payload)[0])
+                continue
+
+            length = RECORD_LENGTH.unpack_from(payload)[0]
+            offset = RECORD_LENGTH.size + length
+
+            try:
+                extra = load_extra(payload[offset:]) if size > offset else None
+            except ValueError:
+                # Drop connections sending anything but JSON extras.
+                break
+
+            record = codec.decode(payload[RECORD_LENGTH.size:offset], extra)
+            logging.getLogger(record.name).handle(record)
+
+
+def make_frame(frame_type, payload):
+    """Return `payload` prefixed with a frame header."""
+    return FRAME.pack(len(payload), frame_type) + payload
+
+
+def dump_extra(extra):
+    """Return `extra` record attributes encoded as JSON replacing values that
+    can't be serialized with their ``repr``.
+    """
+    return json.dumps(extra, default=repr).encode('utf-8')
+
+
+def load_extra(data):
+    """Return `extra` record attributes decoded from JSON `data`.
+
+    Raises:
+        ValueError: If `data` isn't a JSON object.
+    """
+    extra = json.loads(data.decode('utf-8'))
+
+    if not isinstance(extra, dict):
+        raise ValueError('Record extras must be a JSON object')
+
+    return extra
+
+
+class TCPAggregatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class UnixAggregatorServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:  # pragma: no cover
+    UnixAggregatorServer = None
+
+
+class AggregatorServer(object):
+    """Socket server that receives records from workers and handles them.
+
+    Args:
+        address (mixed): Unix socket path or ``(host, port)`` tuple to listen
+            on. An existing file at a Unix socket path is removed first.
+    """
+    def __init__(self, address):
+        host, port = split_address(address)
+
+        if port is None:
+            if os.path.exists(host):
+                os.unlink(host)
+            server_class = UnixAggregatorServer
+            server_address = host
+        else:
+            server_class = TCPAggregatorServer
+            server_address = (host, port)
+
+        self.server = server_class(server_address, AggregatorRequestHandler)
+        self.address = self.server.server_address
+
+    def serve_forever(self):
+        """Handle connections until :meth:`shutdown` is called."""
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """Stop serving and close the server socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def strip_handlers(config):
+    """Return copy of ``dictConfig`` style `config` without any handlers so
+    that applying it only sets up loggers, levels, and filters. Loggers that
+    don't propagate are made to propagate so their records still reach the
+    queued root logger.
+    """
+    config = copy.deepcopy(config)
+    config['handlers'] = {}
+
+    for logger_config in config.get('loggers', {}).values():
+        logger_config.pop('handlers', None)
+
+        if not logger_config.get('propagate', True):
+            logger_config['propagate'] = True
+
+    if 'root' in config:
+        config['root'].pop('handlers', None)
+
+    return config
+
+
+def remove_handlers():
+    """Remove handlers of the root logger and all other loggers."""
+    loggers = [logging.getLogger()]
+    loggers.extend(logger for logger in
+                   list(logging.Logger.manager.loggerDict.values())
+                   if isinstance(logger, logging.Logger))
+
+    for logger in loggers:
+        del logger.handlers[:]
+
+
+def run_aggregator(address, config=None, ready=None, cache_dir=None):
+    """Configure logging from `config` and handle records shipped to
+    `address` until the process is terminated. Handlers inherited from a
+    forked parent process are removed first.
+
+    Args:
+        address (mixed): Unix socket path or ``(host, port)`` tuple to listen
+            on.
+        config (mixed, optional): Logging configuration passed to
+            :func:`.configure_logging`.
+        ready (Event, optional): Event to set once the server is listening.
+        cache_dir (str, optional): Directory of precompiled configuration
+            files passed to :func:`.configure_logging`.
+    """
+    # Handlers inherited from a forked parent process would ship records
+    # back to the aggregator (e.g. the queued root logger of a worker).
+    remove_handlers()
+
+    if config:
+        configure_logging(config, cache_dir)
+
+    server = AggregatorServer(address)
+
+    if ready is not None:
+        ready.set()
+
+    try:
+        server.serve_forever()
+    finally:  # pragma: no cover
+        server.shutdown()
+
+
+def start_aggregator(address, config=None, timeout=10, cache_dir=None):
+    """Start :func:`run_aggregator` in a daemon process and return the
+    process once it's listening.
+    """
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=run_aggregator,
+                                      args=(address,
+                                            config,
+                                            ready,
+                                            cache_dir),
+                                      name='flask-logconfig-aggregator')
+    process.daemon = True
+    process.start()
+    ready.wait(timeout)
+
+    return process
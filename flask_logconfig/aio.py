@@ -0,0 +1,196 @@
+"""Asyncio based queue listener used by Flask-LogConfig.
+
+This module requires Python 3.7+ and is only imported when
+``LOGCONFIG_QUEUE_ASYNCIO`` is enabled.
+"""
+
+import asyncio
+from collections import deque
+import queue as _queue
+import threading
+import time
+
+from .listeners import RoutingQueueListener
+
+
+__all__ = (
+    'AsyncQueue',
+    'AsyncioQueueListener',
+)
+
+
+class AsyncQueue(object):
+    """Queue that is filled from any thread and drained from an asyncio event
+    loop.
+
+    Producers use the same ``put``/``put_nowait`` API as ``queue.Queue`` (and
+    raise ``queue.Full`` the same way) so it works with queue handlers and
+    overflow policies. The consumer awaits :meth:`get_async` without blocking
+    its event loop. When `maxsize` is reached, blocking ``put`` calls wait
+    until the consumer catches up which provides backpressure.
+
+    Args:
+        maxsize (int, optional): Maximum number of queued items. Values less
+            than or equal to ``0`` mean unbounded. Defaults to ``0``.
+    """
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize if maxsize > 0 else 0
+        self._items = deque()
+        self._mutex = threading.Lock()
+        self._not_full = threading.Condition(self._mutex)
+        self._waiter = None
+
+    def qsize(self):
+        """Return number of queued items."""
+        return len(self._items)
+
+    def empty(self):
+        """Return whether queue is empty."""
+        return not self._items
+
+    def full(self):
+        """Return whether queue is full."""
+        return 0 < self.maxsize <= len(self._items)
+
+    def put(self, item, block=True, timeout=None):
+        """Put `item` on the queue, waiting up to `timeout` seconds for room
+        if `block` is ``True``.
+
+        Raises:
+            queue.Full: If there is no room on the queue.
+        """
+        with self._not_full:
+            if self.maxsize:
+                if not block:
+                    if len(self._items) >= self.maxsize:
+                        raise _queue.Full
+                elif timeout is None:
+                    while len(self._items) >= self.maxsize:
+                        self._not_full.wait()
+                else:
+                    deadline = time.time() + timeout
+                    while len(self._items) >= self.maxsize:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise _queue.Full
+                        self._not_full.wait(remaining)
+
+            self._items.append(item)
+            self._wakeup()
+
+    def put_nowait(self, item):
+        """Put `item` on the queue without waiting for room."""
+        self.put(item, False)
+
+    def get_nowait(self):
+        """Remove and return an item from the queue without waiting.
+
+        Raises:
+            queue.Empty: If the queue is empty.
+        """
+        with self._mutex:
+            if not self._items:
+                raise _queue.Empty
+            return self._pop()
+
+    async def get_async(self):
+        """Remove and return an item from the queue, waiting for one to be
+        available without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            with self._mutex:
+                if self._items:
+                    return self._pop()
+
+                future = loop.create_future()
+                self._waiter = (loop, future)
+
+            await future
+
+    def _pop(self):
+        item = self._items.popleft()
+        self._not_full.notify()
+        return item
+
+    def _wakeup(self):
+        if self._waiter is not None:
+            loop, future = self._waiter
+            self._waiter = None
+            loop.call_soon_threadsafe(_resolve, future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncioQueueListener(RoutingQueueListener):
+    """Queue listener that drains an :class:`AsyncQueue` from an asyncio event
+    loop running in its own thread.
+
+    Handlers that define a coroutine method ``emit_async(record)`` are
+    awaited one record at a time (after their level and filters have been
+    checked) so a slow async handler applies backpressure to the queue
+    instead of blocking a thread. All other handlers are called with
+    ``handler.handle(record)`` as usual. Records are routed the same way as
+    :class:`RoutingQueueListener`.
+
+    When the listener is started, it runs :meth:`serve` in a new event loop
+    in a background thread. To drain the queue from an existing event loop
+    instead, schedule :meth:`serve` on it and don't call :meth:`start`.
+
+    Args:
+        queue (AsyncQueue): Queue to listen on.
+        *handlers: Handlers to dispatch records that match no route to.
+    """
+    def __init__(self, queue, *handlers, **kargs):
+        # Only one event loop can consume the queue.
+        kargs['threads'] = 1
+        RoutingQueueListener.__init__(self, queue, *handlers, **kargs)
+
+    async def serve(self):
+        """Handle records from the queue until the sentinel is seen."""
+        while True:
+            record = await self.queue.get_async()
+
+            if record is self._sentinel:
+                break
+
+            await self.handle_async(record)
+
+    async def handle_async(self, record):
+        """Dispatch `record` to its route's handlers awaiting async ones."""
+        record = self.prepare(record)
+
+        if self.stats is not None:
+            self.stats.dequeued(record)
+
+        for handler in self.get_handlers(record):
+            if record.levelno < handler.level:
+                continue
+
+            emit_async = getattr(handler, 'emit_async', None)
+            start = time.perf_counter()
+
+            if emit_async is None:
+                handler.handle(record)
+            elif handler.filter(record):
+                try:
+                    await emit_async(record)
+                except Exception:
+                    handler.handleError(record)
+
+            if self.stats is not None:
+                self.stats.emitted(handler,
+                                   (time.perf_counter() - start) * 1000)
+
+    def _monitor(self):
+        """Run :meth:`serve` in a new event loop."""
+        loop = asyncio.new_event_loop()
+
+        try:
+            loop.run_until_complete(self.serve())
+        finally:
+            loop.close()
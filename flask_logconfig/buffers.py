@@ -0,0 +1,156 @@
+"""Per-request log record buffering used by Flask-LogConfig.
+"""
+
+from collections import deque
+import logging
+
+import flask
+from flask import has_request_context
+
+
+__all__ = (
+    'RequestBuffer',
+    'RequestBufferHandler',
+    'bufferify_logger',
+    'get_request_buffer',
+)
+
+
+class RequestBuffer(object):
+    """Log records held back during a single request.
+
+    Records are stored together with the :class:`RequestBufferHandler` that
+    buffered them so that flushing emits each record to the handlers it was
+    originally bound for, in the order the records were logged. Once flushed,
+    the buffer is triggered and further records bypass it for the rest of the
+    request.
+
+    Args:
+        capacity (int, optional): Maximum number of records to hold. When
+            full, the oldest records are discarded. Defaults to ``1000``.
+
+    Attributes:
+        triggered (bool): Whether the buffer has been flushed.
+        dropped (int): Number of records discarded because of `capacity`.
+    """
+    def __init__(self, capacity=1000):
+        self.entries = deque(maxlen=capacity)
+        self.triggered = False
+        self.dropped = 0
+
+    def append(self, handler, record):
+        """Hold `record` for `handler`."""
+        if len(self.entries) == self.entries.maxlen:
+            self.dropped += 1
+        self.entries.append((handler, record))
+
+    def flush(self):
+        """Emit all held records and trigger buffer."""
+        self.triggered = True
+
+        while self.entries:
+            handler, record = self.entries.popleft()
+            handler.dispatch(record)
+
+    def clear(self):
+        """Discard all held records."""
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RequestBufferHandler(logging.Handler):
+    """Handler that holds records below `pass_level` in a per-request
+    :class:`RequestBuffer` instead of passing them on to its `handlers`.
+
+    A record at or above `flush_level` flushes the request's buffer before
+    being passed on. Other records at or above `pass_level` are passed on
+    immediately without flushing the buffer. Outside of a request context,
+    records are passed on immediately. Like ``logconfig.QueueListener``, each
+    handler's level is respected when passing records on.
+
+    Args:
+        handlers (list): Handlers to pass records on to.
+        flush_level (int, optional): Level at or above which the buffer is
+            flushed. Defaults to ``logging.ERROR``.
+        pass_level (int, optional): Level at or above which records aren't
+            buffered. Defaults to ``logging.WARNING``.
+        capacity (int, optional): Capacity of request buffers created by this
+            handler. Defaults to ``1000``.
+    """
+    def __init__(self,
+                 handlers=(),
+                 flush_level=logging.ERROR,
+                 capacity=1000,
+                 pass_level=logging.WARNING):
+        logging.Handler.__init__(self)
+        self.handlers = tuple(handlers)
+        self.flush_level = flush_level
+        self.capacity = capacity
+        self.pass_level = pass_level
+
+    def handle(self, record):
+        """Buffer or pass on `record` if it passes this handler's filters."""
+        if not self.filter(record):
+            return False
+
+        if not has_request_context():
+            self.dispatch(record)
+            return True
+
+        buffer = get_request_buffer(self.capacity)
+
+        if buffer.triggered:
+            self.dispatch(record)
+        elif record.levelno >= self.flush_level:
+            buffer.flush()
+            self.dispatch(record)
+        elif record.levelno >= self.pass_level:
+            self.dispatch(record)
+        else:
+            buffer.append(self, record)
+
+        return True
+
+    def emit(self, record):  # pragma: no cover
+        self.handle(record)
+
+    def dispatch(self, record):
+        """Pass `record` on to handlers."""
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def get_request_buffer(capacity=1000, create=True):
+    """Return the current request's :class:`RequestBuffer`, creating it with
+    `capacity` if it doesn't exist and `create` is ``True``.
+    """
+    buffer = getattr(flask.g, 'logconfig_buffer', None)
+
+    if buffer is None and create:
+        buffer = flask.g.logconfig_buffer = RequestBuffer(capacity)
+
+    return buffer
+
+
+def bufferify_logger(logger, buffer_handler):
+    """Replace logger's handlers with `buffer_handler` while adding existing
+    handlers to it.
+
+    Args:
+        logger (mixed): Logger instance or string name of logger.
+        buffer_handler (RequestBufferHandler): Handler to buffer records with.
+    """
+    if not isinstance(logger, logging.Logger):
+        logger = logging.getLogger(logger)
+
+    handlers = [hdlr for hdlr in logger.handlers
+                if hdlr not in buffer_handler.handlers and
+                hdlr is not buffer_handler]
+
+    buffer_handler.handlers = tuple(list(buffer_handler.handlers) + handlers)
+
+    del logger.handlers[:]
+    logger.addHandler(buffer_handler)
@@ -0,0 +1,86 @@
+"""Log record enrichers used by Flask-LogConfig.
+
+An enricher is a callable that receives a log record while the request that
+logged it is still active and sets plain attributes on it. Queued records
+carry those attributes to the listener thread so handlers and formatters
+don't need to push a copy of the request context to access them.
+"""
+
+import logging
+import uuid
+
+import flask
+from flask import has_request_context, request
+
+
+__all__ = (
+    'RequestIdFilter',
+)
+
+
+class RequestIdFilter(logging.Filter):
+    """Logging filter that sets the current request's ID on each record.
+
+    The ID is taken from the request header named `header` (e.g. set by a
+    load balancer) or, if it's missing, generated once per request. It's
+    stored as ``flask.g.logconfig_request_id`` so all records of a request
+    share the same ID. Records logged outside of a request get ``None``.
+    Records that already have the attribute, e.g. since they were enriched
+    before being queued, are left alone.
+
+    Instances are callable so they can also be registered as an enricher
+    with ``LogConfig.add_enricher``.
+
+    Args:
+        header (str, optional): Request header holding the ID. Defaults to
+            ``'X-Request-ID'``. Use ``None`` to always generate IDs.
+        attr (str, optional): Record attribute to set. Defaults to
+            ``'request_id'``.
+        generate (bool, optional): Whether to generate an ID when the header
+            is missing. Defaults to ``True``.
+        name (str, optional): Logger name passed to ``logging.Filter``.
+    """
+    def __init__(self,
+                 header='X-Request-ID',
+                 attr='request_id',
+                 generate=True,
+                 name=''):
+        logging.Filter.__init__(self, name)
+        self.header = header
+        self.attr = attr
+        self.generate = generate
+
+    def get_request_id(self):
+        """Return ID of the current request or ``None`` outside of a
+        request.
+        """
+        if not has_request_context():
+            return None
+
+        request_id = getattr(flask.g, 'logconfig_request_id', None)
+
+        if request_id is None:
+            if self.header:
+                request_id = request.headers.get(self.header)
+
+            if request_id is None and self.generate:
+                request_id = uuid.uuid4().hex
+
+            flask.g.logconfig_request_id = request_id
+
+        return request_id
+
+    def filter(self, record):
+        """Set request ID on `record` and return whether it passes the
+        logger name filter.
+        """
+        if not logging.Filter.filter(self, record):
+            return False
+
+        if getattr(record, self.attr, None) is None:
+            setattr(record, self.attr, self.get_request_id())
+
+        return True
+
+    def __call__(self, record):
+        self.filter(record)
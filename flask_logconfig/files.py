@@ -0,0 +1,322 @@
+"""Buffered file logging used by Flask-LogConfig.
+
+:class:`BufferedFileHandler` is meant to run behind a queue listener. Instead
+of writing and flushing every record like ``logging.FileHandler``, it collects
+encoded lines in memory and writes them with a single ``os.writev`` call when
+the buffer is full, when a record at or above a flush level is emitted, or
+when a flush interval elapses.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+__all__ = (
+    'BufferedFileHandler',
+)
+
+
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    IOV_MAX = 1024
+
+if IOV_MAX <= 0:  # pragma: no cover
+    IOV_MAX = 1024
+
+
+def write_chunks(fd, chunks):
+    """Write all byte strings of `chunks` to file descriptor `fd` using as
+    few ``os.writev`` calls as possible. Fall back to ``os.write`` of the
+    joined chunks where ``os.writev`` isn't available. Return number of bytes
+    written.
+    """
+    total = sum(len(chunk) for chunk in chunks)
+
+    if not hasattr(os, 'writev'):  # pragma: no cover
+        data = b''.join(chunks)
+        while data:
+            data = data[os.write(fd, data):]
+        return total
+
+    index = 0
+    count = len(chunks)
+
+    while index < count:
+        written = os.writev(fd, chunks[index:index + IOV_MAX])
+
+        # Skip chunks that were written completely and keep the rest of a
+        # partially written one.
+        while index < count and written >= len(chunks[index]):
+            written -= len(chunks[index])
+            index += 1
+
+        if written:
+            chunks[index] = chunks[index][written:]
+
+    return total
+
+
+class BufferedFileHandler(logging.Handler):
+    """Logging handler that buffers formatted records in memory and writes
+    them to a file in batches.
+
+    The buffer is written when it holds at least `buffer_size` bytes, when a
+    record at or above `flush_level` is emitted, and every `flush_interval`
+    seconds by a background thread. Unwritten records are lost if the
+    process crashes, so keep `flush_interval` short when that matters.
+
+    When `max_bytes` and `backup_count` are both set, the file is rotated like
+    with ``logging.handlers.RotatingFileHandler``. The file size is tracked in
+    memory and rotation only renames files, so it doesn't block the thread
+    emitting records for long.
+
+    The handler implements ``emit_batch`` so when its logger is queued with
+    ``LOGCONFIG_QUEUE`` and ``LOGCONFIG_QUEUE_BATCH_SIZE`` a whole batch is
+    buffered at once.
+
+    Args:
+        filename (str): Path of the log file.
+        buffer_size (int, optional): Number of buffered bytes that triggers a
+            write. Defaults to ``65536``.
+        flush_interval (float, optional): Seconds between writes of the
+            buffer by the background thread. Use ``None`` to not start it.
+            Defaults to ``1.0``.
+        flush_level (int|str, optional): Records at or above this level
+            trigger a write. Defaults to ``logging.ERROR``.
+        max_bytes (int, optional): Size at which the file is rotated.
+            Defaults to ``0`` which never rotates.
+        backup_count (int, optional): Number of rotated files to keep.
+            Defaults to ``0``.
+        encoding (str, optional): Encoding of the log file. Defaults to
+            ``'utf-8'``.
+        level (int, optional): Level of the handler. Defaults to
+            ``logging.NOTSET``.
+    """
+    terminator = '\n'
+
+    def __init__(self,
+                 filename,
+                 buffer_size=65536,
+                 flush_interval=1.0,
+                 flush_level=logging.ERROR,
+                 max_bytes=0,
+                 backup_count=0,
+                 encoding='utf-8',
+                 level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+
+        if not isinstance(flush_level, int):
+            flush_level = logging.getLevelName(str(flush_level).upper())
+
+            if not isinstance(flush_level, int):
+                raise ValueError('Unknown flush level')
+
+        self.filename = os.path.abspath(filename)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.encoding = encoding
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.time()
+        self.fd = None
+        self.file_size = 0
+        self.pid = None
+        self._timer = None
+        self._stopped = None
+
+        self.open()
+
+    def open(self):
+        """Open the log file for appending and start the flush timer."""
+        self.fd = os.open(self.filename,
+                          os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                          0o644)
+        self.file_size = os.fstat(self.fd).st_size
+        self.pid = os.getpid()
+        self.start_timer()
+
+    def start_timer(self):
+        """Start background thread that writes the buffer every
+        `flush_interval` seconds.
+        """
+        if not self.flush_interval:
+            return
+
+        self._stopped = threading.Event()
+        self._timer = threading.Thread(target=self._run_timer,
+                                       args=(self._stopped,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_timer(self):
+        """Stop the flush timer thread."""
+        if self._timer is None:
+            return
+
+        self._stopped.set()
+
+        if self._timer is not threading.current_thread():
+            self._timer.join()
+
+        self._timer = None
+
+    def _run_timer(self, stopped):
+        while not stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                if logging.raiseExceptions:  # pragma: no cover
+                    traceback.print_exc(file=sys.stderr)
+
+    def reset_after_fork(self):
+        """Discard records buffered by the parent process and restart the
+        flush timer in a forked child process.
+        """
+        self.buffer = []
+        self.buffered = 0
+        self.pid = os.getpid()
+        self._timer = None
+        self.start_timer()
+
+    def should_flush(self, record):
+        """Return whether the buffer should be written after buffering
+        `record`.
+        """
+        return (self.buffered >= self.buffer_size or
+                record.levelno >= self.flush_level or
+                (self.flush_interval is not None and
+                 time.time() - self.last_flush >= self.flush_interval))
+
+    def buffer_record(self, record):
+        """Format and encode `record` and add it to the buffer."""
+        data = (self.format(record) + self.terminator).encode(self.encoding)
+        self.buffer.append(data)
+        self.buffered += len(data)
+
+    def emit(self, record):
+        """Buffer `record` and write the buffer when needed."""
+        try:
+            if self.pid != os.getpid():
+                self.reset_after_fork()
+
+            self.buffer_record(record)
+
+            if self.should_flush(record):
+                self.write_buffer()
+        except Exception:
+            self.handleError(record)
+
+    def emit_batch(self, records):
+        """Buffer `records` and write the buffer once when needed. Called by
+        ``BatchQueueListener`` with the handler's lock acquired.
+        """
+        if self.pid != os.getpid():
+            self.reset_after_fork()
+
+        flush = False
+
+        for record in records:
+            try:
+                self.buffer_record(record)
+            except Exception:
+                self.handleError(record)
+                continue
+
+            flush = flush or record.levelno >= self.flush_level
+
+        if flush or (records and self.should_flush(records[-1])):
+            self.write_buffer()
+
+    def write_buffer(self):
+        """Write all buffered records to the file rotating it when
+        needed.
+        """
+        chunks = self.buffer
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.time()
+
+        if not chunks or self.fd is None:
+            return
+
+        if self.max_bytes > 0 and self.backup_count > 0:
+            start = 0
+            size = self.file_size
+
+            for index, chunk in enumerate(chunks):
+                if size and size + len(chunk) > self.max_bytes:
+                    self.write_chunks(chunks[start:index])
+                    self.rotate()
+                    start = index
+                    size = 0
+
+                size += len(chunk)
+
+            chunks = chunks[start:]
+
+        self.write_chunks(chunks)
+
+    def write_chunks(self, chunks):
+        """Write `chunks` to the file and track its size."""
+        if chunks:
+            self.file_size += write_chunks(self.fd, chunks)
+
+    def get_backup_filename(self, index):
+        """Return filename of rotated file number `index`."""
+        return '{0}.{1}'.format(self.filename, index)
+
+    def rotate(self):
+        """Rename the current file and older rotated files and open a new
+        file.
+        """
+        os.close(self.fd)
+        replace = getattr(os, 'replace', os.rename)
+
+        try:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self.get_backup_filename(index)
+
+                if os.path.exists(source):
+                    replace(source, self.get_backup_filename(index + 1))
+
+            replace(self.filename, self.get_backup_filename(1))
+        finally:
+            # Keep logging to the current file if renaming failed.
+            self.fd = os.open(self.filename,
+                              os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                              0o644)
+            self.file_size = os.fstat(self.fd).st_size
+
+    def flush(self):
+        """Write all buffered records to the file."""
+        self.acquire()
+        try:
+            if self.pid == os.getpid():
+                self.write_buffer()
+        finally:
+            self.release()
+
+    def close(self):
+        """Stop the flush timer, write buffered records, and close the
+        file.
+        """
+        self.stop_timer()
+
+        self.acquire()
+        try:
+            if self.fd is not None:
+                self.flush()
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.release()
+
+        logging.Handler.close(self)
@@ -0,0 +1,369 @@
+"""Queue listeners used by Flask-LogConfig.
+"""
+
+import logging
+import threading
+import time
+
+try:
+    from time import perf_counter as clock
+except ImportError:  # pragma: no cover
+    from time import time as clock
+
+try:
+    from logging.handlers import QueueListener
+except ImportError:  # pragma: no cover
+    from logutils.queue import QueueListener
+
+from .records import PackedRecord
+
+try:
+    import queue as _queue
+except ImportError:  # pragma: no cover
+    import Queue as _queue
+
+
+__all__ = (
+    'BatchQueueListener',
+    'QueueRoute',
+    'RoutingQueueListener',
+    'queuify_logger',
+)
+
+
+class QueueRoute(object):
+    """Handlers of a single queued logger served by a shared
+    :class:`RoutingQueueListener`.
+
+    A route quacks enough like a queue listener that it can be passed to
+    :func:`queuify_logger` and stored as an application's listener.
+    Starting or stopping a route starts or stops the shared listener.
+
+    Attributes:
+        listener (RoutingQueueListener): Listener that serves this route.
+        name (str): Name of the queued logger.
+        handlers (tuple): Handlers that records queued by the logger are
+            dispatched to.
+    """
+    def __init__(self, listener, name):
+        self.listener = listener
+        self.name = name
+        self.handlers = ()
+
+    def start(self):
+        """Start shared listener if it isn't running."""
+        self.listener.start()
+
+    def stop(self):
+        """Stop shared listener if it's running."""
+        self.listener.stop()
+
+    def __repr__(self):  # pragma: no cover
+        return '<{0} {1!r}>'.format(self.__class__.__name__, self.name)
+
+
+class RoutingQueueListener(QueueListener):
+    """Queue listener that serves any number of queued loggers from one queue
+    using a fixed number of threads.
+
+    Each queued logger gets a :class:`QueueRoute` from :meth:`route`. Records
+    are dispatched only to the handlers of the route named by the record's
+    ``queue_route`` attribute (set by ``FlaskQueueHandler``). Records without
+    that attribute are routed to the nearest queued ancestor of the logger
+    that created them. Like ``logconfig.QueueListener``, a handler's level is
+    respected.
+
+    Args:
+        queue (Queue): Queue to listen on.
+        *handlers: Handlers to dispatch records that match no route to.
+
+    Keyword Args:
+        threads (int, optional): Number of threads that handle records.
+            Defaults to ``1``. Record order is only preserved with a single
+            thread.
+        stats (QueueStats, optional): Metrics to record listener lag and
+            handler emit latency to.
+    """
+    def __init__(self, queue, *handlers, **kargs):
+        self.threads = max(int(kargs.pop('threads', 1)), 1)
+        self.stats = kargs.pop('stats', None)
+        self.routes = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        QueueListener.__init__(self, queue, *handlers, **kargs)
+
+    def route(self, name):
+        """Return route for queued logger `name`, creating it if needed."""
+        if name not in self.routes:
+            self.routes[name] = QueueRoute(self, name)
+        return self.routes[name]
+
+    def get_handlers(self, record):
+        """Return handlers that `record` should be dispatched to."""
+        name = getattr(record, 'queue_route', None)
+
+        if name is None:
+            name = record.name or ''
+
+            while name not in self.routes and name:
+                name = name.rpartition('.')[0]
+
+        route = self.routes.get(name)
+
+        return self.handlers if route is None else route.handlers
+
+    def prepare(self, record):
+        """Return `record` unpacking it first if it's a
+        :class:`.PackedRecord`.
+        """
+        if isinstance(record, PackedRecord):
+            return record.unpack()
+        return record
+
+    def handle(self, record):
+        """Dispatch `record` to its route's handlers."""
+        record = self.prepare(record)
+
+        if self.stats is not None:
+            self.handle_with_stats(record)
+            return
+
+        for handler in self.get_handlers(record):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def handle_with_stats(self, record):
+        """Dispatch `record` to its route's handlers recording metrics."""
+        self.stats.dequeued(record)
+
+        for handler in self.get_handlers(record):
+            if record.levelno >= handler.level:
+                start = clock()
+                handler.handle(record)
+                self.stats.emitted(handler, (clock() - start) * 1000)
+
+    @property
+    def is_running(self):
+        """Return whether listener threads have been started."""
+        return bool(self._threads)
+
+    def start(self):
+        """Start listener threads unless they're already running."""
+        with self._lock:
+            if self._threads:
+                return
+
+            for _ in range(self.threads):
+                thread = threading.Thread(target=self._monitor)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        """Stop listener threads, if running, after they've handled all
+        records queued before this call.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+
+            for _ in threads:
+                self.enqueue_sentinel()
+
+            for thread in threads:
+                thread.join()
+
+    def enqueue_sentinel(self):
+        """Put the sentinel on the queue waiting for room if the queue is
+        bounded and full.
+        """
+        self.queue.put(self._sentinel)
+
+    def reset_after_fork(self):
+        """Forget listener threads inherited from the parent process, which
+        don't exist in a forked child, and return whether the listener was
+        running.
+        """
+        running = bool(self._threads)
+        self._threads = []
+        self._lock = threading.Lock()
+        return running
+
+    def _monitor(self):
+        """Handle records from the queue until the sentinel is seen."""
+        has_task_done = hasattr(self.queue, 'task_done')
+
+        while True:
+            record = self.dequeue(True)
+
+            if record is self._sentinel:
+                if has_task_done:
+                    self.queue.task_done()
+                break
+
+            self.handle(record)
+
+            if has_task_done:
+                self.queue.task_done()
+
+
+class BatchQueueListener(RoutingQueueListener):
+    """Queue listener that drains records from the queue in batches and hands
+    each batch to its handlers at once.
+
+    Handlers that define an ``emit_batch(records)`` method receive the whole
+    batch (minus records filtered out by the handler's level and filters)
+    while holding the handler's lock once. All other handlers fall back to
+    handling each record individually. Records are routed the same way as
+    :class:`RoutingQueueListener`.
+
+    Args:
+        queue (Queue): Queue to listen on.
+        *handlers: Handlers to dispatch records that match no route to.
+
+    Keyword Args:
+        batch_size (int, optional): Maximum number of records per batch.
+            Defaults to ``100``.
+        batch_timeout (float, optional): Maximum number of seconds to wait
+            for a batch to fill up after its first record arrives. Records
+            that are already queued are always drained up to `batch_size`.
+            Defaults to ``0`` (don't wait).
+        threads (int, optional): Number of threads that handle batches.
+            Defaults to ``1``.
+    """
+    def __init__(self, queue, *handlers, **kargs):
+        self.batch_size = max(int(kargs.pop('batch_size', 100)), 1)
+        self.batch_timeout = kargs.pop('batch_timeout', 0) or 0
+        RoutingQueueListener.__init__(self, queue, *handlers, **kargs)
+
+    def dequeue_batch(self):
+        """Block until at least one record is available and return a tuple
+        of ``(items, stop)`` where `items` is the list of items taken off the
+        queue (including the sentinel, if seen) and `stop` indicates whether
+        the sentinel was seen.
+        """
+        items = [self.dequeue(True)]
+
+        if items[0] is self._sentinel:
+            return items, True
+
+        deadline = time.time() + self.batch_timeout
+
+        while len(items) < self.batch_size:
+            remaining = deadline - time.time()
+
+            try:
+                if remaining > 0:
+                    item = self.queue.get(True, remaining)
+                else:
+                    item = self.queue.get_nowait()
+            except _queue.Empty:
+                break
+
+            items.append(item)
+
+            if item is self._sentinel:
+                return items, True
+
+        return items, False
+
+    def handle_batch(self, records):
+        """Dispatch `records` to their routes' handlers respecting each
+        handler's level.
+        """
+        groups = []
+        group_index = {}
+
+        for record in records:
+            record = self.prepare(record)
+            handlers = self.get_handlers(record)
+
+            if self.stats is not None:
+                self.stats.dequeued(record)
+
+            key = id(handlers)
+
+            if key not in group_index:
+                group_index[key] = len(groups)
+                groups.append((handlers, []))
+
+            groups[group_index[key]][1].append(record)
+
+        for handlers, group in groups:
+            for handler in handlers:
+                self.emit_batch(handler, group)
+
+    def emit_batch(self, handler, records):
+        """Emit `records` to `handler` using its ``emit_batch`` method if it
+        has one or record by record if it doesn't.
+        """
+        emit_batch = getattr(handler, 'emit_batch', None)
+        start = clock()
+
+        if emit_batch is None:
+            batch = [record for record in records
+                     if record.levelno >= handler.level]
+
+            for record in batch:
+                handler.handle(record)
+        else:
+            batch = [record for record in records
+                     if record.levelno >= handler.level and
+                     handler.filter(record)]
+
+            if not batch:
+                return
+
+            handler.acquire()
+            try:
+                emit_batch(batch)
+            except Exception:
+                handler.handleError(batch[0])
+            finally:
+                handler.release()
+
+        if self.stats is not None and batch:
+            self.stats.emitted(handler, (clock() - start) * 1000, len(batch))
+
+    def _monitor(self):
+        """Handle records from the queue in batches until the sentinel is
+        seen.
+        """
+        has_task_done = hasattr(self.queue, 'task_done')
+
+        while True:
+            items, stop = self.dequeue_batch()
+            records = [item for item in items if item is not self._sentinel]
+
+            if records:
+                self.handle_batch(records)
+
+            if has_task_done:
+                for _ in items:
+                    self.queue.task_done()
+
+            if stop:
+                break
+
+
+def queuify_logger(logger, queue_handler, queue_listener):
+    """Replace logger's handlers with `queue_handler` while adding existing
+    handlers to `queue_listener`. Same as ``logconfig.queuify_logger`` but
+    doesn't require importing ``logconfig``.
+
+    Args:
+        logger (mixed): Logger instance or string name of logger.
+        queue_handler (QueueHandler): Handler that queues records.
+        queue_listener (mixed): Queue listener or :class:`QueueRoute`.
+    """
+    if not isinstance(logger, logging.Logger):
+        logger = logging.getLogger(logger)
+
+    handlers = [hdlr for hdlr in logger.handlers
+                if hdlr not in queue_listener.handlers]
+
+    if handlers:
+        queue_listener.handlers = tuple(list(queue_listener.handlers) +
+                                        handlers)
+
+    del logger.handlers[:]
+    logger.addHandler(queue_handler)
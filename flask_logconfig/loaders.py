@@ -0,0 +1,197 @@
+"""Logging configuration loaders used by Flask-LogConfig.
+
+Parsed ``JSON`` and ``YAML`` configuration files are cached per process keyed
+by path, modification time, and size. Optionally, they're also stored in a
+cache directory as precompiled ``JSON`` so that other processes (e.g. server
+workers or CLI invocations) don't need to parse ``YAML`` again. The
+``logconfig`` and ``yaml`` modules are only imported when they're needed.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import logging.config
+import os
+import threading
+
+
+__all__ = (
+    'clear_config_cache',
+    'configure_logging',
+    'load_config_file',
+)
+
+
+#: Extensions of configuration files that are parsed into ``dictConfig``
+#: style dicts and can be cached.
+CONFIG_FILE_EXTENSIONS = ('.json', '.yml', '.yaml')
+
+#: Version of the precompiled configuration format.
+COMPILED_VERSION = 1
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def is_config_file(config):
+    """Return whether `config` is a path to a ``JSON`` or ``YAML`` file."""
+    return (not isinstance(config, dict) and
+            os.path.splitext(str(config))[1] in CONFIG_FILE_EXTENSIONS)
+
+
+def get_file_signature(path):
+    """Return tuple of modification time and size of file at `path` or
+    ``None`` if it doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size)
+
+
+def configure_logging(config, cache_dir=None):
+    """Configure logging from `config` which may be a ``dictConfig`` style
+    ``dict`` or a path to a ``JSON``, ``YAML``, or ``fileConfig`` file.
+    ``JSON`` and ``YAML`` files are loaded with :func:`load_config_file`.
+    """
+    if isinstance(config, dict):
+        apply_config_dict(config)
+    elif (is_config_file(config) and
+            get_file_signature(config) is not None):
+        apply_config_dict(load_config_file(config, cache_dir))
+    else:
+        # Other files (e.g. fileConfig INI files) aren't cached and errors
+        # like missing files are reported by logconfig.
+        import logconfig
+        logconfig.from_autodetect(config)
+
+
+def apply_config_dict(config):
+    """Configure logging from ``dictConfig`` style `config`."""
+    if hasattr(logging.config, 'dictConfig'):
+        logging.config.dictConfig(config)
+    else:  # pragma: no cover
+        from logutils.dictconfig import dictConfig
+        dictConfig(config)
+
+
+def load_config_file(path, cache_dir=None):
+    """Return ``dictConfig`` style ``dict`` parsed from ``JSON`` or ``YAML``
+    file at `path`. The parsed configuration is cached until the file's
+    modification time or size changes. A copy is returned so callers may
+    modify it.
+
+    When `cache_dir` is given, a precompiled copy of the parsed configuration
+    is read from or written to it so that other processes can skip parsing
+    the file too. Failing to read or write the precompiled copy isn't an
+    error.
+
+    Raises:
+        OSError: If the file doesn't exist.
+    """
+    path = os.path.abspath(path)
+    signature = get_file_signature(path)
+
+    if signature is None:
+        raise OSError('Logging configuration file not found: {0}'
+                      .format(path))
+
+    cached = _cache.get(path)
+
+    if cached is not None and cached[0] == signature:
+        return copy.deepcopy(cached[1])
+
+    config = None
+
+    if cache_dir:
+        config = read_compiled_config(cache_dir, path, signature)
+
+    if config is None:
+        config = parse_config_file(path)
+
+        if cache_dir:
+            write_compiled_config(cache_dir, path, signature, config)
+
+    with _cache_lock:
+        _cache[path] = (signature, config)
+
+    return copy.deepcopy(config)
+
+
+def parse_config_file(path):
+    """Return configuration parsed from ``JSON`` or ``YAML`` file at
+    `path`.
+    """
+    with open(path) as fileobj:
+        if os.path.splitext(path)[1] == '.json':
+            return json.load(fileobj)
+
+        import yaml
+        return yaml.safe_load(fileobj)
+
+
+def get_compiled_path(cache_dir, path):
+    """Return path of precompiled configuration of file at `path` inside
+    `cache_dir`.
+    """
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'logconfig-{0}.json'.format(digest))
+
+
+def read_compiled_config(cache_dir, path, signature):
+    """Return precompiled configuration of file at `path` from `cache_dir`
+    or ``None`` if it's missing, invalid, or out of date.
+    """
+    try:
+        with open(get_compiled_path(cache_dir, path)) as fileobj:
+            compiled = json.load(fileobj)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if (not isinstance(compiled, dict) or
+            compiled.get('version') != COMPILED_VERSION or
+            compiled.get('path') != path or
+            compiled.get('signature') != list(signature)):
+        return None
+
+    return compiled.get('config')
+
+
+def write_compiled_config(cache_dir, path, signature, config):
+    """Write precompiled `config` of file at `path` to `cache_dir` and return
+    whether it was written. Configurations that can't be represented as
+    ``JSON`` aren't written.
+    """
+    compiled_path = get_compiled_path(cache_dir, path)
+    temp_path = '{0}.{1}.tmp'.format(compiled_path, os.getpid())
+
+    try:
+        data = json.dumps({'version': COMPILED_VERSION,
+                           'path': path,
+                           'signature': list(signature),
+                           'config': config})
+    except (TypeError, ValueError):
+        return False
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        with open(temp_path, 'w') as fileobj:
+            fileobj.write(data)
+
+        # Replace atomically so concurrent readers never see partial files.
+        getattr(os, 'replace', os.rename)(temp_path, compiled_path)
+    except (IOError, OSError):
+        return False
+
+    return True
+
+
+def clear_config_cache():
+    """Clear per-process cache of parsed configuration files."""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,130 @@
+"""Queue helpers used by Flask-LogConfig.
+"""
+
+import logging
+import threading
+
+try:
+    import queue as _queue
+except ImportError:  # pragma: no cover
+    import Queue as _queue
+
+
+__all__ = (
+    'QueueOverflow',
+)
+
+
+class QueueOverflow(object):
+    """Policy for putting records on a bounded queue that may be full.
+
+    Supported policies:
+
+    - ``'block'``: Wait until there is room on the queue.
+    - ``'drop_newest'``: Drop the record being queued.
+    - ``'drop_oldest'``: Drop the oldest queued record to make room.
+    - ``'drop_below'``: Drop the record being queued if its level is below
+      `level`, otherwise wait until there is room on the queue.
+
+    Dropped records are counted in :attr:`dropped` (total) and
+    :attr:`dropped_by_level` (keyed by level name).
+
+    Args:
+        policy (str, optional): Overflow policy. Defaults to ``'block'``.
+        level (int, optional): Level used by the ``'drop_below'`` policy.
+            Defaults to ``logging.WARNING``.
+        sentinel (mixed, optional): Queue listener sentinel which is never
+            dropped by the ``'drop_oldest'`` policy. Defaults to ``None``.
+
+    Raises:
+        ValueError: If `policy` is unknown.
+    """
+    policies = ('block', 'drop_newest', 'drop_oldest', 'drop_below')
+
+    def __init__(self, policy='block', level=logging.WARNING, sentinel=None):
+        if policy not in self.policies:
+            raise ValueError('Unknown queue overflow policy {0!r}. '
+                             'Supported policies: {1}'
+                             .format(policy, ', '.join(self.policies)))
+
+        self.policy = policy
+        self.level = level
+        self.sentinel = sentinel
+        self.dropped = 0
+        self.dropped_by_level = {}
+        self._lock = threading.Lock()
+
+    def put(self, queue, record):
+        """Put `record` on `queue` applying the overflow policy if the queue
+        is full. Return whether `record` was queued or dropped.
+        """
+        if self.policy == 'block':
+            queue.put(record)
+            return True
+
+        try:
+            queue.put_nowait(record)
+            return True
+        except _queue.Full:
+            pass
+
+        if self.policy == 'drop_newest':
+            self.drop(record)
+            return False
+        elif self.policy == 'drop_below':
+            if record.levelno < self.level:
+                self.drop(record)
+                return False
+
+            queue.put(record)
+            return True
+        else:
+            return self.put_dropping_oldest(queue, record)
+
+    def put_dropping_oldest(self, queue, record):
+        """Put `record` on `queue` dropping the oldest queued records until
+        there is room for it. Return whether `record` was queued.
+        """
+        has_task_done = hasattr(queue, 'task_done')
+
+        while True:
+            try:
+                oldest = queue.get_nowait()
+            except _queue.Empty:
+                oldest = None
+            else:
+                if oldest is self.sentinel:
+                    # The listener is stopping so keep the sentinel in place
+                    # and drop the new record instead.
+                    queue.put(oldest)
+                    self.drop(record)
+                    return False
+
+                if has_task_done:
+                    queue.task_done()
+
+                self.drop(oldest)
+
+            try:
+                queue.put_nowait(record)
+                return True
+            except _queue.Full:
+                pass
+
+    def drop(self, record):
+        """Count `record` as dropped."""
+        # Level names are looked up from the level number since packed
+        # records don't carry one.
+        levelno = getattr(record, 'levelno', None)
+        levelname = (None if levelno is None
+                     else logging.getLevelName(levelno))
+
+        with self._lock:
+            self.dropped += 1
+            self.dropped_by_level[levelname] = (
+                self.dropped_by_level.get(levelname, 0) + 1)
+
+    def __repr__(self):  # pragma: no cover
+        return '<{0} {1!r} dropped={2}>'.format(self.__class__.__name__,
+                                                self.policy,
+                                                self.dropped)
@@ -0,0 +1,148 @@
+"""Rate limiting and duplicate suppression of log records used by
+Flask-LogConfig.
+"""
+
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+
+__all__ = (
+    'RateLimitFilter',
+)
+
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class RateLimitFilter(logging.Filter):
+    """Logging filter that rate limits records with a token bucket per logger
+    name, level, and message template (the unformatted ``record.msg``).
+
+    Each bucket holds up to `burst` tokens and is refilled with `rate` tokens
+    per second. A record passes if its bucket has a token left and is
+    suppressed otherwise. The next record of the same bucket that passes
+    carries the number of records suppressed since the previous one as
+    ``record.suppressed``. The message isn't changed since other handlers
+    and loggers see the same record (queue handlers using the filter suffix
+    the copy they queue with ``(N similar messages suppressed)`` instead).
+    When no token is available for `summary_interval` seconds, one record is
+    let through anyway so the summary isn't delayed indefinitely. With a
+    `rate` of ``0``, only the first `burst` records pass and duplicates are
+    collapsed into one summary per `summary_interval`.
+
+    Counts are only reported on records that pass, so records suppressed at
+    the end of a burst that's followed by silence are never reported on a
+    record. They're still included in :attr:`suppressed`.
+
+    Buckets are kept in a least recently used mapping of at most `max_keys`
+    entries so memory use stays bounded regardless of how many distinct
+    messages are logged. Suppressed counts of evicted buckets are only kept
+    in :attr:`suppressed`.
+
+    Args:
+        rate (float, optional): Tokens added to a bucket per second. Defaults
+            to ``1.0``.
+        burst (int, optional): Maximum number of tokens of a bucket. Defaults
+            to ``10``.
+        summary_interval (float, optional): Seconds after which a suppressed
+            record is let through to report the suppressed count. Use
+            ``None`` to only report counts on records that get a token.
+            Defaults to ``60.0``.
+        max_keys (int, optional): Maximum number of buckets. Defaults to
+            ``1000``.
+
+    Attributes:
+        suppressed (int): Total number of suppressed records.
+    """
+    def __init__(self,
+                 rate=1.0,
+                 burst=10,
+                 summary_interval=60.0,
+                 max_keys=1000):
+        if max_keys < 1:
+            raise ValueError('max_keys must be positive')
+
+        logging.Filter.__init__(self)
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def get_key(self, record, scope=None):
+        """Return bucket key of `record`. Records logged with a different
+        `scope` are kept in separate buckets.
+        """
+        key = (record.name, record.levelno, str(record.msg))
+
+        if scope is not None:
+            key = (scope,) + key
+
+        return key
+
+    def acquire_token(self, key):
+        """Take a token from the bucket of `key` and return the number of
+        records suppressed since the bucket's last record passed, or
+        ``None`` if the record should be suppressed.
+        """
+        now = clock()
+
+        with self._lock:
+            bucket = self.buckets.pop(key, None)
+
+            if bucket is None:
+                # Buckets are lists of tokens, time of the last refill,
+                # suppressed count, and time of the last passed record.
+                bucket = [self.burst, now, 0, now]
+
+                if len(self.buckets) >= self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.burst,
+                                bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            # Reinserting keeps the most recently used buckets last.
+            self.buckets[key] = bucket
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+            elif (self.summary_interval is None or
+                    now - bucket[3] < self.summary_interval):
+                bucket[2] += 1
+                self.suppressed += 1
+                return None
+
+            suppressed = bucket[2]
+            bucket[2] = 0
+            bucket[3] = now
+
+        return suppressed
+
+    def filter(self, record):
+        """Return whether `record` passes the rate limit. Passed records get
+        a ``suppressed`` attribute.
+        """
+        suppressed = self.acquire_token(self.get_key(record))
+
+        if suppressed is None:
+            return False
+
+        record.suppressed = suppressed
+
+        return True
+
+    def annotate(self, record, suppressed):
+        """Set ``record.suppressed`` and suffix the message of `record` with
+        the `suppressed` count if there is any. Only use this on a record no
+        other handler sees, e.g. a copy prepared by a queue handler.
+        """
+        record.suppressed = suppressed
+
+        if suppressed:
+            record.msg = '{0} ({1} similar messages suppressed)'.format(
+                record.msg, suppressed)
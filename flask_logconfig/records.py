@@ -0,0 +1,274 @@
+"""Compact binary representation of log records used by Flask-LogConfig.
+"""
+
+import logging
+import struct
+import threading
+
+
+__all__ = (
+    'PackedRecord',
+    'RecordCodec',
+)
+
+
+#: Attributes every ``logging.LogRecord`` has. Anything else found in a
+#: record's ``__dict__`` is an extra.
+STANDARD_RECORD_ATTRS = frozenset(
+    logging.makeLogRecord({}).__dict__) | frozenset(['message', 'asctime'])
+
+#: Record attributes encoded as fixed fields and never carried as extras.
+PACKED_RECORD_ATTRS = STANDARD_RECORD_ATTRS | frozenset(['queue_route'])
+
+#: Fixed fields: created, msecs, process, thread, lineno, levelno and the
+#: string ids of name, levelname, pathname, filename, module, funcName,
+#: threadName, processName and queue_route.
+HEADER = struct.Struct('<ddIQIH9H')
+
+#: Length prefix of variable length strings.
+LENGTH = struct.Struct('<I')
+
+#: Length marking a ``None`` string.
+NONE_LENGTH = 0xFFFFFFFF
+
+#: Interned string fields in header order.
+STRING_FIELDS = ('name',
+                 'levelname',
+                 'pathname',
+                 'filename',
+                 'module',
+                 'funcName',
+                 'threadName',
+                 'processName',
+                 'queue_route')
+
+#: String id reserved for ``None``.
+NONE_ID = 0
+
+#: String id marking a string that is stored inline instead of interned.
+INLINE_ID = 0xFFFF
+
+
+class PackedRecord(object):
+    """Log record packed by a :class:`RecordCodec`.
+
+    Only the encoded bytes, the record's level (so that overflow policies
+    can inspect it) and a ``dict`` of extra attributes, if any, are kept.
+    Extras are kept by reference since they may hold objects (e.g. a copy of
+    the request context) that only make sense inside the current process.
+
+    Attributes:
+        codec (RecordCodec): Codec that packed the record.
+        data (bytes): Encoded record.
+        levelno (int): Level of the record.
+        extra (dict): Extra record attributes or ``None``.
+    """
+    __slots__ = ('codec', 'data', 'levelno', 'extra')
+
+    def __init__(self, codec, data, levelno, extra=None):
+        self.codec = codec
+        self.data = data
+        self.levelno = levelno
+        self.extra = extra
+
+    def unpack(self):
+        """Return ``logging.LogRecord`` decoded from this record."""
+        return self.codec.decode(self.data, self.extra)
+
+
+class RecordCodec(object):
+    """Encode log records to and from a compact binary format.
+
+    A record is encoded as fixed size header followed by its merged message,
+    exception text, and stack info. Logger names, level names, source
+    locations, and thread and process names repeat across records so they
+    are interned: the header only holds their ids in the codec's string
+    table. Records are expected to be prepared already (i.e. their message
+    merged with its arguments and exception info formatted) as done by
+    ``QueueHandler.prepare``. Encoding does that too if needed.
+
+    The string table only grows. A codec that decodes records encoded by a
+    codec in another process must be kept in sync by loading the output of
+    :meth:`dump_strings` in order. Once `max_strings` strings are interned,
+    new strings are stored inline in each record instead.
+
+    Args:
+        max_strings (int, optional): Maximum number of interned strings.
+            Defaults to ``65534``.
+        routes (bool, optional): Whether to encode ``record.queue_route``.
+            Records shipped to another process don't need it. Defaults to
+            ``True``.
+    """
+    def __init__(self, max_strings=INLINE_ID - 1, routes=True):
+        self.max_strings = min(max_strings, INLINE_ID - 1)
+
+        if routes:
+            self.string_fields = STRING_FIELDS
+            self.omitted_ids = []
+        else:
+            # queue_route is the last string field.
+            self.string_fields = STRING_FIELDS[:-1]
+            self.omitted_ids = [NONE_ID]
+
+        self.strings = [None]
+        self.string_ids = {}
+        self._lock = threading.Lock()
+
+    def intern(self, value):
+        """Return id of string `value` interning it if needed. Return
+        ``INLINE_ID`` if the string table is full.
+        """
+        if value is None:
+            return NONE_ID
+
+        string_id = self.string_ids.get(value)
+
+        if string_id is None:
+            with self._lock:
+                string_id = self.string_ids.get(value)
+
+                if string_id is None:
+                    if len(self.strings) > self.max_strings:
+                        return INLINE_ID
+
+                    string_id = len(self.strings)
+                    self.strings.append(value)
+                    self.string_ids[value] = string_id
+
+        return string_id
+
+    def dump_strings(self, start=0):
+        """Return encoded strings interned from index `start` on."""
+        return b''.join(encode_string(value)
+                        for value in self.strings[max(start, 1):])
+
+    def load_strings(self, data, start=None):
+        """Intern strings encoded by another codec's :meth:`dump_strings`.
+        When `start` (the index passed to :meth:`dump_strings`) is given,
+        strings already loaded from that index on are replaced so that
+        loading the same strings again doesn't shift the ids of later ones.
+        """
+        if start is not None:
+            start = max(start, 1)
+
+            for value in self.strings[start:]:
+                self.string_ids.pop(value, None)
+
+            del self.strings[start:]
+
+        offset = 0
+
+        while offset < len(data):
+            value, offset = decode_string(data, offset)
+            self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+
+    def encode(self, record):
+        """Return `record` encoded as bytes. Extra attributes aren't
+        encoded.
+        """
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+
+        inline = []
+        ids = []
+
+        for field in self.string_fields:
+            value = getattr(record, field, None)
+            string_id = self.intern(value)
+
+            if string_id == INLINE_ID:
+                inline.append(encode_string(value))
+
+            ids.append(string_id)
+
+        ids.extend(self.omitted_ids)
+
+        header = HEADER.pack(record.created,
+                             record.msecs,
+                             record.process or 0,
+                             record.thread or 0,
+                             record.lineno or 0,
+                             record.levelno,
+                             *ids)
+
+        return b''.join([header] +
+                        inline +
+                        [encode_string(record.getMessage()),
+                         encode_string(record.exc_text),
+                         encode_string(getattr(record, 'stack_info', None))])
+
+    def decode(self, data, extra=None):
+        """Return ``logging.LogRecord`` decoded from `data` with `extra`
+        attributes added.
+        """
+        fields = HEADER.unpack_from(data)
+        offset = HEADER.size
+        attrs = {
+            'created': fields[0],
+            'msecs': fields[1],
+            'process': fields[2] or None,
+            'thread': fields[3] or None,
+            'lineno': fields[4],
+            'levelno': fields[5],
+        }
+
+        for field, string_id in zip(STRING_FIELDS, fields[6:]):
+            if string_id == INLINE_ID:
+                value, offset = decode_string(data, offset)
+            else:
+                value = self.strings[string_id]
+
+            if value is not None or field != 'queue_route':
+                attrs[field] = value
+
+        attrs['msg'], offset = decode_string(data, offset)
+        attrs['exc_text'], offset = decode_string(data, offset)
+        attrs['stack_info'], offset = decode_string(data, offset)
+        attrs['args'] = None
+        attrs['exc_info'] = None
+        attrs['relativeCreated'] = ((attrs['created'] - logging._startTime) *
+                                    1000)
+
+        if extra:
+            attrs.update(extra)
+
+        return logging.makeLogRecord(attrs)
+
+    def pack(self, record):
+        """Return :class:`PackedRecord` for `record`."""
+        extra = dict((key, value) for key, value in record.__dict__.items()
+                     if key not in PACKED_RECORD_ATTRS)
+
+        return PackedRecord(self,
+                            self.encode(record),
+                            record.levelno,
+                            extra or None)
+
+
+def encode_string(value):
+    """Return length prefixed UTF-8 encoding of string `value` which may be
+    ``None``.
+    """
+    if value is None:
+        return LENGTH.pack(NONE_LENGTH)
+
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+
+    return LENGTH.pack(len(value)) + value
+
+
+def decode_string(data, offset):
+    """Return tuple of ``(value, offset)`` where `value` is the string
+    decoded at `offset` of `data` and `offset` is where the next value
+    starts.
+    """
+    size = LENGTH.unpack_from(data, offset)[0]
+    offset += LENGTH.size
+
+    if size == NONE_LENGTH:
+        return None, offset
+
+    return data[offset:offset + size].decode('utf-8'), offset + size
@@ -0,0 +1,145 @@
+"""Process-wide registry of logging setups shared by applications used by
+Flask-LogConfig.
+
+Applications whose logging configuration has the same fingerprint share one
+:class:`SharedLogging` instance holding the handlers, queue, and listeners
+set up for the first of them. Each application holds a reference which is
+dropped when it's released or garbage collected. Once the last reference is
+gone, the registry calls its `on_unused` callback so the shared setup can be
+torn down.
+"""
+
+from functools import partial
+import hashlib
+import json
+import threading
+import weakref
+
+
+__all__ = (
+    'SharedLogging',
+    'SharedLoggingRegistry',
+    'make_fingerprint',
+)
+
+
+def make_fingerprint(*values):
+    """Return hex digest identifying `values`. Values that can't be
+    represented as ``JSON`` (e.g. classes or handler factories) are
+    identified by their ``repr``.
+    """
+    try:
+        data = json.dumps(values, sort_keys=True, default=repr)
+    except (TypeError, ValueError):
+        # E.g. dicts with keys of mixed types can't be sorted.
+        data = repr(values)
+
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class SharedLogging(object):
+    """Logging setup shared by applications with the same configuration
+    fingerprint.
+
+    Args:
+        fingerprint (str): Fingerprint of the logging configuration.
+        state (dict): Shared application state items.
+
+    Attributes:
+        refs (dict): Weak references to the applications sharing the setup
+            keyed by their ``id``.
+    """
+    def __init__(self, fingerprint, state):
+        self.fingerprint = fingerprint
+        self.state = state
+        self.refs = {}
+
+    @property
+    def refcount(self):
+        """Return number of applications sharing the setup."""
+        return len(self.refs)
+
+    def __repr__(self):  # pragma: no cover
+        return '<{0} {1} refcount={2}>'.format(self.__class__.__name__,
+                                               self.fingerprint,
+                                               self.refcount)
+
+
+class SharedLoggingRegistry(object):
+    """Registry of :class:`SharedLogging` instances keyed by configuration
+    fingerprint.
+
+    Args:
+        on_unused (callable, optional): Called with a :class:`SharedLogging`
+            instance once all applications referencing it were garbage
+            collected. It may be called from any thread.
+
+    Attributes:
+        lock (threading.RLock): Lock to hold while looking up and setting up
+            shared logging so that concurrent applications don't both set
+            it up.
+    """
+    def __init__(self, on_unused=None):
+        self.entries = {}
+        self.on_unused = on_unused
+        self.lock = threading.RLock()
+
+    def get(self, fingerprint):
+        """Return :class:`SharedLogging` for `fingerprint` or ``None``."""
+        return self.entries.get(fingerprint)
+
+    def add(self, fingerprint, state):
+        """Register and return new :class:`SharedLogging` for `fingerprint`
+        holding `state`.
+        """
+        with self.lock:
+            shared = self.entries[fingerprint] = SharedLogging(fingerprint,
+                                                               state)
+        return shared
+
+    def acquire(self, shared, app):
+        """Add reference from `app` to `shared`."""
+        key = id(app)
+
+        with self.lock:
+            shared.refs[key] = weakref.ref(app,
+                                           partial(self._collected,
+                                                   shared,
+                                                   key))
+
+    def release(self, shared, app):
+        """Drop reference from `app` to `shared` and return whether it was
+        the last one. The caller is responsible for tearing down `shared`
+        then.
+        """
+        with self.lock:
+            if shared.refs.pop(id(app), None) is None:
+                return False
+
+            return self._remove_unused(shared)
+
+    def _remove_unused(self, shared):
+        if shared.refs:
+            return False
+
+        if self.entries.get(shared.fingerprint) is shared:
+            del self.entries[shared.fingerprint]
+
+        return True
+
+    def _collected(self, shared, key, ref):
+        with self.lock:
+            # The key may have been reused by another application already.
+            if shared.refs.get(key) is not ref:
+                return
+
+            del shared.refs[key]
+            unused = self._remove_unused(shared)
+
+        if unused and self.on_unused is not None:
+            self.on_unused(shared)
+
+    def clear(self):
+        """Remove all entries without tearing them down."""
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,139 @@
+"""Triggers that reload an application's logging configuration used by
+Flask-LogConfig.
+"""
+
+import os
+import signal
+import threading
+
+
+__all__ = (
+    'ConfigWatcher',
+    'get_signal',
+    'install_reload_signal',
+)
+
+
+class ConfigWatcher(object):
+    """Poll a logging configuration file and call `callback` from a daemon
+    thread whenever its modification time or size changes.
+
+    Args:
+        path (str): Path of the file to watch.
+        callback (callable): Function called without arguments when the file
+            changes.
+        interval (float, optional): Seconds between polls. Defaults to ``1``.
+    """
+    def __init__(self, path, callback, interval=1.0):
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.signature = self.get_signature()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def is_running(self):
+        """Return whether the watcher thread has been started."""
+        return self._thread is not None
+
+    def get_signature(self):
+        """Return tuple of the file's modification time and size or ``None``
+        if it doesn't exist.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        return (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size)
+
+    def check(self):
+        """Call `callback` if the file changed since the last check and
+        return whether it did. A missing file, e.g. while an editor replaces
+        it, isn't a change.
+        """
+        signature = self.get_signature()
+
+        if signature is None or signature == self.signature:
+            return False
+
+        self.signature = signature
+        self.callback()
+
+        return True
+
+    def start(self):
+        """Start watcher thread unless it's already running."""
+        if self._thread is not None:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='flask-logconfig-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watcher thread if it's running."""
+        thread, self._thread = self._thread, None
+
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def reset_after_fork(self):
+        """Restart watcher thread inherited from the parent process, which
+        doesn't exist in a forked child, if it was running.
+        """
+        running = self._thread is not None
+        self._thread = None
+        self._stopped = threading.Event()
+
+        if running:
+            self.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+
+def get_signal(value):
+    """Return signal number from `value` which may be an ``int`` or a signal
+    name like ``'SIGHUP'``.
+
+    Raises:
+        ValueError: If `value` is an unknown signal name.
+    """
+    if isinstance(value, int):
+        return value
+
+    name = str(value).upper()
+
+    if not name.startswith('SIG'):
+        name = 'SIG' + name
+
+    signum = getattr(signal, name, None)
+
+    if not isinstance(signum, int):
+        raise ValueError('Unknown signal: {0!r}'.format(value))
+
+    return int(signum)
+
+
+def install_reload_signal(signum, callback):
+    """Call `callback` from a new thread whenever the process receives signal
+    `signum` and return the previous handler of the signal. The callback
+    isn't called from the signal handler itself since it could deadlock on
+    locks held by the interrupted code (e.g. those of logging handlers).
+
+    Raises:
+        ValueError: If not called from the main thread.
+    """
+    def handler(signum, frame):
+        thread = threading.Thread(target=callback,
+                                  name='flask-logconfig-reload')
+        thread.daemon = True
+        thread.start()
+
+    return signal.signal(signum, handler)
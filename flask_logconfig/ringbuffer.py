@@ -0,0 +1,332 @@
+"""Memory-mapped ring buffer retention of recent log records used by
+Flask-LogConfig.
+
+:class:`RingBufferHandler` writes formatted records into a fixed-size file
+that's mapped into memory. The file is split into equally sized slots and
+each record overwrites the oldest slot, so neither memory use nor the file
+grow while the process runs. Since writes go to the shared mapping, the most
+recent records can still be read from the file after the process crashed or
+was killed.
+
+The file can be dumped with :func:`read_ring_buffer` or from the command
+line::
+
+    python -m flask_logconfig.ringbuffer /var/log/app/recent-1234.ring
+"""
+
+from __future__ import print_function
+
+import argparse
+from collections import namedtuple
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+
+__all__ = (
+    'RingBufferHandler',
+    'RingEntry',
+    'read_ring_buffer',
+)
+
+
+#: Magic bytes identifying ring buffer files.
+MAGIC = b'FLCRING1'
+
+#: Version of the ring buffer file format.
+VERSION = 1
+
+#: File header holding magic bytes, version, capacity, and record size.
+HEADER = struct.Struct('<8sIII')
+
+#: Size reserved for the file header.
+HEADER_SIZE = 64
+
+#: Slot header holding sequence number, creation time, checksum, length of
+#: the message, and level number. Sequence numbers start at ``1`` so empty
+#: slots have a sequence number of ``0``.
+SLOT = struct.Struct('<QdIIH')
+
+RingEntry = namedtuple('RingEntry', ['seq', 'created', 'levelno', 'message'])
+
+
+def checksum(data):
+    """Return ``CRC32`` checksum of `data` as unsigned integer."""
+    return zlib.crc32(data) & 0xffffffff
+
+
+class RingBufferHandler(logging.Handler):
+    """Logging handler that keeps the most recent formatted records in a
+    memory-mapped ring buffer file.
+
+    Messages longer than what fits into a slot are truncated. The file is
+    created or resized when the first record is emitted. An existing file
+    with the same `capacity` and `record_size` is continued so records from a
+    previous run are kept until they're overwritten.
+
+    Each process needs its own file. If `filename` contains ``{pid}``, it's
+    replaced by the current process ID and forked children switch to their
+    own file automatically.
+
+    The handler implements ``emit_batch`` so when its logger is queued with
+    ``LOGCONFIG_QUEUE`` the writes happen on the listener thread.
+
+    Args:
+        filename (str): Path of the ring buffer file.
+        capacity (int, optional): Number of records to keep. Defaults to
+            ``10000``.
+        record_size (int, optional): Size of each slot in bytes including
+            its header. Defaults to ``512``.
+        level (int, optional): Level of the handler. Defaults to
+            ``logging.NOTSET``.
+    """
+    def __init__(self,
+                 filename,
+                 capacity=10000,
+                 record_size=512,
+                 level=logging.NOTSET):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+
+        if record_size <= SLOT.size:
+            raise ValueError('record_size must be greater than {0}'
+                             .format(SLOT.size))
+
+        logging.Handler.__init__(self, level)
+        self.filename = filename
+        self.capacity = capacity
+        self.record_size = record_size
+        self.payload_size = record_size - SLOT.size
+        self.path = None
+        self.pid = None
+        self.mmap = None
+        self.fd = None
+        self.seq = 0
+
+    @property
+    def size(self):
+        """Return total size of the ring buffer file."""
+        return HEADER_SIZE + self.capacity * self.record_size
+
+    def open(self):
+        """Open and map the ring buffer file of the current process creating
+        or resizing it when needed.
+        """
+        self.close_file()
+
+        path = self.filename.format(pid=os.getpid())
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        try:
+            data = os.read(fd, HEADER.size)
+            valid = (len(data) == HEADER.size and
+                     HEADER.unpack(data) == (MAGIC,
+                                             VERSION,
+                                             self.capacity,
+                                             self.record_size) and
+                     os.fstat(fd).st_size == self.size)
+
+            if not valid:
+                # Truncating first zeroes all slots of a reused file.
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self.size)
+
+            mapped = mmap.mmap(fd, self.size)
+        except Exception:
+            os.close(fd)
+            raise
+
+        if valid:
+            self.seq = max([0] + [SLOT.unpack_from(mapped, offset)[0]
+                                  for offset in self.slot_offsets()])
+        else:
+            HEADER.pack_into(mapped,
+                             0,
+                             MAGIC,
+                             VERSION,
+                             self.capacity,
+                             self.record_size)
+            self.seq = 0
+
+        self.path = path
+        self.pid = os.getpid()
+        self.fd = fd
+        self.mmap = mapped
+
+    def slot_offsets(self):
+        """Return offsets of all slots."""
+        return range(HEADER_SIZE, self.size, self.record_size)
+
+    def write(self, record):
+        """Write formatted `record` into the next slot."""
+        if self.pid != os.getpid():
+            self.open()
+
+        data = self.format(record).encode('utf-8', 'replace')
+        data = data[:self.payload_size]
+
+        self.seq += 1
+        offset = (HEADER_SIZE +
+                  ((self.seq - 1) % self.capacity) * self.record_size)
+        start = offset + SLOT.size
+
+        self.mmap[start:start + len(data)] = data
+        # The slot header is written last and the checksum covers the
+        # message so a slot that was only partially overwritten is skipped
+        # by readers.
+        SLOT.pack_into(self.mmap,
+                       offset,
+                       self.seq,
+                       record.created,
+                       checksum(data),
+                       len(data),
+                       record.levelno)
+
+    def emit(self, record):
+        """Write `record` into the ring buffer."""
+        try:
+            self.write(record)
+        except Exception:
+            self.handleError(record)
+
+    def emit_batch(self, records):
+        """Write `records` into the ring buffer. Called by
+        ``BatchQueueListener`` with the handler's lock acquired.
+        """
+        for record in records:
+            self.emit(record)
+
+    def flush(self):
+        """Write the mapped file back to disk."""
+        self.acquire()
+        try:
+            if self.mmap is not None and self.pid == os.getpid():
+                self.mmap.flush()
+        finally:
+            self.release()
+
+    def close_file(self):
+        """Unmap and close the ring buffer file."""
+        if self.mmap is not None:
+            if self.pid == os.getpid():
+                self.mmap.flush()
+            self.mmap.close()
+            os.close(self.fd)
+
+        self.mmap = None
+        self.fd = None
+        self.pid = None
+
+    def close(self):
+        """Close the ring buffer file and the handler."""
+        self.acquire()
+        try:
+            self.close_file()
+        finally:
+            self.release()
+
+        logging.Handler.close(self)
+
+
+def read_ring_buffer(filename):
+    """Return list of :class:`RingEntry` read from the ring buffer file at
+    `filename` ordered from oldest to newest. Empty slots and slots that were
+    torn by a crash while being written are skipped.
+
+    Raises:
+        ValueError: If the file isn't a ring buffer file.
+    """
+    with open(filename, 'rb') as fileobj:
+        data = fileobj.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError('Not a ring buffer file: {0}'.format(filename))
+
+    magic, version, capacity, record_size = HEADER.unpack_from(data)
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a ring buffer file: {0}'.format(filename))
+
+    entries = []
+
+    for index in range(capacity):
+        offset = HEADER_SIZE + index * record_size
+
+        if offset + record_size > len(data):
+            break
+
+        seq, created, crc, length, levelno = SLOT.unpack_from(data, offset)
+        start = offset + SLOT.size
+        message = data[start:start + length]
+
+        if (seq == 0 or
+                length > record_size - SLOT.size or
+                checksum(message) != crc):
+            continue
+
+        entries.append(RingEntry(seq,
+                                 created,
+                                 levelno,
+                                 message.decode('utf-8', 'replace')))
+
+    entries.sort(key=lambda entry: entry.seq)
+
+    return entries
+
+
+def format_entry(entry):
+    """Return `entry` formatted as a line with its time and level."""
+    return '{0},{1:03d} {2} {3}'.format(
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.created)),
+        int(entry.created * 1000) % 1000,
+        logging.getLevelName(entry.levelno),
+        entry.message)
+
+
+def main(argv=None, out=None):
+    """Dump ring buffer files to `out` which defaults to ``sys.stdout``."""
+    parser = argparse.ArgumentParser(
+        description='Dump Flask-LogConfig ring buffer files.')
+    parser.add_argument('files',
+                        nargs='+',
+                        help='Ring buffer files to dump.')
+    parser.add_argument('-n', '--last',
+                        type=int,
+                        default=None,
+                        help='Only dump this many of the newest records.')
+    parser.add_argument('--raw',
+                        action='store_true',
+                        help='Only dump the formatted messages.')
+    parser.add_argument('--json',
+                        action='store_true',
+                        help='Dump records as JSON objects.')
+    args = parser.parse_args(argv)
+    out = out or sys.stdout
+
+    for filename in args.files:
+        try:
+            entries = read_ring_buffer(filename)
+        except (IOError, OSError, ValueError) as exc:
+            parser.exit(1, '{0}\n'.format(exc))
+
+        if args.last is not None:
+            entries = entries[-args.last:] if args.last > 0 else []
+
+        for entry in entries:
+            if args.json:
+                line = json.dumps(entry._asdict())
+            elif args.raw:
+                line = entry.message
+            else:
+                line = format_entry(entry)
+
+            print(line, file=out)
+
+
+if __name__ == '__main__':
+    main()
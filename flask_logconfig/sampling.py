@@ -0,0 +1,99 @@
+"""Request log sampling used by Flask-LogConfig.
+"""
+
+import random
+import threading
+
+
+__all__ = (
+    'RequestSampler',
+)
+
+
+class RequestSampler(object):
+    """Decide which requests get logged based on sampling rates.
+
+    A request's rate is looked up by its endpoint name first, then by the
+    longest matching path prefix (keys of `rates` that start with ``/``) and
+    finally falls back to the global `rate`. A rate of ``1`` logs every
+    request and ``0`` logs none (apart from requests matched by the keep
+    rules).
+
+    Every sampled-out request is counted under the key whose rate applied
+    (``None`` for the global rate) so that totals can be reconstructed from
+    the logged requests plus :attr:`sampled_out`.
+
+    Args:
+        rate (float, optional): Global sampling rate. Defaults to ``1.0``.
+        rates (dict, optional): Sampling rates keyed by endpoint name or path
+            prefix.
+        keep_status (int, optional): Responses with a status code at or above
+            this are always logged. Defaults to ``500``.
+        keep_slower_than (float, optional): Requests that took at least this
+            many milliseconds are always logged. Defaults to ``None``
+            (disabled).
+
+    Attributes:
+        sampled_out (dict): Number of sampled-out requests keyed by the
+            endpoint name, path prefix, or ``None`` whose rate applied.
+    """
+    def __init__(self,
+                 rate=1.0,
+                 rates=None,
+                 keep_status=500,
+                 keep_slower_than=None):
+        rates = rates or {}
+
+        self.rate = rate
+        self.endpoint_rates = dict((key, value)
+                                   for key, value in rates.items()
+                                   if not key.startswith('/'))
+        self.prefix_rates = sorted(((key, value)
+                                    for key, value in rates.items()
+                                    if key.startswith('/')),
+                                   key=lambda item: len(item[0]),
+                                   reverse=True)
+        self.keep_status = keep_status
+        self.keep_slower_than = keep_slower_than
+        self.sampled_out = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_sampled_out(self):
+        """Return total number of sampled-out requests."""
+        return sum(self.sampled_out.values())
+
+    def get_rate(self, endpoint, path):
+        """Return tuple of ``(key, rate)`` that applies to a request."""
+        if endpoint in self.endpoint_rates:
+            return endpoint, self.endpoint_rates[endpoint]
+
+        for prefix, rate in self.prefix_rates:
+            if path.startswith(prefix):
+                return prefix, rate
+
+        return None, self.rate
+
+    def sample(self, endpoint, path, status_code, get_execution_time):
+        """Return whether a request should be logged. Sampled-out requests
+        are counted. `get_execution_time` is only called when needed to apply
+        the `keep_slower_than` rule.
+        """
+        key, rate = self.get_rate(endpoint, path)
+
+        if rate >= 1 or status_code >= self.keep_status:
+            return True
+
+        if self.keep_slower_than is not None:
+            execution_time = get_execution_time()
+            if (execution_time is not None and
+                    execution_time >= self.keep_slower_than):
+                return True
+
+        if rate > 0 and random.random() < rate:
+            return True
+
+        with self._lock:
+            self.sampled_out[key] = self.sampled_out.get(key, 0) + 1
+
+        return False
@@ -0,0 +1,211 @@
+"""Queue and listener metrics used by Flask-LogConfig.
+"""
+
+from bisect import bisect_left
+import threading
+import time
+
+
+__all__ = (
+    'Histogram',
+    'QueueStats',
+    'format_prometheus',
+)
+
+
+#: Default histogram bucket upper bounds in milliseconds.
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class Histogram(object):
+    """Histogram with fixed bucket upper bounds.
+
+    Args:
+        buckets (tuple, optional): Sorted bucket upper bounds. Observations
+            greater than the last bound are counted in an implicit ``+Inf``
+            bucket. Defaults to :data:`DEFAULT_BUCKETS`.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value, count=1):
+        """Count `count` observations of `value`."""
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            self.counts[index] += count
+            self.count += count
+            self.sum += value * count
+
+    def as_dict(self):
+        """Return ``dict`` with ``count``, ``sum``, and cumulative
+        ``buckets`` as a list of ``(upper_bound, count)`` tuples ending with
+        an upper bound of ``'+Inf'``.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total, total_sum = self.count, self.sum
+
+        buckets = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+
+        return {'count': total, 'sum': total_sum, 'buckets': buckets}
+
+
+class QueueStats(object):
+    """Counters and histograms of records passing through a logging queue.
+
+    Queue handlers call :meth:`enqueued` and listeners call
+    :meth:`dequeued` and :meth:`emitted`. Lag is the time between a record's
+    creation and its listener picking it up. All times are in milliseconds.
+
+    Attributes:
+        enqueued_count (int): Number of records put on the queue.
+        dequeued_count (int): Number of records taken off the queue.
+        lag (Histogram): Listener lag of each record.
+        emit (dict): Emit latency :class:`Histogram` keyed by handler name.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.enqueued_count = 0
+        self.dequeued_count = 0
+        self.lag = Histogram(buckets)
+        self.emit = {}
+        self._lock = threading.Lock()
+
+    def enqueued(self):
+        """Count a record put on the queue."""
+        with self._lock:
+            self.enqueued_count += 1
+
+    def dequeued(self, record, now=None):
+        """Count `record` taken off the queue and observe its lag."""
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            self.dequeued_count += 1
+
+        self.lag.observe(max(now - record.created, 0) * 1000)
+
+    def emitted(self, handler, milliseconds, count=1):
+        """Observe that `handler` took `milliseconds` to emit `count`
+        records.
+        """
+        name = handler.get_name() or handler.__class__.__name__
+        histogram = self.emit.get(name)
+
+        if histogram is None:
+            with self._lock:
+                histogram = self.emit.setdefault(name,
+                                                 Histogram(self.buckets))
+
+        histogram.observe(milliseconds / float(count), count)
+
+    def as_dict(self):
+        """Return ``dict`` of counters and histograms."""
+        return {
+            'enqueued': self.enqueued_count,
+            'dequeued': self.dequeued_count,
+            'lag': self.lag.as_dict(),
+            'emit': dict((name, histogram.as_dict())
+                         for name, histogram in list(self.emit.items()))
+        }
+
+
+def format_prometheus(stats, prefix='flask_logconfig'):
+    """Return `stats` as returned by ``LogConfig.get_stats()`` in the
+    Prometheus text exposition format.
+    """
+    lines = []
+
+    def metric(name, kind, samples):
+        name = '{0}_{1}'.format(prefix, name)
+        lines.append('# TYPE {0} {1}'.format(name, kind))
+
+        for suffix, labels, value in samples:
+            lines.append('{0}{1}{2} {3}'.format(
+                name, suffix, format_labels(labels), format_value(value)))
+
+    def histogram(name, values):
+        samples = []
+
+        for labels, data in values:
+            for bound, count in data['buckets']:
+                samples.append(('_bucket',
+                                dict(labels, le=format_value(bound)),
+                                count))
+            samples.append(('_sum', labels, data['sum']))
+            samples.append(('_count', labels, data['count']))
+
+        metric(name, 'histogram', samples)
+
+    queue = stats.get('queue')
+
+    if queue is not None:
+        metric('queue_size', 'gauge', [('', {}, queue['size'])])
+        metric('queue_maxsize', 'gauge', [('', {}, queue['maxsize'])])
+        metric('listener_running', 'gauge',
+               [('', {}, int(stats['listeners']['running']))])
+        metric('listener_threads', 'gauge',
+               [('', {}, stats['listeners']['threads'])])
+
+    if 'enqueued' in stats:
+        metric('records_enqueued_total', 'counter',
+               [('', {}, stats['enqueued'])])
+        metric('records_dequeued_total', 'counter',
+               [('', {}, stats['dequeued'])])
+        histogram('listener_lag_milliseconds', [({}, stats['lag'])])
+        histogram('handler_emit_milliseconds',
+                  [({'handler': name}, data)
+                   for name, data in sorted(stats['emit'].items())])
+
+    overflow = stats.get('overflow')
+
+    if overflow is not None:
+        metric('records_dropped_total', 'counter',
+               [('', {'level': level}, count)
+                for level, count in sorted(overflow['by_level'].items(),
+                                           key=lambda item: str(item[0]))])
+
+    sampled_out = stats.get('sampled_out')
+
+    if sampled_out is not None:
+        metric('requests_sampled_out_total', 'counter',
+               [('', {'key': '' if key is None else key}, count)
+                for key, count in sorted(sampled_out.items(),
+                                         key=lambda item: str(item[0]))])
+
+    ratelimit = stats.get('ratelimit')
+
+    if ratelimit is not None:
+        metric('records_suppressed_total', 'counter',
+               [('', {}, ratelimit['suppressed'])])
+        metric('ratelimit_keys', 'gauge', [('', {}, ratelimit['keys'])])
+
+    return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    """Return Prometheus label set for `labels` ``dict``."""
+    if not labels:
+        return ''
+
+    return '{{{0}}}'.format(','.join(
+        '{0}="{1}"'.format(key, str(value).replace('\\', r'\\')
+                                          .replace('"', r'\"')
+                                          .replace('\n', r'\n'))
+        for key, value in sorted(labels.items())))
+
+
+def format_value(value):
+    """Return Prometheus sample value for `value`."""
+    return repr(value) if isinstance(value, float) else str(value)
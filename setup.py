@@ -55,7 +55,7 @@ setup(
     author_email=meta['__email__'],
     description=meta['__summary__'],
     long_description=read('README.rst'),
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks', 'benchmarks.*']),
     install_requires=meta['__install_requires__'],
     tests_require=meta['__tests_require__'],
     cmdclass={'test': Tox},
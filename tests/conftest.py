@@ -1,14 +1,24 @@
 
 import logging
+import sys
 
 import pytest
 import flask
 
+from tests.helpers import SharedListHandler
+
+
+collect_ignore = []
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    collect_ignore.append('test_aio.py')
+
 
 def pytest_runtest_setup(item):
     """Global setup for tests in this directory."""
     logger = logging.getLogger()
     logger.setLevel(logging.NOTSET)
+    SharedListHandler.records = []
 
 
 def pytest_runtest_teardown(item, nextitem):
@@ -0,0 +1,68 @@
+
+import logging
+import time
+
+import flask
+
+from flask_logconfig import LogConfig, request_context_from_record
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class SharedListHandler(logging.Handler):
+    """Keeps the records of all instances in a class attribute for handlers
+    created by ``dictConfig`` that tests can't get hold of. It's emptied
+    before each test.
+    """
+    records = []
+
+    def emit(self, record):
+        SharedListHandler.records.append(record)
+
+
+class UrlListHandler(ListHandler):
+    """Sets ``record.url`` from the request context attached to records."""
+    def emit(self, record):
+        with request_context_from_record(record):
+            record.url = flask.request.url
+        self.records.append(record)
+
+
+def make_record(msg='foo', level=logging.INFO, name='', **attrs):
+    attrs.update(msg=msg,
+                 levelno=level,
+                 levelname=logging.getLevelName(level),
+                 name=name)
+    return logging.makeLogRecord(attrs)
+
+
+def make_config(name, level='INFO'):
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {'list': {'()': 'tests.helpers.SharedListHandler'}},
+        'loggers': {name: {'handlers': ['list'], 'level': level}}
+    }
+
+
+def make_app(logcfg=None, **config):
+    app = flask.Flask(__name__)
+    app.config.update(config)
+    logcfg = logcfg or LogConfig()
+    logcfg.init_app(app)
+
+    return app, logcfg
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
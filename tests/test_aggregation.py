@@ -0,0 +1,308 @@
+
+import logging
+import os
+import pickle
+import socket
+import threading
+
+import pytest
+import flask
+import logconfig
+
+from flask_logconfig import (
+    AggregatorHandler,
+    AggregatorServer,
+    BatchQueueListener,
+    FlaskLogConfigException,
+    LogConfig,
+    RecordCodec,
+    load_config_dict,
+)
+from flask_logconfig.aggregation import (
+    RECORD_FRAME,
+    RECORD_LENGTH,
+    STRINGS_FRAME,
+    STRINGS_START,
+    make_frame,
+    strip_handlers
+)
+from tests.helpers import SharedListHandler, make_record, wait_for
+
+
+@pytest.fixture
+def server(tmpdir):
+    server = AggregatorServer(str(tmpdir.join('logs.sock')))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+
+
+@pytest.fixture
+def aggregated():
+    logger = logging.getLogger('aggregated')
+    logger.handlers = [SharedListHandler()]
+    logger.propagate = False
+
+    yield logger
+
+    logger.handlers = []
+    logger.propagate = True
+
+
+def test_strip_handlers():
+    config = {
+        'version': 1,
+        'handlers': {'list': {'class': 'logging.NullHandler'}},
+        'loggers': {'foo': {'handlers': ['list'], 'level': 'INFO'},
+                    'audit': {'handlers': ['list'], 'propagate': False}},
+        'root': {'handlers': ['list'], 'level': 'DEBUG'}
+    }
+
+    stripped = strip_handlers(config)
+
+    assert stripped == {
+        'version': 1,
+        'handlers': {},
+        'loggers': {'foo': {'level': 'INFO'}, 'audit': {'propagate': True}},
+        'root': {'level': 'DEBUG'}
+    }
+    assert config['handlers']
+
+
+def test_load_config_dict(tmpdir):
+    config = {'version': 1}
+    path = tmpdir.join('logging.json')
+    path.write('{"version": 1}')
+
+    assert load_config_dict(config) is config
+    assert load_config_dict(str(path)) == config
+
+    with pytest.raises(FlaskLogConfigException):
+        load_config_dict('logging.cfg')
+
+
+def test_aggregator_handler(server, aggregated):
+    handler = AggregatorHandler(server.address)
+    record = make_record('foo %s',
+                         name='aggregated',
+                         args=('bar',),
+                         request_context=object(),
+                         queue_route='',
+                         unpicklable=threading.Lock())
+
+    handler.emit_batch([record, record])
+    handler.handle(record)
+
+    assert wait_for(lambda: len(SharedListHandler.records) == 3)
+    handler.close()
+
+    shipped = SharedListHandler.records[0]
+
+    assert shipped.getMessage() == 'foo bar'
+    assert not hasattr(shipped, 'request_context')
+    assert not hasattr(shipped, 'queue_route')
+    assert shipped.unpicklable.startswith('<')
+    assert record.request_context is not None
+
+
+UNPICKLED = []
+
+
+class Unpickled(object):
+    def __reduce__(self):
+        return (UNPICKLED.append, (True,))
+
+
+def test_aggregator_rejects_pickled_extras(server, aggregated):
+    codec = RecordCodec()
+    data = codec.encode(make_record(name='aggregated'))
+    frames = (make_frame(STRINGS_FRAME,
+                         STRINGS_START.pack(1) + codec.dump_strings(1)) +
+              make_frame(RECORD_FRAME,
+                         RECORD_LENGTH.pack(len(data)) +
+                         data +
+                         pickle.dumps({'evil': Unpickled()})))
+
+    sock = socket.socket(socket.AF_UNIX)
+    sock.settimeout(5)
+    sock.connect(server.address)
+    sock.sendall(frames)
+
+    # The aggregator closes the connection once it rejects the extras.
+    assert sock.recv(1) == b''
+    sock.close()
+
+    assert UNPICKLED == []
+    assert SharedListHandler.records == []
+
+    handler = AggregatorHandler(server.address)
+    handler.handle(make_record(name='aggregated', items=(1, 2)))
+
+    assert wait_for(lambda: len(SharedListHandler.records) == 1)
+    handler.close()
+
+    assert SharedListHandler.records[0].items == [1, 2]
+
+
+def test_aggregator_handler_batch_listener(server, aggregated):
+    queue = logconfig.Queue()
+    listener = BatchQueueListener(queue, batch_size=10)
+    handler = AggregatorHandler(server.address)
+    listener.route('aggregated').handlers = [handler]
+    shipped = [('aggregated.alpha', 'one', 'fa'),
+               ('aggregated.beta', 'two', 'fb'),
+               ('aggregated.gamma', 'three', 'fc')]
+
+    for name, msg, func in shipped:
+        queue.put_nowait(make_record(msg, name=name, funcName=func))
+
+    listener.start()
+    listener.stop()
+
+    assert wait_for(lambda: len(SharedListHandler.records) == 3)
+    handler.close()
+
+    assert [(record.name, record.getMessage(), record.funcName)
+            for record in SharedListHandler.records] == shipped
+
+
+def test_aggregator_handler_reset_after_fork(server, aggregated):
+    handler = AggregatorHandler(server.address)
+    handler.handle(make_record(name='aggregated'))
+    sock = handler.sock
+
+    handler.reset_after_fork()
+    handler.handle(make_record(name='aggregated'))
+
+    assert handler.sock is not sock
+    assert wait_for(lambda: len(SharedListHandler.records) == 2)
+
+    handler.close()
+    sock.close()
+
+
+def test_logconfig_aggregator(tmpdir):
+    path = tmpdir.join('app.log')
+
+    class Config:
+        LOGCONFIG = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'formatters': {
+                'default': {'format': '%(name)s %(levelname)s %(message)s'}
+            },
+            'handlers': {
+                'file': {
+                    'class': 'logging.FileHandler',
+                    'filename': str(path),
+                    'formatter': 'default'
+                }
+            },
+            'loggers': {
+                'aggregated': {'handlers': ['file'], 'level': 'INFO'},
+                'audit': {'handlers': ['file'], 'propagate': False}
+            }
+        }
+        LOGCONFIG_AGGREGATOR = str(tmpdir.join('logs.sock'))
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    root = logging.getLogger()
+    logger = logging.getLogger('aggregated')
+    handler = logcfg.get_state(app)['aggregator_handler']
+
+    assert not path.check()
+
+    process = logcfg.start_aggregator(app)
+
+    try:
+        assert list(logcfg.get_listeners(app)) == ['']
+        assert handler in logcfg.get_listeners(app)[''].handlers
+
+        # Workers never configure the handlers of LOGCONFIG.
+        assert logger.handlers == []
+        assert logger.level == logging.INFO
+
+        # Non-propagating loggers must still reach the queued root logger.
+        assert logging.getLogger('audit').propagate
+
+        with app.test_request_context('/foo'):
+            logger.debug('foo')
+            logger.info('bar')
+            logging.getLogger('audit').warning('baz')
+
+        assert wait_for(lambda: path.check() and
+                        len(path.read().splitlines()) == 2)
+        assert path.read() == 'aggregated INFO bar\naudit WARNING baz\n'
+    finally:
+        logcfg.stop_listeners(app)
+        root.removeHandler(handler)
+        handler.close()
+        process.terminate()
+        process.join()
+
+
+def test_logconfig_reset_after_fork():
+    class Config:
+        LOGCONFIG_QUEUE = ['forked']
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    listener = logcfg.get_listeners(app)['forked'].listener
+    queue = listener.queue
+    logcfg.stop_listeners(app)
+
+    # Simulate the state of a forked child which inherits the parent's
+    # queued records and references to threads that don't exist.
+    queue.put_nowait('stale')
+    threads = listener._threads = [threading.Thread()]
+
+    logcfg.reset_after_fork(app)
+
+    assert queue.empty()
+    assert listener.is_running
+    assert listener._threads is not threads
+    assert all(thread.is_alive() for thread in listener._threads)
+
+    logcfg.stop_listeners(app)
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                    reason='requires os.register_at_fork')
+def test_logconfig_restarts_listeners_after_fork():
+    class Config:
+        LOGCONFIG_QUEUE = ['forked']
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    listener = logcfg.get_listeners(app)['forked'].listener
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:  # pragma: no cover
+        try:
+            running = [thread.is_alive() for thread in listener._threads]
+            os.write(write_fd, b'1' if running and all(running) else b'0')
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    logcfg.stop_listeners(app)
+
+    assert result == b'1'
@@ -0,0 +1,113 @@
+
+import asyncio
+import logging
+import queue
+
+import pytest
+import flask
+
+from flask_logconfig import (
+    FlaskLogConfigException,
+    LogConfig
+)
+from flask_logconfig.aio import AsyncQueue, AsyncioQueueListener
+from tests.helpers import ListHandler, make_record
+
+
+class AsyncListHandler(ListHandler):
+    def emit(self, record):  # pragma: no cover
+        raise AssertionError('emit_async should be used')
+
+    async def emit_async(self, record):
+        await asyncio.sleep(0)
+        self.records.append(record)
+
+
+def test_async_queue():
+    q = AsyncQueue(2)
+
+    q.put_nowait(1)
+    q.put(2)
+
+    assert q.full()
+    assert q.qsize() == 2
+
+    with pytest.raises(queue.Full):
+        q.put_nowait(3)
+
+    with pytest.raises(queue.Full):
+        q.put(3, timeout=0.01)
+
+    assert q.get_nowait() == 1
+    assert asyncio.run(q.get_async()) == 2
+    assert q.empty()
+
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_asyncio_queue_listener():
+    q = AsyncQueue()
+    async_handler = AsyncListHandler()
+    error_handler = AsyncListHandler(logging.ERROR)
+    listener = AsyncioQueueListener(q)
+    listener.route('').handlers = (async_handler, error_handler)
+
+    listener.start()
+
+    for level in (logging.INFO, logging.ERROR):
+        q.put(make_record(level, level))
+
+    listener.stop()
+
+    assert [record.msg for record in async_handler.records] == \
+        [logging.INFO, logging.ERROR]
+    assert [record.msg for record in error_handler.records] == \
+        [logging.ERROR]
+
+
+def test_logconfig_queue_asyncio():
+    class Config:
+        LOGCONFIG = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {
+                'url': {'class': 'tests.helpers.UrlListHandler'}
+            },
+            'loggers': {
+                'aio': {'handlers': ['url'], 'level': 'DEBUG'}
+            }
+        }
+        LOGCONFIG_QUEUE = ['aio']
+        LOGCONFIG_QUEUE_ASYNCIO = True
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    route = logcfg.get_listeners(app)['aio']
+
+    assert isinstance(route.listener, AsyncioQueueListener)
+    assert isinstance(route.listener.queue, AsyncQueue)
+
+    @app.route('/foo')
+    def foo():
+        logging.getLogger('aio').info('foo')
+        return ''
+
+    app.test_client().get('/foo')
+    logcfg.stop_listeners(app)
+
+    assert [record.url for record in route.handlers[0].records] == [
+        'http://localhost/foo']
+
+
+def test_logconfig_queue_asyncio_batch_size():
+    app = flask.Flask(__name__)
+    app.config.update(LOGCONFIG_QUEUE=['aio'],
+                      LOGCONFIG_QUEUE_ASYNCIO=True,
+                      LOGCONFIG_QUEUE_BATCH_SIZE=10)
+
+    with pytest.raises(FlaskLogConfigException):
+        LogConfig(app)
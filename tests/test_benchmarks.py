@@ -0,0 +1,18 @@
+
+try:
+    from StringIO import StringIO
+except ImportError:  # pragma: no cover
+    from io import StringIO
+
+from benchmarks.run import BENCHMARKS, run
+
+
+def test_benchmarks_run():
+    out = StringIO()
+    results = run(iterations=20, out=out)
+    lines = out.getvalue().splitlines()
+
+    assert len(BENCHMARKS) == 5
+    assert len(lines) == len(results) + 1
+    assert lines[0].startswith('benchmark')
+    assert 'after_request[level_disabled]' in out.getvalue()
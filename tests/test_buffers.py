@@ -0,0 +1,164 @@
+
+import logging
+
+import pytest
+import flask
+
+from flask_logconfig import (
+    LogConfig,
+    RequestBuffer,
+    RequestBufferHandler,
+    get_request_buffer
+)
+from tests.helpers import ListHandler
+
+
+parametrize = pytest.mark.parametrize
+
+
+class BufferConfig(object):
+    LOGCONFIG = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {
+            'list': {'class': 'tests.helpers.ListHandler'}
+        },
+        'loggers': {
+            'buffered': {'handlers': ['list'], 'level': 'DEBUG'}
+        }
+    }
+    LOGCONFIG_BUFFER = ['buffered']
+    LOGCONFIG_REQUESTS_ENABLED = True
+    LOGCONFIG_REQUESTS_LOGGER = 'buffered'
+    LOGCONFIG_REQUESTS_LEVEL = 'INFO'
+
+
+def make_app(**settings):
+    app = flask.Flask(__name__)
+    app.config.from_object(BufferConfig)
+    app.config.update(settings)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    logger = logging.getLogger('buffered')
+
+    @app.route('/<int:status>')
+    def view(status):
+        logger.debug('debug')
+        logger.info('info')
+        return '', status
+
+    @app.route('/error')
+    def error():
+        logger.debug('debug')
+        logger.error('error')
+        logger.debug('after')
+        return ''
+
+    @app.route('/warning')
+    def warning():
+        logger.debug('debug')
+        logger.warning('warning')
+        return ''
+
+    @app.route('/raise')
+    def fail():
+        logger.debug('debug')
+        raise RuntimeError()
+
+    handler = logcfg.get_state(app)['buffer']['handlers']['buffered']
+
+    return app, handler.handlers[0]
+
+
+@parametrize('path,messages', [
+    ('/200', []),
+    ('/404', []),
+    ('/500', ['debug', 'info', 'GET /500 - 500']),
+    ('/503', ['debug', 'info', 'GET /503 - 503']),
+    ('/error', ['debug', 'error', 'after', 'GET /error - 200']),
+    ('/warning', ['warning']),
+])
+def test_logconfig_buffer(path, messages):
+    app, handler = make_app()
+
+    app.test_client().get(path)
+
+    assert [record.getMessage() for record in handler.records] == messages
+
+
+def test_logconfig_buffer_flush_on_exception():
+    app, handler = make_app()
+
+    app.test_client().get('/raise')
+
+    assert handler.records[0].getMessage() == 'debug'
+
+
+def test_logconfig_buffer_config():
+    app, handler = make_app(LOGCONFIG_BUFFER_FLUSH_LEVEL='INFO',
+                            LOGCONFIG_BUFFER_FLUSH_STATUS=404)
+
+    app.test_client().get('/200')
+    assert [record.getMessage() for record in handler.records] == \
+        ['debug', 'info', 'GET /200 - 200']
+
+    del handler.records[:]
+
+    app.test_client().get('/404')
+    assert [record.getMessage() for record in handler.records] == \
+        ['debug', 'info', 'GET /404 - 404']
+
+
+def test_logconfig_buffer_pass_level():
+    app, handler = make_app(LOGCONFIG_BUFFER_PASS_LEVEL='INFO')
+
+    app.test_client().get('/200')
+    assert [record.getMessage() for record in handler.records] == \
+        ['info', 'GET /200 - 200']
+
+    del handler.records[:]
+
+    app, handler = make_app(LOGCONFIG_BUFFER_PASS_LEVEL='CRITICAL')
+
+    app.test_client().get('/warning')
+    assert handler.records == []
+
+
+def test_logconfig_buffer_outside_request():
+    app, handler = make_app()
+
+    logging.getLogger('buffered').debug('outside')
+
+    assert [record.getMessage() for record in handler.records] == \
+        ['outside']
+
+
+def test_request_buffer_capacity():
+    target = ListHandler()
+    handler = RequestBufferHandler([target])
+    buffer = RequestBuffer(capacity=2)
+
+    for idx in range(3):
+        record = logging.makeLogRecord({'msg': idx, 'levelno': 10})
+        buffer.append(handler, record)
+
+    assert len(buffer) == 2
+    assert buffer.dropped == 1
+
+    buffer.flush()
+
+    assert buffer.triggered
+    assert [record.msg for record in target.records] == [1, 2]
+
+
+def test_get_request_buffer():
+    app = flask.Flask(__name__)
+
+    with app.test_request_context():
+        assert get_request_buffer(create=False) is None
+
+        buffer = get_request_buffer(capacity=5)
+
+        assert get_request_buffer() is buffer
+        assert buffer.entries.maxlen == 5
@@ -0,0 +1,113 @@
+
+import logging
+
+import flask
+
+from flask_logconfig import LogConfig, RequestIdFilter
+from tests.helpers import ListHandler, make_record
+
+
+def make_queued_app(name, **config):
+    handler = ListHandler()
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+
+    app = flask.Flask(__name__)
+    app.config.update(config, LOGCONFIG_QUEUE=[name])
+    logcfg = LogConfig()
+
+    return app, logcfg, logger, handler
+
+
+def test_request_id_filter():
+    app = flask.Flask(__name__)
+    request_filter = RequestIdFilter()
+
+    with app.test_request_context(headers={'X-Request-ID': 'abc'}):
+        record = make_record()
+
+        assert request_filter.filter(record)
+        assert record.request_id == 'abc'
+
+    with app.test_request_context():
+        first, second = make_record(), make_record()
+        request_filter(first)
+        request_filter(second)
+
+        assert len(first.request_id) == 32
+        assert first.request_id == second.request_id
+
+    record = make_record()
+    request_filter(record)
+
+    assert record.request_id is None
+
+
+def test_request_id_filter_options():
+    app = flask.Flask(__name__)
+    request_filter = RequestIdFilter(header=None,
+                                     attr='rid',
+                                     generate=False,
+                                     name='enriched')
+
+    with app.test_request_context(headers={'X-Request-ID': 'abc'}):
+        record = make_record(name='enriched')
+        other = make_record(name='other')
+
+        assert request_filter.filter(record)
+        assert not request_filter.filter(other)
+        assert record.rid is None
+        assert not hasattr(other, 'rid')
+
+
+def test_request_id_filter_keeps_existing():
+    record = make_record()
+    record.request_id = 'abc'
+
+    RequestIdFilter()(record)
+
+    assert record.request_id == 'abc'
+
+
+def test_logconfig_enrichers():
+    app, logcfg, logger, handler = make_queued_app(
+        'enriched', LOGCONFIG_QUEUE_COPY_CONTEXT=False)
+    logcfg.add_enricher(RequestIdFilter())
+    logcfg.init_app(app)
+
+    @logcfg.add_enricher
+    def endpoint(record):
+        record.endpoint = (flask.request.endpoint
+                           if flask.has_request_context() else None)
+
+    @app.route('/foo')
+    def foo():
+        logger.info('inside')
+        return ''
+
+    app.test_client().get('/foo', headers={'X-Request-ID': 'abc'})
+    logger.info('outside')
+    logcfg.stop_listeners(app)
+
+    inside, outside = handler.records
+
+    assert (inside.request_id, inside.endpoint) == ('abc', 'foo')
+    assert (outside.request_id, outside.endpoint) == (None, None)
+    assert not hasattr(inside, 'request_context')
+
+
+def test_logconfig_queue_copy_context():
+    app, logcfg, logger, handler = make_queued_app('copied')
+    logcfg.init_app(app)
+
+    with app.test_request_context('/foo'):
+        logger.info('inside')
+
+    logger.info('outside')
+    logcfg.stop_listeners(app)
+
+    inside, outside = handler.records
+
+    assert inside.request_context is not None
+    assert not hasattr(outside, 'request_context')
@@ -0,0 +1,168 @@
+
+import logging
+import os
+
+import pytest
+import mock
+import flask
+
+from flask_logconfig import BufferedFileHandler, LogConfig
+from flask_logconfig import files
+from tests.helpers import make_record, wait_for
+
+
+@pytest.fixture
+def make_handler(tmpdir):
+    handlers = []
+
+    def make_handler(**kargs):
+        kargs.setdefault('flush_interval', None)
+        handler = BufferedFileHandler(str(tmpdir.join('app.log')), **kargs)
+        handlers.append(handler)
+        return handler
+
+    yield make_handler
+
+    for handler in handlers:
+        handler.close()
+
+
+def test_buffered_file_handler_buffer_size(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler(buffer_size=8)
+
+    handler.handle(make_record('foo'))
+
+    assert path.read() == ''
+
+    handler.handle(make_record('bar'))
+
+    assert path.read() == 'foo\nbar\n'
+
+
+def test_buffered_file_handler_flush_level(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler(flush_level='warning')
+
+    handler.handle(make_record('foo'))
+
+    assert path.read() == ''
+
+    handler.handle(make_record('bar', logging.WARNING))
+
+    assert path.read() == 'foo\nbar\n'
+
+
+def test_buffered_file_handler_flush_level_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        BufferedFileHandler(str(tmpdir.join('app.log')), flush_level='nope')
+
+
+def test_buffered_file_handler_close(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler()
+
+    handler.handle(make_record('foo'))
+    handler.close()
+
+    assert path.read() == 'foo\n'
+
+
+def test_buffered_file_handler_flush_interval(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler(flush_interval=0.01)
+
+    handler.handle(make_record('foo'))
+
+    assert wait_for(lambda: path.read() == 'foo\n')
+
+
+def test_buffered_file_handler_emit_batch(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler()
+
+    with mock.patch('flask_logconfig.files.write_chunks',
+                    wraps=files.write_chunks) as write_chunks:
+        handler.emit_batch([make_record(index) for index in range(3)])
+
+        assert path.read() == ''
+
+        handler.emit_batch([make_record(3), make_record(4, logging.ERROR)])
+
+        assert write_chunks.call_count == 1
+
+    assert path.read().splitlines() == [str(index) for index in range(5)]
+
+
+def test_buffered_file_handler_rotate(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler(max_bytes=8, backup_count=2)
+
+    handler.emit_batch([make_record(name) for name in ('foo', 'bar', 'baz',
+                                                       'qux', 'quux')])
+    handler.flush()
+
+    assert path.read() == 'quux\n'
+    assert tmpdir.join('app.log.1').read() == 'baz\nqux\n'
+    assert tmpdir.join('app.log.2').read() == 'foo\nbar\n'
+    assert not tmpdir.join('app.log.3').exists()
+
+
+def test_buffered_file_handler_fork(tmpdir, make_handler):
+    path = tmpdir.join('app.log')
+    handler = make_handler()
+
+    handler.handle(make_record('parent'))
+
+    with mock.patch('os.getpid', return_value=1):
+        handler.handle(make_record('child', logging.ERROR))
+
+    assert path.read() == 'child\n'
+
+
+def test_write_chunks_partial(tmpdir):
+    path = str(tmpdir.join('app.log'))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+    writev = os.writev
+
+    def partial_writev(fd, chunks):
+        return writev(fd, [chunks[0][:2]])
+
+    try:
+        with mock.patch('os.writev', side_effect=partial_writev):
+            assert files.write_chunks(fd, [b'foo', b'bar']) == 6
+    finally:
+        os.close(fd)
+
+    with open(path) as fileobj:
+        assert fileobj.read() == 'foobar'
+
+
+def test_logconfig_buffered_file_handler(tmpdir):
+    path = tmpdir.join('app.log')
+    app = flask.Flask(__name__)
+    app.config.update(
+        LOGCONFIG={
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {'file': {
+                'class': 'flask_logconfig.BufferedFileHandler',
+                'filename': str(path),
+                'flush_interval': None
+            }},
+            'loggers': {'buffered.queued': {'handlers': ['file'],
+                                            'level': 'INFO'}}
+        },
+        LOGCONFIG_QUEUE=['buffered.queued'],
+        LOGCONFIG_QUEUE_BATCH_SIZE=10)
+    logcfg = LogConfig(app)
+    logger = logging.getLogger('buffered.queued')
+
+    for index in range(20):
+        logger.info(index)
+
+    logcfg.stop_listeners(app)
+    file_handler = logcfg.get_listeners(app)['buffered.queued'].handlers[0]
+    file_handler.close()
+
+    assert path.read().splitlines() == [str(index) for index in range(20)]
@@ -1,17 +1,29 @@
 
 from copy import deepcopy
+import datetime
+import json
 import logging
+import os
+import subprocess
+import sys
 
 import pytest
 import mock
 import flask
 import logconfig
+
+import flask_logconfig
 from logutils.testing import TestHandler, Matcher
 
 from flask_logconfig import (
     LogConfig,
     FlaskQueueHandler,
     FlaskLogConfigException,
+    RequestJsonFormat,
+    RequestMessageFormat,
+    RequestSnapshot,
+    get_current_request_context,
+    get_json_dumps,
     request_context_from_record
 )
 
@@ -136,7 +148,7 @@ def init_app(app, settings):
 
 
 @parametrize('config,funcall', [
-    (logging_dict, 'logconfig.loaders.from_dict'),
+    (logging_dict, 'logging.config.dictConfig'),
     ('logging.json', 'logconfig.loaders.from_json'),
     ('logging.yml',  'logconfig.loaders.from_yaml'),
     ('logging.yaml',  'logconfig.loaders.from_yaml'),
@@ -158,7 +170,7 @@ def test_config_value_logconfig_queue(app):
     class Config:
         LOGCONFIG_QUEUE = ['logconfig', 'customlogger']
 
-    with mock.patch('logconfig.queuify_logger') as patched:
+    with mock.patch('flask_logconfig.queuify_logger') as patched:
         logcfg = init_app(app, Config)
 
         assert patched.called
@@ -240,12 +252,54 @@ def test_logconfig_queue_request_context(app):
     assert url in handler.formatted[0]
 
 
+def test_logconfig_queue_request_snapshot(app):
+    config = UrlHandlerConfig()
+    config.LOGCONFIG = deepcopy(config.LOGCONFIG)
+    config.LOGCONFIG['handlers']['test_handler'].pop('formatter')
+    config.LOGCONFIG_QUEUE_SNAPSHOT = {'headers': ['X-Request-Id'],
+                                       'g': ['user_id']}
+
+    logcfg = init_app(app, config)
+
+    @app.route('/foo')
+    def foo():
+        flask.g.user_id = 1
+        logging.debug('bar')
+        return ''
+
+    app.test_client().get('/foo', headers={'X-Request-Id': 'abc'})
+
+    with app.app_context():
+        logcfg.stop_listeners()
+        handler = logcfg.get_listeners()[''].handlers[0]
+
+    record = logging.makeLogRecord(handler.buffer[0])
+
+    assert not hasattr(record, 'request_context')
+
+    with request_context_from_record(record) as snapshot:
+        assert isinstance(snapshot, RequestSnapshot)
+        assert snapshot.as_dict() == {'method': 'GET',
+                                      'path': '/foo',
+                                      'remote_addr': '127.0.0.1',
+                                      'endpoint': 'foo',
+                                      'headers': {'X-Request-Id': 'abc'},
+                                      'g': {'user_id': 1}}
+
+
 def test_request_context_from_record(app):
     with app.test_request_context() as ctx:
         with request_context_from_record() as test_ctx:
             assert test_ctx is ctx
 
 
+def test_get_current_request_context(app):
+    assert get_current_request_context() is None
+
+    with app.test_request_context() as ctx:
+        assert get_current_request_context() is ctx
+
+
 @parametrize('func', [
     request_context_from_record,
 ])
@@ -386,3 +440,390 @@ def test_logconfig_requests_logging_message_xformat_session(app):
 
     assert 'session' in data
     assert handler.matches(msg='None None')
+
+
+def test_logconfig_requests_logging_message_data_lazy(app):
+    config = RequestsConfig()
+    logcfg = init_app(app, config)
+
+    with app.test_request_context('/foo'):
+        response = app.response_class('', status=201)
+        data = logcfg.get_request_message_data(response)
+
+        assert logcfg.make_request_message(data) == 'GET /foo - 201'
+        assert set(data._cache) == set(['method', 'path', 'status_code'])
+        assert 'url' in data
+        assert 'HTTP_HOST' in data
+        assert 'missing' not in data
+
+
+@parametrize('format_string,fields,literal', [
+    ('{method} {path} - {status_code}',
+     ('method', 'path', 'status_code'),
+     None),
+    ('{session[foo]} {session[bar]}', ('session',), None),
+    ('{user_agent.browser} {execution_time:.{precision}f}',
+     ('user_agent', 'execution_time', 'precision'),
+     None),
+    ('request {{done}}', (), 'request {done}'),
+])
+def test_request_message_format(format_string, fields, literal):
+    message_format = RequestMessageFormat(format_string)
+
+    assert message_format.fields == fields
+    assert message_format.literal == literal
+
+
+def test_request_message_format_render():
+    class Data(dict):
+        def __init__(self, *args, **kargs):
+            dict.__init__(self, *args, **kargs)
+            self.keys_read = []
+
+        def __getitem__(self, key):
+            self.keys_read.append(key)
+            return dict.__getitem__(self, key)
+
+    message_format = RequestMessageFormat('{path} {session[user]} {path}')
+    data = Data(path='/foo', session={'user': 'bob'}, method='GET')
+
+    assert message_format.render(data) == '/foo bob /foo'
+    assert data.keys_read == ['path', 'session']
+
+
+@parametrize('format_string', [
+    '{0} {path}',
+    '{} {path}',
+    '{path',
+])
+def test_request_message_format_exception(format_string):
+    with pytest.raises(FlaskLogConfigException):
+        RequestMessageFormat(format_string)
+
+
+def test_logconfig_requests_logging_level_name(app):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_LEVEL = 'info'
+
+    init_app(app, config)
+
+    with app.test_request_context():
+        app.test_client().get('/')
+
+    handler = test_logger.handlers[0]
+    assert handler.formatted[0] == 'tests - INFO - GET / - 404'
+
+
+def test_logconfig_requests_logging_level_disabled(app):
+    config = RequestsConfig()
+    config.LOGCONFIG = deepcopy(config.LOGCONFIG)
+    config.LOGCONFIG['loggers']['tests']['level'] = 'INFO'
+
+    logcfg = init_app(app, config)
+
+    with mock.patch.object(logcfg, 'get_request_message_data') as patched:
+        app.test_client().get('/')
+        assert not patched.called
+
+    assert logcfg.get_state(app)['requests_active'] is False
+
+    with mock.patch.object(logcfg, 'is_any_requests_enabled') as enabled, \
+            mock.patch.object(logcfg, 'get_requests_policy') as policy:
+        app.test_client().get('/')
+        assert not enabled.called
+        assert not policy.called
+
+    handler = test_logger.handlers[0]
+    assert not handler.buffer
+
+    test_logger.setLevel(logging.DEBUG)
+    app.test_client().get('/')
+    assert not handler.buffer
+
+    logcfg.reset_requests_enabled(app)
+    app.test_client().get('/')
+    assert handler.formatted == ['tests - DEBUG - GET / - 404']
+
+
+@parametrize('threshold,elapsed_ns,expected', [
+    (None, 10 ** 9, 'tests - DEBUG - GET / - 404'),
+    (100, 50 * 10 ** 6, 'tests - DEBUG - GET / - 404'),
+    (100, 100 * 10 ** 6, 'tests - WARNING - GET / - 404 - 100.00ms (slow)'),
+])
+def test_logconfig_requests_logging_slow(app, threshold, elapsed_ns, expected):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_SLOW_THRESHOLD = threshold
+
+    init_app(app, config)
+
+    clock = mock.Mock(side_effect=[0, elapsed_ns])
+
+    with mock.patch('flask_logconfig.clock_ns', clock):
+        app.test_client().get('/')
+
+    handler = test_logger.handlers[0]
+
+    assert handler.formatted == [expected]
+    assert handler.buffer[0]['slow'] is (threshold is not None and
+                                         elapsed_ns >= threshold * 10 ** 6)
+
+
+def test_logconfig_requests_logging_slow_only(app):
+    config = RequestsConfig()
+    config.LOGCONFIG = deepcopy(config.LOGCONFIG)
+    config.LOGCONFIG['loggers']['tests']['level'] = 'INFO'
+    config.LOGCONFIG_REQUESTS_SLOW_THRESHOLD = 100
+
+    init_app(app, config)
+
+    with mock.patch('flask_logconfig.clock_ns',
+                    mock.Mock(side_effect=[0, 10 ** 6, 0, 10 ** 9])):
+        app.test_client().get('/')
+        app.test_client().get('/')
+
+    handler = test_logger.handlers[0]
+
+    assert handler.formatted == [
+        'tests - WARNING - GET / - 404 - 1000.00ms (slow)'
+    ]
+
+
+def test_logconfig_requests_execution_time(app):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_MSG_FORMAT = '{execution_time}'
+
+    init_app(app, config)
+
+    with mock.patch('flask_logconfig.clock_ns',
+                    mock.Mock(side_effect=[10 ** 9, 10 ** 9 + 1500000])):
+        app.test_client().get('/')
+
+    handler = test_logger.handlers[0]
+
+    assert handler.formatted == ['tests - DEBUG - 1.5']
+
+
+@parametrize('backend', [None, 'json'])
+def test_logconfig_requests_json(app, backend):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_JSON = True
+    config.LOGCONFIG_REQUESTS_JSON_FIELDS = ['method', 'path', 'status_code',
+                                             'execution_time', 'user_agent',
+                                             'MISSING']
+    config.LOGCONFIG_REQUESTS_JSON_HEADERS = ['X-Request-Id', 'X-Missing']
+    config.LOGCONFIG_REQUESTS_JSON_SESSION = ['user']
+    config.LOGCONFIG_REQUESTS_JSON_BACKEND = backend
+
+    logcfg = init_app(app, config)
+
+    assert isinstance(logcfg.get_state(app)['requests']['message_format'],
+                      RequestJsonFormat)
+
+    with mock.patch('flask_logconfig.clock_ns',
+                    mock.Mock(side_effect=[0, 1500000])):
+        app.test_client().get('/', headers={'X-Request-Id': 'abc',
+                                            'User-Agent': 'tests'})
+
+    handler = test_logger.handlers[0]
+
+    assert json.loads(handler.buffer[0]['msg']) == {
+        'method': 'GET',
+        'path': '/',
+        'status_code': 404,
+        'execution_time': 1.5,
+        'user_agent': 'tests',
+        'MISSING': None,
+        'headers': {'X-Request-Id': 'abc', 'X-Missing': None},
+        'session': {'user': None}
+    }
+
+
+def test_logconfig_requests_json_slow(app):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_JSON = True
+    config.LOGCONFIG_REQUESTS_JSON_FIELDS = ['path']
+    config.LOGCONFIG_REQUESTS_SLOW_THRESHOLD = 100
+
+    init_app(app, config)
+
+    with mock.patch('flask_logconfig.clock_ns',
+                    mock.Mock(side_effect=[0, 10 ** 6, 0, 10 ** 9])):
+        app.test_client().get('/')
+        app.test_client().get('/')
+
+    handler = test_logger.handlers[0]
+
+    assert [json.loads(record['msg']) for record in handler.buffer] == [
+        {'path': '/'},
+        {'path': '/', 'slow': True}
+    ]
+    assert handler.buffer[1]['levelno'] == logging.WARNING
+
+
+def test_logconfig_requests_policies(app):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_MSG_FORMAT = '{path}'
+    config.LOGCONFIG_REQUESTS_POLICIES = {
+        'api.*': {'json': True,
+                  'json_fields': ['path'],
+                  'level': 'INFO'},
+        'api.v2.*': {'level': 'WARNING'},
+        'admin.*': {'msg_format': 'admin {session[user]}'},
+        'health': {'enabled': False}
+    }
+
+    api = flask.Blueprint('api', __name__)
+    admin = flask.Blueprint('admin', __name__)
+
+    @api.route('/api/items')
+    def items():
+        return ''
+
+    @admin.route('/admin')
+    def index():
+        return ''
+
+    @app.route('/health')
+    def health():
+        return ''
+
+    @app.route('/other')
+    def other():
+        return ''
+
+    logcfg = init_app(app, config)
+    app.register_blueprint(api)
+    app.register_blueprint(admin)
+
+    client = app.test_client()
+
+    for path in ['/api/items', '/admin', '/health', '/other', '/missing']:
+        client.get(path)
+
+    handler = test_logger.handlers[0]
+
+    assert [(record['levelno'], record['msg'])
+            for record in handler.buffer] == [
+        (logging.INFO, '{"path":"/api/items"}'),
+        (logging.DEBUG, 'admin None'),
+        (logging.DEBUG, '/other'),
+        (logging.DEBUG, '/missing'),
+    ]
+
+    state = logcfg.get_state(app)
+
+    assert (logcfg.get_requests_policy('api.items', app) is
+            state['requests_policies']['api.*'])
+    assert (logcfg.get_requests_policy('api.v2.items', app) is
+            state['requests_policies']['api.v2.*'])
+    assert logcfg.get_requests_policy(None, app) is state['requests']
+    assert set(state['requests_endpoints']) == set(['api.items',
+                                                    'api.v2.items',
+                                                    'admin.index',
+                                                    'health',
+                                                    'other',
+                                                    None])
+
+
+def test_logconfig_requests_policies_enabled(app):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_ENABLED = False
+    config.LOGCONFIG_REQUESTS_MSG_FORMAT = '{path}'
+    config.LOGCONFIG_REQUESTS_POLICIES = {'health': {'enabled': True}}
+
+    @app.route('/health')
+    def health():
+        return ''
+
+    @app.route('/other')
+    def other():
+        return ''
+
+    logcfg = init_app(app, config)
+    client = app.test_client()
+
+    for path in ['/health', '/other', '/missing']:
+        client.get(path)
+
+    handler = test_logger.handlers[0]
+
+    assert logcfg.has_requests_policies_enabled(app)
+    assert [record['msg'] for record in handler.buffer] == ['/health']
+
+
+def test_logconfig_requests_policies_unknown_option(app):
+    config = RequestsConfig()
+    config.LOGCONFIG_REQUESTS_POLICIES = {'health': {'nope': True}}
+
+    with pytest.raises(FlaskLogConfigException):
+        init_app(app, config)
+
+
+@parametrize('backend', ['json', 'orjson', 'ujson'])
+def test_get_json_dumps(backend):
+    try:
+        dumps = get_json_dumps(backend)
+    except FlaskLogConfigException:
+        pytest.importorskip(backend)
+        raise
+
+    assert json.loads(dumps({'a': [1, None]})) == {'a': [1, None]}
+
+
+@parametrize('backend', ['json', 'orjson', 'ujson'])
+def test_request_json_format_non_json_values(app, backend):
+    try:
+        dumps = get_json_dumps(backend)
+    except FlaskLogConfigException:
+        pytest.importorskip(backend)
+        raise
+
+    app.secret_key = 'secret'
+    when = datetime.datetime(2020, 1, 2, 3, 4, 5)
+    message_format = RequestJsonFormat(['path'],
+                                       session=['when', 'user'],
+                                       dumps=dumps)
+
+    with app.test_request_context('/a/b'):
+        flask.session['when'] = when
+        flask.session['user'] = {'id': 1}
+        message = message_format.render({'path': '/a/b'})
+
+    assert '"/a/b"' in message
+    assert json.loads(message) == {
+        'path': '/a/b',
+        'session': {'when': str(when), 'user': {'id': 1}}
+    }
+
+
+def test_get_json_dumps_unknown():
+    with pytest.raises(FlaskLogConfigException):
+        get_json_dumps('yaml')
+
+
+def test_import_defers_feature_modules():
+    modules = ('multiprocessing',
+               'mmap',
+               'flask_logconfig.aggregation',
+               'flask_logconfig.files',
+               'flask_logconfig.ratelimit',
+               'flask_logconfig.reload',
+               'flask_logconfig.ringbuffer')
+    code = ('import sys, flask_logconfig; '
+            'print([name for name in {0!r} if name in sys.modules])'
+            .format(modules))
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=os.path.dirname(os.path.dirname(
+                                         os.path.abspath(__file__))))
+
+    assert output.strip() == b'[]'
+
+
+def test_lazy_exports():
+    from flask_logconfig import files
+
+    assert flask_logconfig.BufferedFileHandler is files.BufferedFileHandler
+    assert 'RingBufferHandler' in dir(flask_logconfig)
+
+    with pytest.raises(AttributeError):
+        flask_logconfig.Nope
@@ -0,0 +1,362 @@
+
+import logging
+import threading
+
+import pytest
+import mock
+import flask
+import logconfig
+
+import flask_logconfig
+from flask_logconfig import (
+    LogConfig,
+    BatchQueueListener,
+    FlaskQueueHandler,
+    QueueRoute,
+    RoutingQueueListener
+)
+from tests.helpers import ListHandler, make_record
+
+
+parametrize = pytest.mark.parametrize
+
+
+class BatchHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self.batches = []
+
+    def emit(self, record):
+        self.batches.append([record])
+
+    def emit_batch(self, records):
+        self.batches.append(list(records))
+
+
+@parametrize('count,batch_size,sizes', [
+    (1, 10, [1]),
+    (10, 10, [10]),
+    (25, 10, [10, 10, 5]),
+    (3, 1, [1, 1, 1]),
+])
+def test_batch_queue_listener(count, batch_size, sizes):
+    queue = logconfig.Queue(-1)
+    batch_handler = BatchHandler()
+    list_handler = ListHandler()
+    listener = BatchQueueListener(queue,
+                                  batch_handler,
+                                  list_handler,
+                                  batch_size=batch_size)
+
+    # Fill queue before starting listener so that batches are deterministic.
+    for idx in range(count):
+        queue.put_nowait(make_record(idx))
+
+    listener.start()
+    listener.stop()
+
+    assert [len(batch) for batch in batch_handler.batches] == sizes
+    assert [record.msg for batch in batch_handler.batches
+            for record in batch] == list(range(count))
+    assert [record.msg for record in list_handler.records] == \
+        list(range(count))
+
+
+def test_batch_queue_listener_handler_level():
+    queue = logconfig.Queue(-1)
+    batch_handler = BatchHandler(logging.WARNING)
+    list_handler = ListHandler(logging.ERROR)
+    listener = BatchQueueListener(queue, batch_handler, list_handler)
+
+    for level in (logging.DEBUG, logging.WARNING, logging.ERROR):
+        queue.put_nowait(make_record(level, level))
+
+    listener.start()
+    listener.stop()
+
+    assert [record.msg for batch in batch_handler.batches
+            for record in batch] == [logging.WARNING, logging.ERROR]
+    assert [record.msg for record in list_handler.records] == \
+        [logging.ERROR]
+
+
+def test_batch_queue_listener_timeout():
+    queue = logconfig.Queue(-1)
+    batch_handler = BatchHandler()
+    listener = BatchQueueListener(queue,
+                                  batch_handler,
+                                  batch_size=10,
+                                  batch_timeout=0.01)
+
+    listener.start()
+
+    for idx in range(3):
+        queue.put_nowait(make_record(idx))
+
+    listener.stop()
+
+    assert sum(len(batch) for batch in batch_handler.batches) == 3
+
+
+def test_logconfig_queue_batch_config():
+    class Config:
+        LOGCONFIG_QUEUE = ['batched']
+        LOGCONFIG_QUEUE_BATCH_SIZE = 50
+        LOGCONFIG_QUEUE_BATCH_TIMEOUT = 20
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app, start_listeners=False)
+
+    listener = logcfg.get_listeners(app)['batched'].listener
+
+    assert isinstance(listener, BatchQueueListener)
+    assert listener.batch_size == 50
+    assert listener.batch_timeout == 0.02
+
+
+def test_routing_queue_listener():
+    queue = logconfig.Queue(-1)
+    listener = RoutingQueueListener(queue)
+    handlers = {}
+
+    for name in ('', 'app', 'app.sub'):
+        handlers[name] = ListHandler()
+        listener.route(name).handlers = (handlers[name],)
+
+    tagged = make_record('tagged')
+    tagged.name = 'app.sub.child'
+    tagged.queue_route = 'app'
+
+    for name, msg in (('app.sub.child', 'child'),
+                      ('app.other', 'other'),
+                      ('root', 'root')):
+        record = make_record(msg)
+        record.name = name
+        queue.put_nowait(record)
+
+    queue.put_nowait(tagged)
+
+    listener.start()
+    listener.stop()
+
+    assert [record.msg for record in handlers[''].records] == ['root']
+    assert [record.msg for record in handlers['app'].records] == \
+        ['other', 'tagged']
+    assert [record.msg for record in handlers['app.sub'].records] == \
+        ['child']
+
+
+@parametrize('threads', [1, 3])
+def test_routing_queue_listener_threads(threads):
+    queue = logconfig.Queue(-1)
+    listener = RoutingQueueListener(queue, threads=threads)
+    handler = ListHandler()
+    listener.route('').handlers = (handler,)
+
+    listener.start()
+    listener.start()
+
+    assert len(listener._threads) == threads
+
+    for idx in range(100):
+        queue.put_nowait(make_record(idx))
+
+    listener.route('').stop()
+    listener.stop()
+
+    assert not listener.is_running
+    assert sorted(record.msg for record in handler.records) == \
+        list(range(100))
+
+
+def test_logconfig_queue_shared_listener():
+    class Config:
+        LOGCONFIG = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {
+                'one': {'class': 'tests.helpers.ListHandler'},
+                'two': {'class': 'tests.helpers.ListHandler'}
+            },
+            'loggers': {
+                'queued_one': {'handlers': ['one'], 'level': 'DEBUG'},
+                'queued_two': {'handlers': ['two'], 'level': 'DEBUG'}
+            }
+        }
+        LOGCONFIG_QUEUE = ['queued_one', 'queued_two']
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    listeners = logcfg.get_listeners(app)
+    routes = [listeners[name] for name in Config.LOGCONFIG_QUEUE]
+
+    assert all(isinstance(route, QueueRoute) for route in routes)
+    assert routes[0].listener is routes[1].listener
+    assert len(routes[0].listener._threads) == 1
+
+    for name in Config.LOGCONFIG_QUEUE:
+        logger = logging.getLogger(name)
+        assert isinstance(logger.handlers[0], FlaskQueueHandler)
+        assert logger.handlers[0].route == name
+
+        with app.test_request_context():
+            for idx in range(10):
+                logger.info(name)
+
+    logcfg.stop_listeners(app)
+
+    for name, route in zip(Config.LOGCONFIG_QUEUE, routes):
+        records = route.handlers[0].records
+        assert [record.msg for record in records] == [name] * 10
+
+
+def prepare_in_place(self, record):
+    """Mimic ``QueueHandler.prepare`` before Python 3.8 which modifies the
+    record instead of returning a copy.
+    """
+    self.format(record)
+    record.msg = record.message
+    record.args = None
+    record.exc_info = None
+    return record
+
+
+@parametrize('prepare', [
+    flask_logconfig.QueueHandler.prepare,
+    prepare_in_place
+])
+def test_logconfig_queue_nested_loggers(prepare):
+    class Config:
+        LOGCONFIG = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {
+                'parent': {'class': 'tests.helpers.ListHandler'},
+                'child': {'class': 'tests.helpers.ListHandler'}
+            },
+            'loggers': {
+                'nested': {'handlers': ['parent'], 'level': 'DEBUG'},
+                'nested.child': {'handlers': ['child'], 'level': 'DEBUG'}
+            }
+        }
+        LOGCONFIG_QUEUE = ['nested', 'nested.child']
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    listeners = logcfg.get_listeners(app)
+
+    patched = mock.patch.object(flask_logconfig.QueueHandler,
+                                'prepare',
+                                prepare)
+
+    with patched, app.test_request_context():
+        logging.getLogger('nested.child').info('hello')
+
+    logcfg.stop_listeners(app)
+
+    for name in Config.LOGCONFIG_QUEUE:
+        records = listeners[name].handlers[0].records
+        assert [record.msg for record in records] == ['hello']
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.entered = threading.Event()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.entered.set()
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+def make_queued_app(name, handler, **config):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+
+    app = flask.Flask(__name__)
+    app.config.update(config, LOGCONFIG_QUEUE=[name])
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    return app, logcfg, logger
+
+
+def log_behind_blocked_record(app, handler, logger, count):
+    """Log a record that blocks the listener inside `handler` followed by
+    `count` records that stay on the queue.
+    """
+    with app.test_request_context('/'):
+        logger.info('blocking')
+        handler.entered.wait(5)
+
+        for index in range(count):
+            logger.info(index)
+
+
+def test_logconfig_flush():
+    handler = BlockingHandler()
+    app, logcfg, logger = make_queued_app('flushed', handler)
+
+    log_behind_blocked_record(app, handler, logger, 4)
+    threading.Timer(0.05, handler.unblock.set).start()
+
+    result = logcfg.flush(app, timeout=5)
+
+    assert result == {'flushed': 4, 'dropped': 0, 'timed_out': False}
+    assert len(handler.records) == 5
+    assert not logcfg.get_queue_listeners(app)[0].is_running
+    assert logcfg.flush(app) == {'flushed': 0,
+                                 'dropped': 0,
+                                 'timed_out': False}
+
+
+def test_logconfig_flush_timeout():
+    handler = BlockingHandler()
+    app, logcfg, logger = make_queued_app('flushed', handler)
+
+    log_behind_blocked_record(app, handler, logger, 4)
+
+    try:
+        result = logcfg.flush(app, timeout=0.05)
+    finally:
+        handler.unblock.set()
+
+    listener = logcfg.get_queue_listeners(app)[0]
+    listener.stop()
+
+    assert result == {'flushed': 0, 'dropped': 4, 'timed_out': True}
+    assert [record.msg for record in handler.records] == ['blocking']
+    assert listener.queue.empty()
+
+
+def test_logconfig_flush_at_exit():
+    app, logcfg, logger = make_queued_app('flushed',
+                                          ListHandler(),
+                                          LOGCONFIG_QUEUE_FLUSH_TIMEOUT=2500)
+    disabled_app, disabled_logcfg, _ = make_queued_app(
+        'flushed',
+        ListHandler(),
+        LOGCONFIG_QUEUE_FLUSH_AT_EXIT=False)
+
+    try:
+        with mock.patch.object(logcfg, 'flush') as flush, \
+                mock.patch.object(disabled_logcfg, 'flush') as disabled_flush:
+            flask_logconfig._flush_at_exit()
+
+        flush.assert_called_once_with(app, 2.5)
+        assert not disabled_flush.called
+    finally:
+        logcfg.stop_listeners(app)
+        disabled_logcfg.stop_listeners(disabled_app)
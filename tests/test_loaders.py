@@ -0,0 +1,146 @@
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+import mock
+import flask
+
+from flask_logconfig import LogConfig, clear_config_cache, load_config_file
+from flask_logconfig import loaders
+
+
+parametrize = pytest.mark.parametrize
+
+
+YAML_CONFIG = """
+version: 1
+disable_existing_loggers: false
+loggers:
+  cached:
+    level: WARNING
+"""
+
+
+@pytest.fixture(autouse=True)
+def config_cache():
+    clear_config_cache()
+    yield
+    clear_config_cache()
+
+
+def touch(path, offset):
+    mtime = time.time() + offset
+    os.utime(str(path), (mtime, mtime))
+
+
+def test_load_config_file_cache(tmpdir):
+    path = tmpdir.join('logging.json')
+    path.write('{"version": 1}')
+
+    with mock.patch('flask_logconfig.loaders.parse_config_file',
+                    wraps=loaders.parse_config_file) as parse:
+        config = load_config_file(str(path))
+        config['modified'] = True
+
+        assert load_config_file(str(path)) == {'version': 1}
+        assert parse.call_count == 1
+
+        path.write('{"version": 1, "incremental": true}')
+        touch(path, 10)
+
+        assert load_config_file(str(path)) == {'version': 1,
+                                               'incremental': True}
+        assert parse.call_count == 2
+
+
+def test_load_config_file_missing(tmpdir):
+    with pytest.raises(OSError):
+        load_config_file(str(tmpdir.join('missing.json')))
+
+
+def test_load_config_file_compiled(tmpdir):
+    path = tmpdir.join('logging.yml')
+    path.write(YAML_CONFIG)
+    cache_dir = tmpdir.join('cache')
+    expected = {'version': 1,
+                'disable_existing_loggers': False,
+                'loggers': {'cached': {'level': 'WARNING'}}}
+
+    assert load_config_file(str(path), str(cache_dir)) == expected
+    assert len(cache_dir.listdir()) == 1
+
+    clear_config_cache()
+
+    with mock.patch('flask_logconfig.loaders.parse_config_file') as parse:
+        assert load_config_file(str(path), str(cache_dir)) == expected
+        assert not parse.called
+
+    path.write(YAML_CONFIG.replace('WARNING', 'ERROR'))
+    touch(path, 10)
+    clear_config_cache()
+
+    config = load_config_file(str(path), str(cache_dir))
+
+    assert config['loggers']['cached']['level'] == 'ERROR'
+
+
+@parametrize('content', [
+    '{',
+    '[]',
+    '{"version": 1}',
+])
+def test_read_compiled_config_invalid(tmpdir, content):
+    path = str(tmpdir.join('logging.json'))
+    compiled_path = loaders.get_compiled_path(str(tmpdir), path)
+
+    with open(compiled_path, 'w') as fileobj:
+        fileobj.write(content)
+
+    assert loaders.read_compiled_config(str(tmpdir), path, (1, 1)) is None
+
+
+def test_write_compiled_config_unserializable(tmpdir):
+    assert not loaders.write_compiled_config(str(tmpdir),
+                                             str(tmpdir.join('logging.yml')),
+                                             (1, 1),
+                                             {'version': object()})
+    assert tmpdir.listdir() == []
+
+
+def test_logconfig_cache_dir(tmpdir):
+    path = tmpdir.join('logging.yml')
+    path.write(YAML_CONFIG)
+    cache_dir = tmpdir.join('cache')
+
+    app = flask.Flask(__name__)
+    app.config.update(LOGCONFIG=str(path), LOGCONFIG_CACHE_DIR=str(cache_dir))
+    LogConfig().init_app(app)
+
+    assert logging.getLogger('cached').level == logging.WARNING
+    assert len(cache_dir.listdir()) == 1
+
+
+def test_import_defers_logconfig_and_yaml():
+    code = ('import sys, flask_logconfig; '
+            'print(int("yaml" in sys.modules or "logconfig" in sys.modules))')
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=os.path.dirname(os.path.dirname(
+                                         os.path.abspath(__file__))))
+
+    assert output.strip() == b'0'
+
+
+def test_configure_logging_json(tmpdir):
+    path = tmpdir.join('logging.json')
+    path.write(json.dumps({'version': 1,
+                           'disable_existing_loggers': False,
+                           'loggers': {'cached.json': {'level': 'ERROR'}}}))
+
+    loaders.configure_logging(str(path))
+
+    assert logging.getLogger('cached.json').level == logging.ERROR
@@ -0,0 +1,110 @@
+
+import logging
+
+import pytest
+import flask
+import logconfig
+
+from flask_logconfig import (
+    LogConfig,
+    FlaskLogConfigException,
+    QueueOverflow
+)
+from tests.helpers import make_record
+
+
+parametrize = pytest.mark.parametrize
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+@parametrize('policy,level,expected,dropped', [
+    ('drop_newest', logging.WARNING, [0, 1], {'INFO': 1, 'ERROR': 1}),
+    ('drop_oldest', logging.WARNING, [2, 3], {'INFO': 2}),
+    ('drop_below', logging.WARNING, [0, 1], {'INFO': 1}),
+])
+def test_queue_overflow(policy, level, expected, dropped):
+    queue = logconfig.Queue(2)
+    overflow = QueueOverflow(policy, level)
+
+    queued = [overflow.put(queue, make_record(idx)) for idx in range(3)]
+
+    assert queued == [True, True, policy == 'drop_oldest']
+
+    if policy == 'drop_below':
+        # Records at or above the level block until there is room.
+        queue.get_nowait()
+        overflow.put(queue, make_record(3, logging.ERROR))
+        expected = [1, 3]
+    else:
+        overflow.put(queue, make_record(3, logging.ERROR))
+
+    assert [record.msg for record in drain(queue)] == expected
+    assert overflow.dropped == sum(dropped.values())
+    assert overflow.dropped_by_level == dropped
+
+
+def test_queue_overflow_drop_oldest_keeps_sentinel():
+    queue = logconfig.Queue(1)
+    overflow = QueueOverflow('drop_oldest')
+
+    queue.put_nowait(None)
+    assert not overflow.put(queue, make_record(0))
+
+    assert drain(queue) == [None]
+    assert overflow.dropped == 1
+
+
+def test_queue_overflow_exception():
+    with pytest.raises(ValueError):
+        QueueOverflow('unknown')
+
+
+@parametrize('packed', [False, True])
+def test_logconfig_queue_maxsize(packed):
+    class Config:
+        LOGCONFIG_QUEUE = ['bounded']
+        LOGCONFIG_QUEUE_MAXSIZE = 5
+        LOGCONFIG_QUEUE_OVERFLOW = 'drop_newest'
+        LOGCONFIG_QUEUE_PACKED = packed
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app, start_listeners=False)
+
+    logger = logging.getLogger('bounded')
+    handler = logger.handlers[0]
+
+    assert handler.queue.maxsize == 5
+
+    with app.test_request_context():
+        for idx in range(8):
+            logger.warning(idx)
+
+    overflow = logcfg.get_state(app)['overflow']
+
+    assert handler.overflow is overflow
+    assert overflow.dropped == 3
+    assert overflow.dropped_by_level == {'WARNING': 3}
+
+    logcfg.start_listeners(app)
+    logcfg.stop_listeners(app)
+
+
+def test_logconfig_queue_overflow_exception():
+    class Config:
+        LOGCONFIG_QUEUE = ['bounded']
+        LOGCONFIG_QUEUE_MAXSIZE = 5
+        LOGCONFIG_QUEUE_OVERFLOW = 'unknown'
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+
+    with pytest.raises(FlaskLogConfigException):
+        LogConfig().init_app(app, start_listeners=False)
@@ -0,0 +1,183 @@
+
+import logging
+
+import pytest
+import mock
+import flask
+
+from flask_logconfig import FlaskLogConfigException, LogConfig, RateLimitFilter
+from tests.helpers import ListHandler, make_record
+
+
+def make_noisy_record(msg='failed %s', level=logging.ERROR, name='noisy'):
+    return make_record(msg, level, name=name, args=('db',))
+
+
+@pytest.fixture
+def now():
+    now = [100.0]
+
+    with mock.patch('flask_logconfig.ratelimit.clock', lambda: now[0]):
+        yield now
+
+
+def test_rate_limit_filter(now):
+    ratelimit = RateLimitFilter(rate=1, burst=2, summary_interval=None)
+
+    assert [ratelimit.filter(make_noisy_record()) for _ in range(5)] == [
+        True, True, False, False, False]
+    assert ratelimit.filter(make_noisy_record(level=logging.WARNING))
+    assert ratelimit.filter(make_noisy_record(name='other'))
+    assert ratelimit.filter(make_noisy_record(msg='other'))
+
+    now[0] += 1
+    record = make_noisy_record()
+
+    assert ratelimit.filter(record)
+    assert record.suppressed == 3
+    assert record.getMessage() == 'failed db'
+
+    ratelimit.annotate(record, record.suppressed)
+    assert record.getMessage() == 'failed db (3 similar messages suppressed)'
+    assert not ratelimit.filter(make_noisy_record())
+
+    now[0] += 10
+    record = make_noisy_record()
+
+    assert ratelimit.filter(record)
+    assert record.suppressed == 1
+    assert ratelimit.filter(make_noisy_record())
+    assert ratelimit.suppressed == 4
+
+
+def test_rate_limit_filter_summary_interval(now):
+    ratelimit = RateLimitFilter(rate=0, burst=1, summary_interval=60)
+    passed = []
+
+    for _ in range(3):
+        for _ in range(100):
+            record = make_noisy_record()
+
+            if ratelimit.filter(record):
+                passed.append(record.suppressed)
+
+        now[0] += 30
+
+    assert passed == [0, 199]
+
+
+def test_rate_limit_filter_max_keys(now):
+    ratelimit = RateLimitFilter(rate=0, burst=1, max_keys=2)
+
+    for msg in ('foo', 'bar', 'foo', 'baz'):
+        ratelimit.filter(make_noisy_record(msg))
+
+    assert list(ratelimit.buckets) == [('noisy', logging.ERROR, 'foo'),
+                                       ('noisy', logging.ERROR, 'baz')]
+    assert ratelimit.filter(make_noisy_record('bar'))
+
+    with pytest.raises(ValueError):
+        RateLimitFilter(max_keys=0)
+
+
+def test_rate_limit_filter_keeps_message(now):
+    limited, other, parent = ListHandler(), ListHandler(), ListHandler()
+    limited.addFilter(RateLimitFilter(rate=0, burst=1, summary_interval=60))
+    logging.getLogger('filtered').handlers = [parent]
+    logger = logging.getLogger('filtered.child')
+    logger.handlers = [limited, other]
+    logger.setLevel(logging.DEBUG)
+
+    try:
+        for _ in range(3):
+            logger.error('failed')
+
+        now[0] += 60
+        logger.error('failed')
+    finally:
+        logger.handlers = []
+        logging.getLogger('filtered').handlers = []
+
+    assert [record.suppressed for record in limited.records] == [0, 2]
+
+    for handler in (limited, other, parent):
+        assert set(record.getMessage() for record in handler.records) == \
+            set(['failed'])
+
+
+def test_logconfig_ratelimit():
+    handler = ListHandler()
+    logger = logging.getLogger('ratelimited')
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+
+    app = flask.Flask(__name__)
+    app.config.update(LOGCONFIG_QUEUE=['ratelimited'],
+                      LOGCONFIG_QUEUE_STATS=True,
+                      LOGCONFIG_RATELIMIT={'rate': 0, 'burst': 2})
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    for _ in range(10):
+        logger.error('failed')
+
+    logcfg.stop_listeners(app)
+    stats = logcfg.get_stats(app)
+
+    assert len(handler.records) == 2
+    assert stats['enqueued'] == 2
+    assert stats['ratelimit'] == {'suppressed': 8, 'keys': 1}
+
+
+def test_logconfig_ratelimit_nested_loggers(now):
+    root = logging.getLogger()
+    original_handlers = root.handlers
+    handlers = {'': ListHandler(), 'ratelimited.nested': ListHandler()}
+    unqueued = ListHandler()
+    logging.getLogger('ratelimited').handlers = [unqueued]
+
+    for name, handler in handlers.items():
+        logger = logging.getLogger(name)
+        logger.handlers = [handler]
+        logger.setLevel(logging.DEBUG)
+
+    app = flask.Flask(__name__)
+    app.config.update(LOGCONFIG_QUEUE=list(handlers),
+                      LOGCONFIG_RATELIMIT={'rate': 0,
+                                           'burst': 3,
+                                           'summary_interval': 60})
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    try:
+        logger = logging.getLogger('ratelimited.nested')
+
+        for _ in range(5):
+            logger.error('failed')
+
+        now[0] += 60
+        logger.error('failed')
+        logcfg.stop_listeners(app)
+    finally:
+        root.handlers = original_handlers
+        logging.getLogger('ratelimited').handlers = []
+
+    for handler in handlers.values():
+        assert [record.getMessage() for record in handler.records] == (
+            ['failed'] * 3 + ['failed (2 similar messages suppressed)'])
+        assert handler.records[-1].suppressed == 2
+
+    assert [record.getMessage() for record in unqueued.records] == (
+        ['failed'] * 6)
+    assert not any(hasattr(record, 'suppressed')
+                   for record in unqueued.records)
+    assert logcfg.get_state(app)['ratelimit'].suppressed == 4
+
+
+def test_logconfig_ratelimit_invalid():
+    app = flask.Flask(__name__)
+    app.config.update(LOGCONFIG_QUEUE=['ratelimited.invalid'],
+                      LOGCONFIG_RATELIMIT={'nope': 1})
+
+    with pytest.raises(FlaskLogConfigException):
+        LogConfig().init_app(app)
@@ -0,0 +1,175 @@
+
+import logging
+import sys
+
+import flask
+
+from flask_logconfig import (
+    FlaskQueueHandler,
+    LogConfig,
+    PackedRecord,
+    RecordCodec,
+)
+
+
+def make_packed_record(**attrs):
+    logger = logging.getLogger('packed')
+    record = logger.makeRecord('packed',
+                               logging.WARNING,
+                               'app.py',
+                               10,
+                               'foo %s',
+                               ('bar',),
+                               None,
+                               func='view')
+    record.__dict__.update(attrs)
+    return record
+
+
+def test_record_codec_round_trip():
+    codec = RecordCodec()
+    record = make_packed_record(queue_route='packed')
+
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record.exc_info = sys.exc_info()
+
+    decoded = codec.decode(codec.encode(record))
+
+    for attr in ('name', 'levelno', 'levelname', 'pathname', 'filename',
+                 'module', 'lineno', 'funcName', 'created', 'msecs',
+                 'thread', 'threadName', 'process', 'processName',
+                 'queue_route', 'exc_text'):
+        assert getattr(decoded, attr) == getattr(record, attr), attr
+
+    assert decoded.getMessage() == 'foo bar'
+    assert decoded.args is None
+    assert decoded.exc_info is None
+    assert 'ZeroDivisionError' in decoded.exc_text
+
+
+def test_record_codec_empty_message():
+    codec = RecordCodec()
+    record = make_packed_record(msg='', args=())
+
+    decoded = codec.decode(codec.encode(record))
+
+    assert decoded.getMessage() == ''
+    assert decoded.exc_text is None
+    assert not hasattr(decoded, 'queue_route')
+
+
+def test_record_codec_interns_strings():
+    codec = RecordCodec()
+    first = codec.encode(make_packed_record())
+    strings = len(codec.strings)
+    second = codec.encode(make_packed_record())
+
+    assert len(codec.strings) == strings
+    assert len(first) == len(second)
+    assert len(second) < 100
+
+
+def test_record_codec_strings_sync():
+    encoder = RecordCodec()
+    decoder = RecordCodec()
+
+    data = encoder.encode(make_packed_record())
+    decoder.load_strings(encoder.dump_strings())
+
+    assert decoder.strings == encoder.strings
+    assert decoder.decode(data).getMessage() == 'foo bar'
+
+    sent = len(encoder.strings)
+    data = encoder.encode(make_packed_record(funcName='other'))
+    decoder.load_strings(encoder.dump_strings(sent))
+
+    assert decoder.decode(data).funcName == 'other'
+
+    decoder.load_strings(encoder.dump_strings(sent), sent)
+
+    assert decoder.strings == encoder.strings
+    assert decoder.decode(data).funcName == 'other'
+
+
+def test_record_codec_inline_strings():
+    codec = RecordCodec(max_strings=3)
+    record = make_packed_record()
+
+    decoded = codec.decode(codec.encode(record))
+
+    assert len(codec.strings) == 4
+    assert decoded.name == record.name
+    assert decoded.processName == record.processName
+
+
+def test_record_codec_pack():
+    codec = RecordCodec()
+    context = object()
+    packed = codec.pack(make_packed_record(queue_route='packed',
+                                           request_context=context))
+
+    assert isinstance(packed, PackedRecord)
+    assert packed.levelno == logging.WARNING
+    assert packed.extra == {'request_context': context}
+
+    record = packed.unpack()
+
+    assert record.request_context is context
+    assert record.queue_route == 'packed'
+    assert codec.pack(make_packed_record()).extra is None
+
+
+def test_flask_queue_handler_codec():
+    app = flask.Flask(__name__)
+    codec = RecordCodec()
+    queue = []
+
+    class ListQueue(object):
+        def put_nowait(self, item):
+            queue.append(item)
+
+    handler = FlaskQueueHandler(ListQueue(), codec=codec)
+
+    with app.test_request_context('/foo'):
+        handler.handle(make_packed_record())
+
+    assert isinstance(queue[0], PackedRecord)
+    assert 'request_context' in queue[0].extra
+
+
+def test_logconfig_queue_packed():
+    class Config:
+        LOGCONFIG = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {
+                'url': {'class': 'tests.helpers.UrlListHandler'}
+            },
+            'loggers': {
+                'packed': {'handlers': ['url'], 'level': 'DEBUG'}
+            }
+        }
+        LOGCONFIG_QUEUE = ['packed']
+        LOGCONFIG_QUEUE_PACKED = True
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    @app.route('/foo')
+    def foo():
+        logging.getLogger('packed').info('foo %s', 'bar')
+        return ''
+
+    app.test_client().get('/foo')
+    logcfg.stop_listeners(app)
+
+    handler = logcfg.get_listeners(app)['packed'].handlers[0]
+    record = handler.records[0]
+
+    assert isinstance(logcfg.get_state(app)['codec'], RecordCodec)
+    assert record.getMessage() == 'foo bar'
+    assert record.url == 'http://localhost/foo'
@@ -0,0 +1,179 @@
+
+import gc
+import logging
+import threading
+import weakref
+
+import pytest
+import mock
+import flask
+
+import flask_logconfig
+from flask_logconfig import FlaskLogConfigException, LogConfig
+from flask_logconfig.registry import make_fingerprint
+from tests.helpers import SharedListHandler, make_app, make_config, wait_for
+
+
+def make_shared_app(name, logcfg=None, **config):
+    return make_app(logcfg,
+                    LOGCONFIG=make_config(name),
+                    LOGCONFIG_QUEUE=[name],
+                    LOGCONFIG_SHARED=True,
+                    **config)
+
+
+def test_shared_logging():
+    name = 'shared.same'
+
+    with mock.patch('flask_logconfig.configure_logging',
+                    wraps=flask_logconfig.configure_logging) as configure:
+        first, logcfg = make_shared_app(name)
+        threads = threading.active_count()
+        apps = [make_shared_app(name, logcfg)[0] for _ in range(20)]
+
+    assert threading.active_count() == threads
+
+    other, _ = make_shared_app(name, LOGCONFIG_QUEUE_STATS=True)
+    shared = logcfg.get_state(first)['shared']
+
+    try:
+        assert configure.call_count == 1
+        assert shared.refcount == 21
+        assert all(logcfg.get_listeners(app) is logcfg.get_listeners(first)
+                   for app in apps)
+        assert logcfg.get_state(other)['shared'] is not shared
+
+        logging.getLogger(name).info('foo')
+        logcfg.flush(first)
+
+        assert len(SharedListHandler.records) == 1
+    finally:
+        for app in [first, other] + apps:
+            logcfg.release(app)
+
+
+def test_shared_logging_release():
+    name = 'shared.released'
+    logger = logging.getLogger(name)
+    first, logcfg = make_shared_app(name)
+    second, _ = make_shared_app(name, logcfg)
+    shared = logcfg.get_state(first)['shared']
+    listener = logcfg.get_listeners(first)[name].listener
+
+    assert not logcfg.release(second)
+    assert shared.refcount == 1
+    assert logcfg.get_listeners(second) == {}
+    assert listener.is_running
+
+    assert logcfg.release(first)
+    assert not listener.is_running
+    assert [type(handler)
+            for handler in logger.handlers] == [SharedListHandler]
+    assert flask_logconfig._shared_logging.get(shared.fingerprint) is None
+
+    third, _ = make_shared_app(name, logcfg)
+
+    assert logcfg.get_state(third)['shared'] is not shared
+    assert logcfg.release(third)
+
+
+def test_shared_logging_app_logger():
+    # The application logger is named after the application's import name
+    # which is the module of make_app.
+    name = make_app.__module__
+    logger = logging.getLogger(name)
+    first, logcfg = make_shared_app(name)
+    second, _ = make_shared_app(name, logcfg)
+    handler = logcfg.get_state(first)['queue_handlers'][name]
+
+    try:
+        assert first.logger is logger
+        assert second.logger is logger
+        assert logger.handlers == [handler]
+
+        second.logger.info('foo')
+        logcfg.flush(first)
+
+        assert [record.msg
+                for record in SharedListHandler.records] == ['foo']
+    finally:
+        logcfg.release(second)
+        logcfg.release(first)
+
+
+def test_shared_logging_garbage_collected():
+    name = 'shared.collected'
+    logger = logging.getLogger(name)
+    apps = []
+
+    for _ in range(3):
+        app = flask.Flask(__name__)
+        app.config.update(LOGCONFIG=make_config(name),
+                          LOGCONFIG_QUEUE=[name],
+                          LOGCONFIG_SHARED=True)
+        LogConfig(app)
+        apps.append(app)
+
+    refs = [weakref.ref(app) for app in apps]
+    state = apps[0].extensions['logconfig']
+    shared = state['shared']
+    listener = state['listeners'][name].listener
+
+    assert shared.refcount == 3
+    assert listener.is_running
+
+    del app, apps[:], state
+    gc.collect()
+
+    alive = [ref() for ref in refs if ref() is not None]
+
+    if hasattr(flask.Flask, 'logger_name'):
+        # Flask < 1.0 keeps the first application that accessed the logger
+        # named after it alive through that logger so it has to be released.
+        assert alive == [refs[0]()]
+        assert shared.refcount == 1
+        assert listener.is_running
+
+        LogConfig().release(alive.pop())
+    else:  # pragma: no cover
+        assert alive == []
+
+    assert wait_for(lambda: not listener.is_running)
+    assert wait_for(lambda: [type(handler) for handler in logger.handlers]
+                    == [SharedListHandler])
+
+
+def test_shared_logging_reload():
+    app, logcfg = make_shared_app('shared.reloaded')
+
+    try:
+        with pytest.raises(FlaskLogConfigException):
+            logcfg.reload(app)
+    finally:
+        logcfg.release(app)
+
+    with pytest.raises(FlaskLogConfigException):
+        make_shared_app('shared.reloaded', LOGCONFIG_RELOAD_INTERVAL=1)
+
+
+def test_release_unshared():
+    name = 'unshared.released'
+    logger = logging.getLogger(name)
+    app, logcfg = make_app(LOGCONFIG=make_config(name),
+                           LOGCONFIG_QUEUE=[name])
+    listener = logcfg.get_listeners(app)[name].listener
+
+    assert logcfg.release(app)
+    assert not listener.is_running
+    assert [type(handler)
+            for handler in logger.handlers] == [SharedListHandler]
+
+
+def test_make_fingerprint():
+    assert make_fingerprint({'a': 1, 'b': [1]}) == make_fingerprint(
+        {'b': [1], 'a': 1})
+    assert make_fingerprint(SharedListHandler) == make_fingerprint(
+        SharedListHandler)
+    assert make_fingerprint(SharedListHandler) != make_fingerprint(LogConfig)
+    assert make_fingerprint({1: 'a', 'b': 2}) == make_fingerprint(
+        {1: 'a', 'b': 2})
@@ -0,0 +1,226 @@
+
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+import pytest
+import logconfig
+
+from flask_logconfig import (
+    ConfigWatcher,
+    FlaskLogConfigException,
+    RoutingQueueListener,
+)
+from flask_logconfig import handle_queued_records
+from flask_logconfig.reload import get_signal
+from tests.helpers import SharedListHandler, make_app, make_config, wait_for
+
+
+def test_reload_levels():
+    app, logcfg = make_app(LOGCONFIG=make_config('reloaded.levels'))
+    logger = logging.getLogger('reloaded.levels')
+
+    assert logger.level == logging.INFO
+
+    logcfg.reload(app, make_config('reloaded.levels', 'DEBUG'))
+
+    assert logger.level == logging.DEBUG
+    assert app.config['LOGCONFIG']['loggers']['reloaded.levels']['level'] \
+        == 'DEBUG'
+
+    logger.debug('foo')
+
+    assert [record.getMessage()
+            for record in SharedListHandler.records] == ['foo']
+
+
+def test_reload_queue_keeps_records():
+    name = 'reloaded.queue'
+    app, logcfg = make_app(LOGCONFIG=make_config(name),
+                           LOGCONFIG_QUEUE=[name],
+                           LOGCONFIG_QUEUE_SNAPSHOT=True)
+    logger = logging.getLogger(name)
+    listener = logcfg.get_listeners(app)[name].listener
+    count = 1000
+
+    def log():
+        for index in range(count):
+            logger.info(index)
+
+    thread = threading.Thread(target=log)
+    thread.start()
+
+    for _ in range(3):
+        logcfg.reload(app)
+
+    thread.join()
+
+    new_listener = logcfg.get_listeners(app)[name].listener
+    handler = logcfg.get_state(app)['queue_handlers'][name]
+
+    assert new_listener is not listener
+    assert not listener.is_running
+    assert new_listener.is_running
+    assert logger.handlers == [handler]
+    assert handler.queue is new_listener.queue
+
+    logcfg.stop_listeners(app)
+
+    assert (sorted(int(record.getMessage())
+                   for record in SharedListHandler.records) ==
+            list(range(count)))
+
+
+def test_reload_removes_queue():
+    name = 'reloaded.unqueued'
+    app, logcfg = make_app(LOGCONFIG=make_config(name),
+                           LOGCONFIG_QUEUE=[name])
+    logger = logging.getLogger(name)
+
+    app.config['LOGCONFIG_QUEUE'] = []
+    logcfg.reload(app)
+
+    assert logcfg.get_listeners(app) == {}
+    assert logcfg.get_state(app)['queue'] is None
+    assert [type(handler)
+            for handler in logger.handlers] == [SharedListHandler]
+
+    logger.info('foo')
+
+    assert len(SharedListHandler.records) == 1
+
+
+def test_reload_invalid_file(tmpdir):
+    name = 'reloaded.invalid'
+    path = tmpdir.join('logging.json')
+    path.write(json.dumps(make_config(name)))
+    app, logcfg = make_app(LOGCONFIG=str(path), LOGCONFIG_QUEUE=[name])
+    logger = logging.getLogger(name)
+    handlers = list(logger.handlers)
+
+    path.write('{')
+
+    with pytest.raises(FlaskLogConfigException):
+        logcfg.reload(app)
+
+    assert logger.handlers == handlers
+    assert logcfg.get_listeners(app)[name].listener.is_running
+
+    logcfg.stop_listeners(app)
+
+
+def test_reload_buffer_requires_init():
+    app, logcfg = make_app()
+    app.config['LOGCONFIG_BUFFER'] = ['reloaded.buffer']
+
+    with pytest.raises(FlaskLogConfigException):
+        logcfg.reload(app)
+
+
+def test_reload_or_log(caplog):
+    app, logcfg = make_app()
+    app.config['LOGCONFIG_BUFFER'] = ['reloaded.buffer']
+
+    logcfg.reload_or_log(app)
+
+    assert 'Failed to reload' in caplog.text
+
+
+def test_handle_queued_records():
+    queue = logconfig.Queue(-1)
+    listener = RoutingQueueListener(queue)
+    foo = listener.route('foo')
+    bar = listener.route('bar')
+    foo.handlers = [SharedListHandler()]
+    bar.handlers = []
+    SharedListHandler.records = []
+
+    queue.put_nowait(logging.makeLogRecord({'name': 'foo.child',
+                                            'levelno': logging.INFO}))
+    queue.put_nowait(logging.makeLogRecord({'name': 'bar',
+                                            'levelno': logging.INFO}))
+    queue.put_nowait(listener._sentinel)
+
+    assert handle_queued_records(queue, {'foo': foo, 'bar': bar}) == 2
+    assert queue.empty()
+    assert [record.name
+            for record in SharedListHandler.records] == ['foo.child']
+
+
+def test_config_watcher(tmpdir):
+    path = tmpdir.join('logging.json')
+    path.write('{}')
+    calls = []
+    watcher = ConfigWatcher(str(path), lambda: calls.append(1), 0.01)
+
+    assert not watcher.check()
+
+    path.write('{"version": 1}')
+
+    assert watcher.check()
+    assert not watcher.check()
+
+    path.remove()
+
+    assert not watcher.check()
+    assert calls == [1]
+
+
+def test_reload_interval(tmpdir):
+    name = 'reloaded.watched'
+    path = tmpdir.join('logging.json')
+    path.write(json.dumps(make_config(name)))
+    app, logcfg = make_app(LOGCONFIG=str(path), LOGCONFIG_RELOAD_INTERVAL=10)
+    logger = logging.getLogger(name)
+    watcher = logcfg.get_state(app)['watcher']
+
+    try:
+        assert watcher.is_running
+        assert logger.level == logging.INFO
+
+        path.write(json.dumps(make_config(name, 'DEBUG')))
+        mtime = time.time() + 10
+        os.utime(str(path), (mtime, mtime))
+
+        assert wait_for(lambda: logger.level == logging.DEBUG)
+    finally:
+        watcher.stop()
+
+    assert not watcher.is_running
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'),
+                    reason='requires SIGUSR1')
+def test_reload_signal():
+    name = 'reloaded.signaled'
+    app, logcfg = make_app(LOGCONFIG=make_config(name),
+                           LOGCONFIG_RELOAD_SIGNAL='SIGUSR1')
+    logger = logging.getLogger(name)
+    signum, previous = logcfg.get_state(app)['reload_signal']
+
+    try:
+        assert signum == signal.SIGUSR1
+
+        app.config['LOGCONFIG'] = make_config(name, 'DEBUG')
+        os.kill(os.getpid(), signal.SIGUSR1)
+
+        assert wait_for(lambda: logger.level == logging.DEBUG)
+    finally:
+        signal.signal(signum, previous)
+
+
+def test_get_signal():
+    assert get_signal(1) == 1
+    assert get_signal('SIGTERM') == signal.SIGTERM
+    assert get_signal('term') == signal.SIGTERM
+
+    with pytest.raises(ValueError):
+        get_signal('nope')
+
+
+def test_reload_unknown_signal():
+    with pytest.raises(FlaskLogConfigException):
+        make_app(LOGCONFIG_RELOAD_SIGNAL='nope')
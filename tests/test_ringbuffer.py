@@ -0,0 +1,176 @@
+
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+import mock
+import flask
+
+from flask_logconfig import LogConfig, RingBufferHandler, read_ring_buffer
+from flask_logconfig import ringbuffer
+from tests.helpers import make_record
+
+
+def messages(path):
+    return [entry.message for entry in read_ring_buffer(str(path))]
+
+
+def test_ring_buffer_handler(tmpdir):
+    path = tmpdir.join('recent.ring')
+    handler = RingBufferHandler(str(path), capacity=3, record_size=40)
+
+    for index in range(5):
+        handler.handle(make_record('message {0}'.format(index)))
+
+    handler.handle(make_record('x' * 100, logging.ERROR))
+    handler.close()
+
+    entries = read_ring_buffer(str(path))
+
+    assert path.size() == ringbuffer.HEADER_SIZE + 3 * 40
+    assert [entry.seq for entry in entries] == [4, 5, 6]
+    assert [entry.message for entry in entries] == [
+        'message 3', 'message 4', 'x' * (40 - ringbuffer.SLOT.size)]
+    assert entries[-1].levelno == logging.ERROR
+
+
+def test_ring_buffer_handler_reopen(tmpdir):
+    path = tmpdir.join('recent.ring')
+    handler = RingBufferHandler(str(path), capacity=3)
+    handler.handle(make_record('foo'))
+    handler.close()
+
+    handler = RingBufferHandler(str(path), capacity=3)
+    handler.handle(make_record('bar'))
+    handler.close()
+
+    assert messages(path) == ['foo', 'bar']
+
+    handler = RingBufferHandler(str(path), capacity=4)
+    handler.handle(make_record('baz'))
+    handler.close()
+
+    assert messages(path) == ['baz']
+
+
+def test_ring_buffer_handler_pid(tmpdir):
+    filename = str(tmpdir.join('recent-{pid}.ring'))
+    handler = RingBufferHandler(filename, capacity=3)
+    handler.handle(make_record('parent'))
+
+    with mock.patch('os.getpid', return_value=1):
+        handler.handle(make_record('child'))
+
+    handler.close()
+
+    assert messages(filename.format(pid=os.getpid())) == ['parent']
+    assert messages(filename.format(pid=1)) == ['child']
+
+
+def test_ring_buffer_handler_invalid_options(tmpdir):
+    with pytest.raises(ValueError):
+        RingBufferHandler(str(tmpdir.join('recent.ring')), capacity=0)
+
+    with pytest.raises(ValueError):
+        RingBufferHandler(str(tmpdir.join('recent.ring')),
+                          record_size=ringbuffer.SLOT.size)
+
+
+def test_read_ring_buffer_torn_slot(tmpdir):
+    path = tmpdir.join('recent.ring')
+    handler = RingBufferHandler(str(path), capacity=3)
+    handler.handle(make_record('foo'))
+    handler.handle(make_record('bar'))
+    handler.close()
+
+    with open(str(path), 'r+b') as fileobj:
+        fileobj.seek(ringbuffer.HEADER_SIZE + ringbuffer.SLOT.size)
+        fileobj.write(b'b')
+
+    assert messages(path) == ['bar']
+
+
+def test_read_ring_buffer_invalid(tmpdir):
+    path = tmpdir.join('recent.ring')
+    path.write('foo' * 100)
+
+    with pytest.raises(ValueError):
+        read_ring_buffer(str(path))
+
+
+def test_read_ring_buffer_crashed_process(tmpdir):
+    path = str(tmpdir.join('recent.ring'))
+    code = ('import logging, os, sys; '
+            'from flask_logconfig import RingBufferHandler; '
+            'handler = RingBufferHandler(sys.argv[1], capacity=10); '
+            'logger = logging.getLogger("crashed"); '
+            'logger.addHandler(handler); '
+            'logger.error("last words"); '
+            'os._exit(1)')
+    subprocess.call([sys.executable, '-c', code, path],
+                    cwd=os.path.dirname(os.path.dirname(
+                        os.path.abspath(__file__))))
+
+    assert messages(path) == ['last words']
+
+
+def test_ring_buffer_main(tmpdir, capsys):
+    path = tmpdir.join('recent.ring')
+    handler = RingBufferHandler(str(path), capacity=3)
+    handler.handle(make_record('foo'))
+    handler.handle(make_record('bar', logging.WARNING))
+    handler.close()
+
+    ringbuffer.main([str(path)])
+    lines = capsys.readouterr()[0].splitlines()
+
+    assert [line.split(' ', 2)[2] for line in lines] == ['INFO foo',
+                                                         'WARNING bar']
+
+    ringbuffer.main(['--raw', '--last', '1', str(path)])
+
+    assert capsys.readouterr()[0] == 'bar\n'
+
+    ringbuffer.main(['--json', str(path)])
+    entries = [json.loads(line)
+               for line in capsys.readouterr()[0].splitlines()]
+
+    assert [(entry['seq'], entry['message']) for entry in entries] == [
+        (1, 'foo'), (2, 'bar')]
+
+    with pytest.raises(SystemExit):
+        ringbuffer.main([str(tmpdir.join('missing.ring'))])
+
+
+def test_logconfig_ring_buffer(tmpdir):
+    path = tmpdir.join('recent.ring')
+    app = flask.Flask(__name__)
+    app.config.update(
+        LOGCONFIG={
+            'version': 1,
+            'disable_existing_loggers': False,
+            'formatters': {'name': {'format': '%(name)s %(message)s'}},
+            'handlers': {'recent': {
+                'class': 'flask_logconfig.RingBufferHandler',
+                'formatter': 'name',
+                'filename': str(path),
+                'capacity': 100
+            }},
+            'loggers': {'ring.queued': {'handlers': ['recent'],
+                                        'level': 'INFO'}}
+        },
+        LOGCONFIG_QUEUE=['ring.queued'],
+        LOGCONFIG_QUEUE_BATCH_SIZE=10)
+    logcfg = LogConfig(app)
+    logger = logging.getLogger('ring.queued')
+
+    for index in range(20):
+        logger.info(index)
+
+    logcfg.stop_listeners(app)
+
+    assert messages(path) == ['ring.queued {0}'.format(index)
+                              for index in range(20)]
@@ -0,0 +1,123 @@
+
+import logging
+
+import pytest
+import mock
+import flask
+
+from flask_logconfig import LogConfig, RequestSampler
+
+
+parametrize = pytest.mark.parametrize
+
+
+@parametrize('rates,endpoint,path,expected', [
+    ({}, 'index', '/', (None, 0.5)),
+    ({'index': 0}, 'index', '/', ('index', 0)),
+    ({'/static': 0.1}, 'static', '/static/app.js', ('/static', 0.1)),
+    ({'/static': 0.1, '/static/img': 0.01},
+     None,
+     '/static/img/logo.png',
+     ('/static/img', 0.01)),
+    ({'static': 0.2, '/static': 0.1},
+     'static',
+     '/static/app.js',
+     ('static', 0.2)),
+])
+def test_request_sampler_get_rate(rates, endpoint, path, expected):
+    sampler = RequestSampler(rate=0.5, rates=rates)
+    assert sampler.get_rate(endpoint, path) == expected
+
+
+@parametrize('status_code,execution_time,expected', [
+    (200, 10, False),
+    (404, 10, False),
+    (500, 10, True),
+    (200, 100, True),
+    (200, None, False),
+])
+def test_request_sampler_keep(status_code, execution_time, expected):
+    sampler = RequestSampler(rate=0, keep_slower_than=100)
+
+    result = sampler.sample('index', '/', status_code,
+                            lambda: execution_time)
+
+    assert result is expected
+    assert sampler.total_sampled_out == int(not expected)
+
+
+def test_request_sampler_rate():
+    sampler = RequestSampler(rate=0.25, rates={'health': 0})
+
+    with mock.patch('random.random', side_effect=[0.1, 0.3, 0.2, 0.9]):
+        results = [sampler.sample('index', '/', 200, lambda: None)
+                   for _ in range(4)]
+
+    for _ in range(3):
+        sampler.sample('health', '/health', 200, lambda: None)
+
+    assert results == [True, False, True, False]
+    assert sampler.sampled_out == {None: 2, 'health': 3}
+    assert sampler.total_sampled_out == 5
+
+
+def test_logconfig_requests_sampling():
+    class Config:
+        LOGCONFIG_REQUESTS_ENABLED = True
+        LOGCONFIG_REQUESTS_LOGGER = 'sampled'
+        LOGCONFIG_REQUESTS_SAMPLE_RATES = {'health': 0}
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    @app.route('/health')
+    def health():
+        return ''
+
+    @app.route('/')
+    def index():
+        return ''
+
+    logger = logging.getLogger('sampled')
+    logger.setLevel(logging.DEBUG)
+
+    with mock.patch.object(logger, 'log') as log, \
+            mock.patch.object(logcfg, 'get_request_message_data') as data:
+        client = app.test_client()
+        client.get('/health')
+        client.get('/health')
+        client.get('/')
+
+        assert log.call_count == 1
+        assert data.call_count == 1
+
+    sampler = logcfg.get_state(app)['requests']['sampler']
+    assert sampler.sampled_out == {'health': 2}
+
+
+def test_logconfig_requests_sampling_policies():
+    class Config:
+        LOGCONFIG_REQUESTS_ENABLED = True
+        LOGCONFIG_REQUESTS_LOGGER = 'sampled'
+        LOGCONFIG_REQUESTS_SAMPLE_RATES = {'health': 0}
+        LOGCONFIG_REQUESTS_POLICIES = {'static': {'sample_rate': 0}}
+
+    app = flask.Flask(__name__)
+    app.config.from_object(Config)
+    logcfg = LogConfig()
+    logcfg.init_app(app)
+
+    @app.route('/health')
+    def health():
+        return ''
+
+    logging.getLogger('sampled').setLevel(logging.DEBUG)
+
+    client = app.test_client()
+    client.get('/health')
+    client.get('/static/app.js')
+    client.get('/static/app.js')
+
+    assert logcfg.get_stats(app)['sampled_out'] == {'health': 1, None: 2}
@@ -0,0 +1,193 @@
+
+import json
+import logging
+
+from flask_logconfig import (
+    Histogram,
+    QueueStats,
+    format_prometheus,
+)
+from tests.helpers import make_app
+
+
+class NamedHandler(logging.Handler):
+    def __init__(self, name):
+        logging.Handler.__init__(self)
+        self.set_name(name)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def emit_batch(self, records):
+        self.records.extend(records)
+
+
+def test_histogram():
+    histogram = Histogram((1, 10))
+
+    histogram.observe(0.5)
+    histogram.observe(1)
+    histogram.observe(5, count=2)
+    histogram.observe(50)
+
+    assert histogram.as_dict() == {
+        'count': 5,
+        'sum': 61.5,
+        'buckets': [(1, 2), (10, 4), ('+Inf', 5)]
+    }
+
+
+def test_queue_stats():
+    stats = QueueStats(buckets=(1, 10))
+    record = logging.makeLogRecord({'created': 100.0})
+
+    stats.enqueued()
+    stats.dequeued(record, now=100.005)
+    stats.emitted(NamedHandler('file'), 3)
+    stats.emitted(logging.NullHandler(), 20, count=2)
+
+    data = stats.as_dict()
+
+    assert data['enqueued'] == 1
+    assert data['dequeued'] == 1
+    assert data['lag']['buckets'] == [(1, 0), (10, 1), ('+Inf', 1)]
+    assert data['emit']['file']['count'] == 1
+    assert data['emit']['NullHandler']['buckets'] == [(1, 0),
+                                                      (10, 2),
+                                                      ('+Inf', 2)]
+
+
+def test_format_prometheus():
+    stats = QueueStats(buckets=(1,))
+    stats.enqueued()
+    stats.emitted(NamedHandler('my"file'), 0.5)
+    data = {
+        'queue': {'size': 2, 'maxsize': 0},
+        'listeners': {'count': 1, 'running': True, 'threads': 1},
+        'overflow': {'dropped': 3, 'by_level': {'INFO': 3}},
+        'sampled_out': {None: 1, 'health': 2},
+        'ratelimit': {'suppressed': 4, 'keys': 1}
+    }
+    data.update(stats.as_dict())
+
+    text = format_prometheus(data)
+
+    assert text.endswith('\n')
+    for line in ('# TYPE flask_logconfig_queue_size gauge',
+                 'flask_logconfig_queue_size 2',
+                 'flask_logconfig_listener_running 1',
+                 'flask_logconfig_records_enqueued_total 1',
+                 '# TYPE flask_logconfig_listener_lag_milliseconds histogram',
+                 'flask_logconfig_listener_lag_milliseconds_count 0',
+                 'flask_logconfig_handler_emit_milliseconds_bucket'
+                 '{handler="my\\"file",le="1"} 1',
+                 'flask_logconfig_handler_emit_milliseconds_bucket'
+                 '{handler="my\\"file",le="+Inf"} 1',
+                 'flask_logconfig_handler_emit_milliseconds_sum'
+                 '{handler="my\\"file"} 0.5',
+                 'flask_logconfig_records_dropped_total{level="INFO"} 3',
+                 'flask_logconfig_requests_sampled_out_total{key=""} 1',
+                 'flask_logconfig_requests_sampled_out_total'
+                 '{key="health"} 2',
+                 'flask_logconfig_records_suppressed_total 4',
+                 'flask_logconfig_ratelimit_keys 1'):
+        assert line in text.splitlines(), line
+
+
+def test_logconfig_get_stats_empty():
+    app, logcfg = make_app()
+
+    assert logcfg.get_stats(app) == {}
+
+
+def test_logconfig_get_stats():
+    logger = logging.getLogger('stats')
+    logger.handlers = [NamedHandler('named')]
+    logger.setLevel(logging.DEBUG)
+
+    app, logcfg = make_app(LOGCONFIG_QUEUE=['stats'],
+                           LOGCONFIG_QUEUE_STATS=True,
+                           LOGCONFIG_QUEUE_MAXSIZE=10,
+                           LOGCONFIG_QUEUE_OVERFLOW='drop_newest',
+                           LOGCONFIG_REQUESTS_SAMPLE_RATE=0.5)
+
+    with app.test_request_context('/'):
+        logger.info('foo')
+        logger.info('bar')
+
+    logcfg.stop_listeners(app)
+    stats = logcfg.get_stats(app)
+
+    assert stats['queue'] == {'size': 0, 'maxsize': 10}
+    assert stats['listeners'] == {'count': 1, 'running': False, 'threads': 1}
+    assert stats['enqueued'] == 2
+    assert stats['dequeued'] == 2
+    assert stats['lag']['count'] == 2
+    assert stats['emit']['named']['count'] == 2
+    assert stats['overflow'] == {'dropped': 0, 'by_level': {}}
+    assert stats['sampled_out'] == {}
+
+
+def test_logconfig_get_stats_overflow():
+    logger = logging.getLogger('stats')
+    logger.handlers = [NamedHandler('named')]
+    logger.setLevel(logging.DEBUG)
+
+    app, logcfg = make_app(LOGCONFIG_QUEUE=['stats'],
+                           LOGCONFIG_QUEUE_STATS=True,
+                           LOGCONFIG_QUEUE_MAXSIZE=2,
+                           LOGCONFIG_QUEUE_OVERFLOW='drop_newest')
+    # Nothing consumes the queue once the listener is stopped.
+    logcfg.stop_listeners(app)
+
+    for idx in range(5):
+        logger.info(idx)
+
+    stats = logcfg.get_stats(app)
+
+    assert stats['enqueued'] == 2
+    assert stats['overflow'] == {'dropped': 3, 'by_level': {'INFO': 3}}
+
+
+def test_logconfig_get_stats_batch():
+    logger = logging.getLogger('stats')
+    logger.handlers = [NamedHandler('named')]
+    logger.setLevel(logging.DEBUG)
+
+    app, logcfg = make_app(LOGCONFIG_QUEUE=['stats'],
+                           LOGCONFIG_QUEUE_STATS=True,
+                           LOGCONFIG_QUEUE_BATCH_SIZE=10)
+
+    with app.test_request_context('/'):
+        logger.info('foo')
+        logger.info('bar')
+
+    logcfg.stop_listeners(app)
+    stats = logcfg.get_stats(app)
+
+    assert stats['dequeued'] == 2
+    assert stats['emit']['named']['count'] == 2
+
+
+def test_logconfig_stats_blueprint():
+    app, logcfg = make_app(LOGCONFIG_QUEUE=['stats'],
+                           LOGCONFIG_QUEUE_STATS=True)
+    app.register_blueprint(logcfg.make_stats_blueprint())
+    client = app.test_client()
+
+    try:
+        response = client.get('/logconfig/stats')
+        data = json.loads(response.data.decode('utf-8'))
+
+        assert response.mimetype == 'application/json'
+        assert data['queue']['size'] == 0
+        assert data['listeners']['running'] is True
+        assert data['lag']['buckets'][-1] == ['+Inf', 0]
+
+        response = client.get('/logconfig/stats?format=prometheus')
+
+        assert response.mimetype == 'text/plain'
+        assert b'flask_logconfig_listener_running 1\n' in response.data
+    finally:
+        logcfg.stop_listeners(app)